@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+
+import deck_benchmark
+import deck_content
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time cold and warm deck builds and check byte budgets.')
+    parser.add_argument('--scales', default=','.join(str(s) for s in deck_benchmark.SCALES),
+                        help='comma-separated copies of the deck to build (default: %(default)s)')
+    parser.add_argument('--out', default='benchmark-results.json', help='JSON file to write the results to')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='worker processes for rendering (0 = one per CPU, 1 = serial)')
+    parser.add_argument('--no-pdf', action='store_true', help='leave the PDF export out of the builds')
+    for name, value in deck_benchmark.BUDGETS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}-budget", type=int, default=value, dest=name,
+                            help=f'bytes (default: %(default)s{"" if name == "page" else " per 1x deck"})')
+    args = parser.parse_args()
+
+    pages, styles = deck_content.ContentStore().load()
+    budgets = {name: getattr(args, name) for name in deck_benchmark.BUDGETS}
+    scales = [int(scale) for scale in args.scales.split(',')]
+    results = deck_benchmark.run_benchmark(
+        pages, styles, SOURCE_DIR, scales, jobs=args.jobs, pdf=not args.no_pdf, budgets=budgets)
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Wrote {args.out}")
+
+    for violation in results['violations']:
+        print(f"Over budget: {violation}")
+    if results['violations']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
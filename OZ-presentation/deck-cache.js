@@ -0,0 +1,98 @@
+// In-memory cache of the deck's page files for index.html. Pages are fetched once and
+// kept for the rest of the visit; the neighbours of the page being shown are fetched
+// while the browser is idle, so Next/Previous do not wait on the network. With
+// deck-sw.js registered, every fetch also goes through its offline copy of the deck.
+const DeckPageCache = (function () {
+    const SW_URL = 'deck-sw.js';
+    const pages = new Map();
+    const inFlight = new Map();
+    const stats = { hits: 0, misses: 0, prefetched: 0, offline: null };
+    const listeners = [];
+
+    function changed() {
+        listeners.forEach(listener => listener(stats));
+    }
+
+    function fetchPage(file) {
+        if (!inFlight.has(file)) {
+            const request = fetch(file)
+                .then(function (response) {
+                    if (!response.ok) {
+                        throw new Error(file + ': HTTP ' + response.status);
+                    }
+                    return response.text();
+                })
+                .then(function (html) {
+                    pages.set(file, html);
+                    return html;
+                })
+                .finally(() => inFlight.delete(file));
+            inFlight.set(file, request);
+        }
+        return inFlight.get(file);
+    }
+
+    // Resolves to the page's HTML; rejects when it cannot be fetched
+    function get(file) {
+        if (pages.has(file)) {
+            stats.hits++;
+            changed();
+            return Promise.resolve(pages.get(file));
+        }
+        // Waiting on a prefetch that has not finished still costs a round trip
+        stats.misses++;
+        changed();
+        return fetchPage(file);
+    }
+
+    function whenIdle(callback) {
+        if ('requestIdleCallback' in window) {
+            requestIdleCallback(callback, { timeout: 2000 });
+        } else {
+            setTimeout(callback, 200);
+        }
+    }
+
+    // Fetches files that are not cached yet once the browser is idle
+    function prefetch(files) {
+        if (navigator.connection && navigator.connection.saveData) {
+            return;
+        }
+        whenIdle(function () {
+            files.forEach(function (file) {
+                if (file && !pages.has(file) && !inFlight.has(file)) {
+                    fetchPage(file).then(function () {
+                        stats.prefetched++;
+                        changed();
+                    }).catch(() => null);
+                }
+            });
+        });
+    }
+
+    // Registers deck-sw.js and asks it to keep files for offline use. Only works
+    // over http(s); opened from disk the viewer runs without an offline copy.
+    function keepOffline(files) {
+        if (!('serviceWorker' in navigator) || !location.protocol.startsWith('http')) {
+            return;
+        }
+        navigator.serviceWorker.addEventListener('message', function (event) {
+            if (event.data && event.data.type === 'deck-cached') {
+                stats.offline = { cached: event.data.cached, total: event.data.total };
+                changed();
+            }
+        });
+        navigator.serviceWorker.register(SW_URL)
+            .then(() => navigator.serviceWorker.ready)
+            .then(function (registration) {
+                whenIdle(() => registration.active.postMessage({ type: 'cache-deck', files: files }));
+            })
+            .catch(() => null);
+    }
+
+    function onChange(listener) {
+        listeners.push(listener);
+    }
+
+    return { get, prefetch, keepOffline, onChange, stats, size: () => pages.size };
+})();
@@ -0,0 +1,285 @@
+// Adds html2canvas captures to a jsPDF document. In low-memory (streaming) mode each
+// canvas is encoded to JPEG or PNG bytes, its pixels are released straight away and
+// the bytes go into the PDF without a base64 data URL in between, so a large deck
+// holds one page's pixels at a time; mobile Safari fails once canvases pass its limit.
+// Without it pages are added as before, through a PNG data URL. open() moves encoding
+// and jsPDF into deck-pdf-worker.js where the browser allows, leaving this thread
+// only the DOM capture.
+const DeckCapture = (function () {
+    const DEFAULTS = { stream: false, scale: 4, format: 'PNG', quality: 0.92 };
+    const MB = 1048576;
+    const WORKER_URL = 'deck-pdf-worker.js';
+    const JSPDF_URL = 'https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js';
+    // How long to wait for the worker to load jsPDF before staying on this thread
+    const WORKER_TIMEOUT = 10000;
+
+    // Low-memory mode by default where canvases are known to run out
+    function suggested() {
+        return Boolean((navigator.deviceMemory && navigator.deviceMemory <= 4) ||
+            /iPad|iPhone|iPod/.test(navigator.userAgent));
+    }
+
+    // The export options chosen on the page, from the #streamMode, #captureScale,
+    // #imageFormat and #imageQuality controls; missing controls keep DEFAULTS
+    function readOptions(doc = document) {
+        const value = id => doc.getElementById(id);
+        const options = Object.assign({}, DEFAULTS);
+        if (value('streamMode')) {
+            options.stream = value('streamMode').checked;
+        }
+        if (value('captureScale')) {
+            options.scale = parseFloat(value('captureScale').value) || DEFAULTS.scale;
+        }
+        if (value('imageFormat')) {
+            options.format = value('imageFormat').value;
+        }
+        if (value('imageQuality')) {
+            options.quality = parseFloat(value('imageQuality').value) || DEFAULTS.quality;
+        }
+        return options;
+    }
+
+    // Ticks #streamMode on devices that need it and labels the quality slider
+    function setupOptions(doc = document) {
+        const streamMode = doc.getElementById('streamMode');
+        if (streamMode) {
+            streamMode.checked = streamMode.checked || suggested();
+        }
+        const quality = doc.getElementById('imageQuality');
+        const label = doc.getElementById('imageQualityValue');
+        if (quality && label) {
+            const update = () => { label.textContent = Math.round(quality.value * 100) + '%'; };
+            quality.addEventListener('input', update);
+            update();
+        }
+    }
+
+    // Frees a canvas's pixels now instead of whenever it is collected
+    function release(canvas) {
+        canvas.width = 0;
+        canvas.height = 0;
+    }
+
+    function toBlob(canvas, type, quality) {
+        return new Promise(function (resolve, reject) {
+            canvas.toBlob(blob => blob ? resolve(blob) : reject(new Error('Could not encode the page')), type, quality);
+        });
+    }
+
+    function newStats() {
+        return { pages: 0, imageBytes: 0, largestCanvas: 0, canvasSize: '', peakHeap: 0, encodeMs: 0 };
+    }
+
+    // Only Chrome exposes the heap size; canvas pixels are counted separately
+    function sample(stats) {
+        if (performance.memory) {
+            stats.peakHeap = Math.max(stats.peakHeap, performance.memory.usedJSHeapSize);
+        }
+    }
+
+    function track(stats, canvas) {
+        const pixels = canvas.width * canvas.height * 4;
+        if (pixels > stats.largestCanvas) {
+            stats.largestCanvas = pixels;
+            stats.canvasSize = `${canvas.width}x${canvas.height}`;
+        }
+        sample(stats);
+    }
+
+    function describe(stats, options, where) {
+        sample(stats);
+        const mode = options.stream ? `low-memory ${options.format}` : options.format;
+        const parts = [
+            `${mode} at ${options.scale}x`,
+            `largest page ${(stats.largestCanvas / MB).toFixed(0)} MB of pixels (${stats.canvasSize})`,
+            `${(stats.imageBytes / MB).toFixed(1)} MB of images`
+        ];
+        if (where) {
+            parts.push(`encoded ${where} in ${(stats.encodeMs / 1000).toFixed(1)}s`);
+        }
+        parts.push(stats.peakHeap ? `peak JS heap ${(stats.peakHeap / MB).toFixed(0)} MB`
+            : 'peak JS heap not reported by this browser');
+        return parts.join(', ');
+    }
+
+    function create(pdf, options = {}) {
+        options = Object.assign({}, DEFAULTS, options);
+        const type = options.format === 'JPEG' ? 'image/jpeg' : 'image/png';
+        const stats = newStats();
+
+        async function add(canvas, x, y, width, height) {
+            track(stats, canvas);
+            if (options.stream) {
+                const blob = await toBlob(canvas, type, options.quality);
+                release(canvas);
+                const bytes = new Uint8Array(await blob.arrayBuffer());
+                pdf.addImage(bytes, options.format, x, y, width, height, '', 'FAST');
+                stats.imageBytes += bytes.length;
+            } else {
+                const imgData = canvas.toDataURL(type, options.format === 'JPEG' ? options.quality : 1.0);
+                pdf.addImage(imgData, options.format, x, y, width, height, '', 'FAST');
+                stats.imageBytes += Math.round((imgData.length - imgData.indexOf(',') - 1) * 3 / 4);
+            }
+            stats.pages++;
+            sample(stats);
+        }
+
+        // One line for the status area, e.g. after pdf.output()
+        function report() {
+            return describe(stats, options);
+        }
+
+        return { add, report, stats, options };
+    }
+
+    // A whole A4 document on this thread, with the same interface as workerWriter
+    function mainThreadWriter(options) {
+        const pdf = new window.jspdf.jsPDF('p', 'mm', 'a4');
+        const capture = create(pdf, options);
+        return {
+            options: capture.options,
+            stats: capture.stats,
+            offThread: false,
+            addPage: async function (canvas, x, y, width, height) {
+                if (capture.stats.pages > 0) {
+                    pdf.addPage();
+                }
+                await capture.add(canvas, x, y, width, height);
+            },
+            finish: async () => pdf.output('blob'),
+            report: () => capture.report()
+        };
+    }
+
+    function jspdfUrl() {
+        const script = Array.from(document.scripts).find(s => /jspdf/.test(s.src));
+        return script ? script.src : JSPDF_URL;
+    }
+
+    // Resolves to a writer once the worker has loaded jsPDF, or null if it cannot
+    function workerWriter(options) {
+        let worker;
+        try {
+            worker = new Worker(WORKER_URL);
+        } catch (error) {
+            // Pages opened from disk may not start workers
+            return Promise.resolve(null);
+        }
+        const offscreen = typeof OffscreenCanvas !== 'undefined' && 'createImageBitmap' in window;
+        const type = options.format === 'JPEG' ? 'image/jpeg' : 'image/png';
+        const stats = newStats();
+        // Captured pages waiting in the worker; capture pauses beyond this
+        const limit = options.stream ? 1 : 3;
+        const waiting = [];
+        let queued = 0;
+        let sent = 0;
+        let failed = null;
+        let ready = null;
+        let done = null;
+
+        function wake() {
+            while (waiting.length && (queued < limit || failed)) {
+                waiting.shift()();
+            }
+        }
+
+        function fail(error) {
+            failed = failed || error;
+            if (ready) {
+                ready(null);
+                ready = null;
+            }
+            if (done) {
+                done.reject(failed);
+            }
+            wake();
+            worker.terminate();
+        }
+
+        worker.onmessage = function (event) {
+            const message = event.data;
+            if (message.type === 'ready') {
+                ready(writer);
+                ready = null;
+            } else if (message.type === 'page-done') {
+                queued--;
+                stats.pages++;
+                stats.imageBytes += message.bytes;
+                stats.encodeMs += message.ms;
+                wake();
+            } else if (message.type === 'done') {
+                done.resolve(new Blob([message.buffer], { type: 'application/pdf' }));
+                worker.terminate();
+            } else if (message.type === 'error') {
+                fail(new Error(message.message));
+            }
+        };
+        worker.onerror = function (event) {
+            event.preventDefault();
+            fail(new Error(event.message || 'The PDF worker stopped'));
+        };
+
+        const writer = {
+            options,
+            stats,
+            offThread: true,
+            // Resolves once the page has been handed over, not when it is encoded
+            addPage: async function (canvas, x, y, width, height) {
+                track(stats, canvas);
+                while (queued >= limit && !failed) {
+                    await new Promise(resolve => waiting.push(resolve));
+                }
+                if (failed) {
+                    throw failed;
+                }
+                const message = { type: 'page', id: ++sent, x, y, width, height };
+                let transfer;
+                if (offscreen) {
+                    message.bitmap = await createImageBitmap(canvas);
+                    transfer = message.bitmap;
+                } else {
+                    // Encoded here, but jsPDF still runs in the worker
+                    const started = performance.now();
+                    message.bytes = await (await toBlob(canvas, type, options.quality)).arrayBuffer();
+                    stats.encodeMs += performance.now() - started;
+                    transfer = message.bytes;
+                }
+                release(canvas);
+                queued++;
+                worker.postMessage(message, [transfer]);
+                sample(stats);
+            },
+            finish: function () {
+                return new Promise(function (resolve, reject) {
+                    if (failed) {
+                        reject(failed);
+                        return;
+                    }
+                    done = { resolve, reject };
+                    worker.postMessage({ type: 'finish' });
+                });
+            },
+            report: () => describe(stats, options, offscreen ? 'in a worker with OffscreenCanvas' : 'on the page, assembled in a worker')
+        };
+
+        return new Promise(function (resolve) {
+            ready = resolve;
+            setTimeout(function () {
+                if (ready) {
+                    fail(new Error('The PDF worker did not start'));
+                }
+            }, WORKER_TIMEOUT);
+            worker.postMessage({ type: 'start', jspdf: jspdfUrl(), options });
+        });
+    }
+
+    // Resolves to a writer with addPage(canvas, x, y, width, height), finish() -> PDF Blob
+    // and report(); encoding and assembly happen in a worker unless one cannot start
+    async function open(options = {}) {
+        options = Object.assign({}, DEFAULTS, options);
+        const writer = 'Worker' in window ? await workerWriter(options) : null;
+        return writer || mainThreadWriter(options);
+    }
+
+    return { open, create, readOptions, setupOptions, suggested, release };
+})();
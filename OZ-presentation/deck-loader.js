@@ -0,0 +1,146 @@
+// Loads the deck from deck-bundle.html (written by generate-remaining-pages.py --bundle)
+// so the viewer and the PDF tools need a single request. Without a bundle the page
+// order comes from deck-pages.json, which every build writes; each caller keeps its
+// own page list as a fallback for when neither exists.
+const DeckLoader = (function () {
+    const BUNDLE_URL = 'deck-bundle.html';
+    const PAGE_LIST_URL = 'deck-pages.json';
+    let bundlePromise = null;
+    let pageListPromise = null;
+
+    function parseBundle(text) {
+        const doc = new DOMParser().parseFromString(text, 'text/html');
+        const indexEl = doc.getElementById('deck-index');
+        if (!indexEl) {
+            return null;
+        }
+
+        const sections = {};
+        doc.querySelectorAll('section.deck-page').forEach(function (section) {
+            sections[section.id] = section;
+        });
+
+        return {
+            index: JSON.parse(indexEl.textContent),
+            styles: Array.from(doc.querySelectorAll('head style')).map(s => s.textContent).join('\n'),
+            section: id => sections[id],
+            files: function () {
+                return this.index.map(entry => entry.file);
+            }
+        };
+    }
+
+    // Resolves to the parsed bundle, or null when there is none
+    function loadBundle() {
+        if (!bundlePromise) {
+            bundlePromise = fetch(BUNDLE_URL, { cache: 'no-cache' })
+                .then(response => response.ok ? response.text() : null)
+                .then(text => text ? parseBundle(text) : null)
+                .catch(() => null);
+        }
+        return bundlePromise;
+    }
+
+    // Resolves to the deck's files in order: the bundle's, else the last build's list,
+    // which includes the continuation pages it split off, else fallback
+    function pageList(bundle, fallback) {
+        if (bundle) {
+            return Promise.resolve(bundle.files());
+        }
+        if (!pageListPromise) {
+            pageListPromise = fetch(PAGE_LIST_URL, { cache: 'no-cache' })
+                .then(response => response.ok ? response.json() : null)
+                .then(list => list && Array.isArray(list.pages) && list.pages.length ? list.pages : null)
+                .catch(() => null);
+        }
+        return pageListPromise.then(files => files || fallback);
+    }
+
+    // Adds the bundle's deduplicated styles to the current document once
+    function installStyles(bundle) {
+        if (document.getElementById('deck-bundle-styles')) {
+            return;
+        }
+        const style = document.createElement('style');
+        style.id = 'deck-bundle-styles';
+        style.textContent = bundle.styles;
+        document.head.appendChild(style);
+    }
+
+    // HTML for one page: its <section> when bundled, otherwise a fetch of the page file
+    async function pageHtml(bundle, file) {
+        if (bundle) {
+            const section = bundle.section(file.replace(/\.html$/, ''));
+            if (section) {
+                return section.outerHTML;
+            }
+        }
+        const response = await fetch(file);
+        return response.text();
+    }
+
+    // Fetches and parses pages ahead of the caller, in deck order. At most `concurrency`
+    // requests run at once and none more than `ahead` pages past the one being used, so
+    // page N+1 downloads while page N is captured without the whole deck piling up.
+    // Iterate with for await; each item is { index, file, html, page }, where page is
+    // options.parse(html, file) when given. options.load replaces pageHtml.
+    function pagePipeline(bundle, files, options = {}) {
+        const concurrency = options.concurrency || 4;
+        const ahead = Math.max(options.ahead || concurrency * 2, 1);
+        const load = options.load || (file => pageHtml(bundle, file));
+        const parse = options.parse || (html => html);
+        const stats = { total: files.length, fetched: 0, rendered: 0, started: performance.now(), lastFetch: 0 };
+        const results = new Array(files.length);
+        let next = 0;
+        let consumed = 0;
+        let active = 0;
+
+        function pump() {
+            while (active < concurrency && next < files.length && next < consumed + ahead) {
+                const index = next++;
+                active++;
+                results[index] = load(files[index])
+                    .then(html => ({ index, file: files[index], html, page: parse(html, files[index]) }))
+                    .finally(function () {
+                        active--;
+                        stats.fetched++;
+                        stats.lastFetch = performance.now();
+                        if (options.onFetch) {
+                            options.onFetch(stats);
+                        }
+                        pump();
+                    });
+                // Failures surface when the caller reaches that page
+                results[index].catch(() => null);
+            }
+        }
+
+        function rate(count, until) {
+            const seconds = (until - stats.started) / 1000;
+            return seconds > 0 ? (count / seconds).toFixed(1) : '-';
+        }
+
+        return {
+            stats,
+            // Call once a page has been rendered
+            rendered: function () {
+                stats.rendered++;
+            },
+            // "Fetched 12/48 (9.1 pages/s) · rendered 5/48 (1.3 pages/s)"
+            report: function () {
+                const fetchedUntil = stats.fetched === stats.total ? stats.lastFetch : performance.now();
+                return `Fetched ${stats.fetched}/${stats.total} (${rate(stats.fetched, fetchedUntil)} pages/s) · ` +
+                    `rendered ${stats.rendered}/${stats.total} (${rate(stats.rendered, performance.now())} pages/s)`;
+            },
+            [Symbol.asyncIterator]: async function* () {
+                for (let i = 0; i < files.length; i++) {
+                    consumed = i;
+                    pump();
+                    yield await results[i];
+                }
+            }
+        };
+    }
+
+    return { loadBundle, pageList, installStyles, pageHtml, pagePipeline };
+})();
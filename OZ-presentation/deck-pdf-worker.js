@@ -0,0 +1,49 @@
+// Encodes captured pages and assembles the PDF for deck-capture.js, off the page's main
+// thread. Pages arrive as ImageBitmaps, drawn to an OffscreenCanvas and encoded here,
+// or already encoded where OffscreenCanvas is missing; either way jsPDF runs here.
+let pdf = null;
+let options = null;
+let pages = 0;
+// Pages are handled one after another so they keep their order
+let queue = Promise.resolve();
+
+async function encode(bitmap) {
+    const canvas = new OffscreenCanvas(bitmap.width, bitmap.height);
+    canvas.getContext('2d').drawImage(bitmap, 0, 0);
+    bitmap.close();
+    const blob = await canvas.convertToBlob({
+        type: options.format === 'JPEG' ? 'image/jpeg' : 'image/png',
+        quality: options.quality
+    });
+    canvas.width = 0;
+    canvas.height = 0;
+    return new Uint8Array(await blob.arrayBuffer());
+}
+
+async function handle(message) {
+    if (message.type === 'start') {
+        importScripts(message.jspdf);
+        options = message.options;
+        pdf = new self.jspdf.jsPDF('p', 'mm', 'a4');
+        self.postMessage({ type: 'ready' });
+    } else if (message.type === 'page') {
+        const started = performance.now();
+        const bytes = message.bitmap ? await encode(message.bitmap) : new Uint8Array(message.bytes);
+        if (pages > 0) {
+            pdf.addPage();
+        }
+        pdf.addImage(bytes, options.format, message.x, message.y, message.width, message.height, '', 'FAST');
+        pages++;
+        self.postMessage({ type: 'page-done', id: message.id, bytes: bytes.length, ms: performance.now() - started });
+    } else if (message.type === 'finish') {
+        const buffer = pdf.output('arraybuffer');
+        self.postMessage({ type: 'done', buffer: buffer }, [buffer]);
+    }
+}
+
+self.addEventListener('message', function (event) {
+    const message = event.data;
+    queue = queue.then(() => handle(message)).catch(function (error) {
+        self.postMessage({ type: 'error', id: message.id, message: error.message || String(error) });
+    });
+});
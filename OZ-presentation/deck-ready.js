@@ -0,0 +1,126 @@
+// Waits until a page element can be captured with html2canvas, in place of a fixed
+// sleep before every capture: the fonts it uses are loaded, its images and CSS
+// backgrounds are decoded, and its size has stayed the same for two frames. Each wait
+// is bounded by a timeout and reports how long every step took.
+const DeckReady = (function () {
+    const DEFAULT_TIMEOUT = 5000;
+    const STABLE_FRAMES = 2;
+    // Image URLs already decoded, e.g. the background and logo every page shares
+    const decoded = new Map();
+
+    function frame(win) {
+        return new Promise(resolve => win.requestAnimationFrame(() => resolve()));
+    }
+
+    function decodeUrl(url) {
+        if (!decoded.has(url)) {
+            const image = new Image();
+            image.src = url;
+            // A broken image will not get any better by waiting for it
+            decoded.set(url, image.decode().catch(() => null));
+        }
+        return decoded.get(url);
+    }
+
+    function imageWaits(element) {
+        const doc = element.ownerDocument;
+        const win = doc.defaultView;
+        const waits = [];
+        [element, ...element.querySelectorAll('*')].forEach(function (el) {
+            if (el.tagName === 'IMG' && el.getAttribute('src')) {
+                waits.push(el.decode().catch(() => null));
+            }
+            const background = win.getComputedStyle(el).backgroundImage;
+            if (background && background !== 'none') {
+                for (const match of background.matchAll(/url\(["']?(.*?)["']?\)/g)) {
+                    waits.push(decodeUrl(new URL(match[1], doc.baseURI).href));
+                }
+            }
+        });
+        return Promise.all(waits);
+    }
+
+    // Resolves to { waited, steps: { name: ms }, timedOut, pending }. options.until is
+    // an optional check that the content itself has arrived, polled once per frame.
+    async function waitUntilReady(element, options = {}) {
+        const timeout = options.timeout || DEFAULT_TIMEOUT;
+        const doc = element.ownerDocument;
+        const win = doc.defaultView;
+        const started = performance.now();
+        const steps = {};
+        let pending = null;
+        let cancelled = false;
+
+        async function step(name, work) {
+            pending = name;
+            const stepStarted = performance.now();
+            await work();
+            steps[name] = Math.round(performance.now() - stepStarted);
+        }
+
+        const ready = (async function () {
+            if (options.until) {
+                await step('content', async function () {
+                    while (!cancelled && !options.until()) {
+                        await frame(win);
+                    }
+                });
+            }
+            // Lay the element out so the fonts it uses start loading
+            void element.offsetHeight;
+            await step('fonts', () => doc.fonts ? doc.fonts.ready : Promise.resolve());
+            await step('images', () => imageWaits(element));
+            await step('layout', async function () {
+                let last = null;
+                let stable = 0;
+                while (!cancelled && stable < STABLE_FRAMES) {
+                    await frame(win);
+                    const box = element.getBoundingClientRect();
+                    const size = [element.scrollWidth, element.scrollHeight, box.width, box.height].join('x');
+                    stable = size === last ? stable + 1 : 0;
+                    last = size;
+                }
+            });
+            pending = null;
+            return false;
+        })();
+
+        let timer;
+        const expired = new Promise(resolve => {
+            timer = setTimeout(() => resolve(true), timeout);
+        });
+        const timedOut = await Promise.race([ready, expired]);
+        clearTimeout(timer);
+        cancelled = true;
+        return { waited: Math.round(performance.now() - started), steps, timedOut, pending: timedOut ? pending : null };
+    }
+
+    function describe(result) {
+        if (result.timedOut) {
+            return `captured after the ${result.waited}ms timeout, still waiting for ${result.pending}`;
+        }
+        const steps = Object.entries(result.steps).map(([name, ms]) => `${name} ${ms}ms`).join(', ');
+        return `ready in ${result.waited}ms (${steps})`;
+    }
+
+    // Logs one page's wait to the console
+    function log(label, result) {
+        const message = `${label}: ${describe(result)}`;
+        if (result.timedOut) {
+            console.warn(message);
+        } else {
+            console.info(message);
+        }
+        return message;
+    }
+
+    // One line for the status area about all the waits of an export
+    function summary(results) {
+        const total = results.reduce((sum, result) => sum + result.waited, 0);
+        const timedOut = results.filter(result => result.timedOut).length;
+        return `waited ${(total / 1000).toFixed(1)}s in total for ${results.length} pages to be ready` +
+            (timedOut ? `, ${timedOut} captured on timeout (see console)` : '');
+    }
+
+    return { waitUntilReady, log, summary, describe };
+})();
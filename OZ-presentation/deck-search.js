@@ -0,0 +1,165 @@
+// Searches the deck with deck-search.json (written by generate-remaining-pages.py --search).
+// Query words are stemmed with the rules shipped in the index, so they match the way
+// the build indexed the pages. A page must contain every word; while typing, the last
+// word also matches as a prefix. Snippets come from the page text stored in the index.
+const DeckSearch = (function () {
+    const INDEX_URL = 'deck-search.json';
+    const SNIPPET_BEFORE = 60;
+    const SNIPPET_LENGTH = 170;
+    const WORD = /[\p{L}\p{N}]+/gu;
+    let indexPromise = null;
+
+    function escapeHtml(text) {
+        return text.replace(/[&<>"]/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;' })[c]);
+    }
+
+    function prepare(index) {
+        const stop = new Set(index.stop);
+        // Sorted for the binary search in withPrefix; the build's order does not survive
+        // JSON.parse, which puts integer-like keys such as "2026" first in numeric order
+        const stems = Object.keys(index.terms).sort();
+        const decoded = new Map();
+
+        function stem(word) {
+            for (const [suffix, replacement] of index.rules) {
+                if (word.endsWith(suffix)) {
+                    if (word.length - suffix.length + replacement.length < index.min_stem) {
+                        return word;
+                    }
+                    return word.slice(0, word.length - suffix.length) + replacement;
+                }
+            }
+            return word;
+        }
+
+        function words(text) {
+            return (text.toLowerCase().match(WORD) || []).filter(word => !stop.has(word));
+        }
+
+        // Map of page number -> offsets for one term, decoded on first use
+        function postings(term) {
+            if (!decoded.has(term)) {
+                const flat = index.terms[term] || [];
+                const pages = new Map();
+                for (let i = 0; i < flat.length; i += 2 + flat[i + 1]) {
+                    const offsets = [];
+                    let offset = 0;
+                    for (let j = 0; j < flat[i + 1]; j++) {
+                        offset += flat[i + 2 + j];
+                        offsets.push(offset);
+                    }
+                    pages.set(flat[i], offsets);
+                }
+                decoded.set(term, pages);
+            }
+            return decoded.get(term);
+        }
+
+        function withPrefix(prefix) {
+            let low = 0;
+            let high = stems.length;
+            while (low < high) {
+                const mid = (low + high) >> 1;
+                if (stems[mid] < prefix) {
+                    low = mid + 1;
+                } else {
+                    high = mid;
+                }
+            }
+            const found = [];
+            for (let i = low; i < stems.length && stems[i].startsWith(prefix); i++) {
+                found.push(stems[i]);
+            }
+            return found;
+        }
+
+        function snippet(text, offset, matches) {
+            let start = Math.max(0, offset - SNIPPET_BEFORE);
+            if (start > 0) {
+                start = text.indexOf(' ', start) + 1 || start;
+            }
+            let end = Math.min(text.length, start + SNIPPET_LENGTH);
+            if (end < text.length) {
+                end = text.lastIndexOf(' ', end) > offset ? text.lastIndexOf(' ', end) : end;
+            }
+            const part = text.slice(start, end);
+            let html = '';
+            let last = 0;
+            for (const match of part.matchAll(WORD)) {
+                const word = match[0].toLowerCase();
+                html += escapeHtml(part.slice(last, match.index));
+                html += matches(word) ? '<mark>' + escapeHtml(match[0]) + '</mark>' : escapeHtml(match[0]);
+                last = match.index + match[0].length;
+            }
+            html += escapeHtml(part.slice(last));
+            return (start > 0 ? '… ' : '') + html + (end < text.length ? ' …' : '');
+        }
+
+        // Best pages first: [{ page, file, id, title, snippet }]
+        function search(query, limit = 8) {
+            const queryWords = words(query);
+            if (!queryWords.length) {
+                return [];
+            }
+            const typing = !/\s$/.test(query);
+            const groups = queryWords.map(function (word, i) {
+                const terms = new Set([stem(word)]);
+                if (typing && i === queryWords.length - 1) {
+                    withPrefix(word).forEach(term => terms.add(term));
+                }
+                return terms;
+            });
+
+            let found = null;
+            for (const terms of groups) {
+                const pages = new Map();
+                terms.forEach(term => postings(term).forEach(function (offsets, page) {
+                    pages.set(page, (pages.get(page) || []).concat(offsets));
+                }));
+                const weight = Math.log(1 + index.pages.length / Math.max(1, pages.size));
+                const next = new Map();
+                pages.forEach(function (offsets, page) {
+                    if (found === null || found.has(page)) {
+                        const previous = found ? found.get(page) : { score: 0, first: Infinity };
+                        const inTitle = words(index.pages[page].title).some(word => terms.has(stem(word)));
+                        next.set(page, {
+                            score: previous.score + weight * (offsets.length + (inTitle ? 3 : 0)),
+                            first: Math.min(previous.first, Math.min(...offsets))
+                        });
+                    }
+                });
+                found = next;
+            }
+
+            const matches = word => groups.some(terms => terms.has(stem(word)) || (typing && terms.has(word)));
+            return Array.from(found.entries())
+                .sort((a, b) => b[1].score - a[1].score || a[0] - b[0])
+                .slice(0, limit)
+                .map(function ([page, hit]) {
+                    const entry = index.pages[page];
+                    return {
+                        page: page,
+                        file: entry.file,
+                        id: entry.id,
+                        title: entry.title,
+                        snippet: snippet(entry.text, hit.first, matches)
+                    };
+                });
+        }
+
+        return { search, pages: index.pages.length };
+    }
+
+    // Resolves to a searcher, or null when no index has been built
+    function load() {
+        if (!indexPromise) {
+            indexPromise = fetch(INDEX_URL, { cache: 'no-cache' })
+                .then(response => response.ok ? response.json() : null)
+                .then(index => index ? prepare(index) : null)
+                .catch(() => null);
+        }
+        return indexPromise;
+    }
+
+    return { load };
+})();
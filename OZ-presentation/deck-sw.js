@@ -0,0 +1,81 @@
+// Offline copy of the deck, registered by deck-cache.js. The viewer's files are stored
+// on install and the deck's pages once the viewer posts their list. Requests go to the
+// network first and the copy is only used without a connection, so a rebuilt deck is
+// shown on the next load. Files whose names carry their content hash never change and
+// are answered from the copy straight away.
+const CACHE_NAME = 'oz-deck-v2';
+const SHELL = ['./', 'index.html', 'deck-loader.js', 'deck-cache.js', 'deck-search.js'];
+// Written by generate-remaining-pages.py when those options are used; cached if present
+const OPTIONAL = ['deck-bundle.html', 'deck-pages.json', 'deck-search.json'];
+// deck.<hash>.css (--css external), assets/ (--assets) and webfonts/ (--webfonts)
+const HASHED = /\/(deck\.[0-9a-f]+\.css|assets\/.+|webfonts\/.+)$/;
+
+function isHashed(url) {
+    return HASHED.test(new URL(url, self.location.href).pathname);
+}
+
+// Adds each file on its own, so one missing file does not fail the rest. Only hashed
+// files are kept as they are; the others are fetched again in case of a rebuild.
+function store(cache, files) {
+    return Promise.all(files.map(function (file) {
+        return cache.match(file).then(function (found) {
+            return found && isHashed(file) ? true : cache.add(file).then(() => true, () => !!found);
+        });
+    }));
+}
+
+self.addEventListener('install', function (event) {
+    event.waitUntil(caches.open(CACHE_NAME)
+        .then(cache => store(cache, SHELL.concat(OPTIONAL)))
+        .then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', function (event) {
+    event.waitUntil(caches.keys()
+        .then(names => Promise.all(names.filter(name => name !== CACHE_NAME).map(name => caches.delete(name))))
+        .then(() => self.clients.claim()));
+});
+
+self.addEventListener('fetch', function (event) {
+    const request = event.request;
+    if (request.method !== 'GET' || new URL(request.url).origin !== self.location.origin) {
+        return;
+    }
+    event.respondWith(caches.open(CACHE_NAME).then(async function (cache) {
+        if (isHashed(request.url)) {
+            const cached = await cache.match(request);
+            if (cached) {
+                return cached;
+            }
+        }
+        try {
+            const response = await fetch(request);
+            if (response.ok) {
+                event.waitUntil(cache.put(request, response.clone()));
+            }
+            return response;
+        } catch (error) {
+            const cached = await cache.match(request, { ignoreSearch: true });
+            if (cached) {
+                return cached;
+            }
+            throw error;
+        }
+    }));
+});
+
+self.addEventListener('message', function (event) {
+    if (!event.data || event.data.type !== 'cache-deck') {
+        return;
+    }
+    const files = event.data.files;
+    event.waitUntil(caches.open(CACHE_NAME)
+        .then(cache => store(cache, files))
+        .then(function (stored) {
+            event.source.postMessage({
+                type: 'deck-cached',
+                cached: stored.filter(Boolean).length,
+                total: files.length
+            });
+        }));
+});
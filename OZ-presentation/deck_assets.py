@@ -0,0 +1,204 @@
+"""Image asset stage: screen-sized images under content-hashed names.
+
+Each logical asset may have several source files (background.svg and
+background.png). A source's kind comes from its content, not its extension:
+several .png files here are really SVG data URLs. For every variant the
+smallest candidate wins, either an SVG served as is or a raster resized to
+the variant's width. Results are cached by source hash, so an unchanged
+asset is never re-encoded.
+
+Resizing needs Pillow. Without it rasters are copied at full size and still
+get hashed names.
+"""
+
+import base64
+import hashlib
+import importlib.util
+import io
+import os
+import re
+
+import deck_profile
+from deck_build import load_manifest, save_manifest
+
+ASSETS_DIR = 'assets'
+ASSETS_MANIFEST = '.deck-assets.json'
+
+# Logical asset -> source files, preferred first when two sources are the same kind
+ASSETS = {
+    'background': ('background.svg', 'background.png'),
+    'logo': ('logo.svg', 'logo.png'),
+    'page-background': ('Background + Logo 2.png',),
+}
+# Pixel width of each variant: the 140mm viewer frame at 2x. Print needs no variant of
+# its own; the vector PDF encodes its background itself (deck_pdf.BACKGROUND_DPI)
+VARIANTS = {'screen': 1058}
+JPEG_QUALITY = 85
+# Without Pillow rasters are copied at full size; checked once, it is part of every cache key
+_PILLOW_AVAILABLE = importlib.util.find_spec('PIL') is not None
+
+_SVG_DATA_URL = 'data:image/svg+xml;base64,'
+_URL = re.compile(r'''url\((['"]?)([^'")]+)\1\)''')
+
+
+def source_files():
+    return [name for names in ASSETS.values() for name in names]
+
+
+def read_source(path):
+    """(kind, bytes) for an asset source: 'svg', 'raster', or None if unusable."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(b'\x89PNG') or data.startswith(b'\xff\xd8'):
+        return 'raster', data
+    text = data.strip()
+    if text.startswith(_SVG_DATA_URL.encode('ascii')):
+        try:
+            return 'svg', base64.b64decode(text[len(_SVG_DATA_URL):])
+        except ValueError:
+            return None, data
+    if text.startswith(b'<svg') or text.startswith(b'<?xml'):
+        return 'svg', data
+    return None, data
+
+
+def _raster_variants(data, widths):
+    """Smallest encoding of the raster at each width, or the original when Pillow is missing."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return {name: (data, 'png' if data.startswith(b'\x89PNG') else 'jpg') for name in widths}, \
+            'Pillow is not installed'
+
+    variants = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        original_ext = 'png' if image.format == 'PNG' else 'jpg'
+        opaque = image.mode in ('RGB', 'L') or (
+            image.mode == 'RGBA' and image.getchannel('A').getextrema()[0] == 255)
+        for name, width in widths.items():
+            # Never upscale; a source narrower than the variant is used as it is
+            if width >= image.width:
+                candidates = [(data, original_ext)]
+                resized = image
+            else:
+                height = round(image.height * width / image.width)
+                resized = image.resize((width, height), Image.LANCZOS)
+                candidates = []
+            buffer = io.BytesIO()
+            resized.save(buffer, 'PNG', optimize=True)
+            candidates.append((buffer.getvalue(), 'png'))
+            if opaque:
+                buffer = io.BytesIO()
+                resized.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+                candidates.append((buffer.getvalue(), 'jpg'))
+            variants[name] = min(candidates, key=lambda candidate: len(candidate[0]))
+    return variants, None
+
+
+def _cache_key(sources):
+    digest = hashlib.sha256(repr(sorted(VARIANTS.items())).encode('utf-8'))
+    # Installing Pillow later must replace the full-size copies
+    digest.update(f'{JPEG_QUALITY} {_PILLOW_AVAILABLE}'.encode('ascii'))
+    for name, data in sources:
+        digest.update(name.encode('utf-8') + b'\0' + data + b'\0')
+    return digest.hexdigest()
+
+
+def _hashed_name(asset, data, ext):
+    # Variants with identical bytes (an SVG, a source smaller than the width) share a file
+    return f'{ASSETS_DIR}/{asset}.{hashlib.sha256(data).hexdigest()[:10]}.{ext}'
+
+
+class AssetReport:
+    def __init__(self):
+        self.processed = []
+        self.cached = []
+        self.removed = []
+        # Source filename -> {variant: hashed path relative to out_dir}
+        self.urls = {}
+        self.source_bytes = 0
+        self.screen_bytes = 0
+        self.note = None
+
+
+def build_assets(source_dir, out_dir):
+    manifest_path = os.path.join(out_dir, ASSETS_MANIFEST)
+    previous = load_manifest(manifest_path).get('assets', {})
+    manifest = {'assets': {}}
+    report = AssetReport()
+    os.makedirs(os.path.join(out_dir, ASSETS_DIR), exist_ok=True)
+
+    for asset, names in ASSETS.items():
+        sources = []
+        for name in names:
+            path = os.path.join(source_dir, name)
+            if os.path.exists(path):
+                kind, data = read_source(path)
+                if kind:
+                    sources.append((name, kind, data))
+        if not sources:
+            continue
+
+        key = _cache_key((name, data) for name, _, data in sources)
+        entry = previous.get(asset)
+        if entry and entry['key'] == key and all(
+                os.path.exists(os.path.join(out_dir, path)) for path in entry['variants'].values()):
+            report.cached.append(asset)
+            # The cached copies are still full size
+            if any(kind == 'raster' for _, kind, _ in sources) and not _PILLOW_AVAILABLE:
+                report.note = 'Pillow is not installed'
+        else:
+            with deck_profile.stage('assets', asset):
+                entry = {'key': key, 'variants': _encode(asset, sources, out_dir, report)}
+            report.processed.append(asset)
+        manifest['assets'][asset] = entry
+
+        report.source_bytes += max(len(data) for _, _, data in sources)
+        report.screen_bytes += os.path.getsize(os.path.join(out_dir, entry['variants']['screen']))
+        for name, _, _ in sources:
+            report.urls[name] = entry['variants']
+
+    # Variants nothing refers to any more
+    current = {path for entry in manifest['assets'].values() for path in entry['variants'].values()}
+    for entry in previous.values():
+        for path in set(entry['variants'].values()) - current:
+            if os.path.exists(os.path.join(out_dir, path)):
+                os.remove(os.path.join(out_dir, path))
+            report.removed.append(path)
+
+    save_manifest(manifest_path, manifest)
+    return report
+
+
+def _encode(asset, sources, out_dir, report):
+    # Of two sources of the same kind keep the first; the other is a stale copy
+    svg = next((data for _, kind, data in sources if kind == 'svg'), None)
+    raster = next((data for _, kind, data in sources if kind == 'raster'), None)
+
+    encoded = {name: (svg, 'svg') for name in VARIANTS} if svg is not None else {}
+    if raster is not None:
+        rasters, report.note = _raster_variants(raster, VARIANTS)
+        for name, candidate in rasters.items():
+            if name not in encoded or len(candidate[0]) < len(encoded[name][0]):
+                encoded[name] = candidate
+
+    variants = {}
+    for name, (data, ext) in encoded.items():
+        path = _hashed_name(asset, data, ext)
+        full_path = os.path.join(out_dir, path)
+        if not os.path.exists(full_path):
+            with open(full_path, 'wb') as f:
+                f.write(data)
+        variants[name] = path
+    return variants
+
+
+def rewrite_urls(markup, urls, variant='screen'):
+    """Point url(...) references to asset sources at their hashed variant."""
+    def replace(match):
+        variants = urls.get(match.group(2))
+        if not variants:
+            return match.group(0)
+        return f"url('{variants[variant]}')"
+    return _URL.sub(replace, markup)
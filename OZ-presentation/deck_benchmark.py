@@ -0,0 +1,131 @@
+"""Timing and byte budgets for the deck build (see benchmark-deck.py).
+
+The pages dict is scaled to N copies of itself. Each copy has its own
+filenames and titles, so every copy is a distinct page to build. Each scale
+is built twice in a fresh directory:
+
+- the cold build starts with no manifest or caches;
+- the warm build reruns with nothing changed.
+
+Both time every stage separately. Byte budgets are per page and per 1x
+deck; total budgets scale with N.
+"""
+
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import deck_build
+import deck_bundle
+import deck_pdf
+import deck_split
+
+SCALES = (1, 10, 100)
+# Bytes; the totals are for one copy of the deck and grow with the scale
+BUDGETS = {
+    'page': 6_000,
+    'pages_total': 150_000,
+    'bundle': 100_000,
+    'pdf': 90_000,
+}
+
+
+def scaled_pages(pages, scale):
+    """The pages dict repeated scale times under distinct names and titles."""
+    scaled = {}
+    for copy in range(scale):
+        for filename, page_data in pages.items():
+            if copy == 0:
+                scaled[filename] = page_data
+            else:
+                stem, ext = os.path.splitext(filename)
+                scaled[f'{stem}-copy{copy}{ext}'] = dict(page_data, title=f"{page_data['title']} ({copy + 1})")
+    return scaled
+
+
+def run_build(pages, styles, source_dir, out_dir, jobs=1, pdf=True):
+    """One build of every stage; returns ({stage: seconds}, expanded pages)."""
+    seconds = {}
+
+    started = time.perf_counter()
+    pages, _ = deck_split.split_pages(pages, styles, out_dir)
+    seconds['split'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    deck_build.build(pages, styles, out_dir, jobs=jobs)
+    seconds['pages'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    deck_bundle.write_bundle(source_dir, out_dir, pages)
+    seconds['bundle'] = time.perf_counter() - started
+
+    if pdf:
+        started = time.perf_counter()
+        deck_pdf.export_pdf(deck_bundle.deck_files(source_dir, out_dir, pages),
+                            os.path.join(out_dir, 'deck.pdf'), source_dir=source_dir)
+        seconds['pdf'] = time.perf_counter() - started
+
+    seconds['total'] = sum(seconds.values())
+    return seconds, pages
+
+
+def measure_bytes(out_dir, pages):
+    sizes = {filename: os.path.getsize(os.path.join(out_dir, filename)) for filename in pages}
+    result = {
+        'pages': len(sizes),
+        'page_max': max(sizes.values()),
+        'page_mean': round(sum(sizes.values()) / len(sizes)),
+        'pages_total': sum(sizes.values()),
+        'largest_page': max(sizes, key=sizes.get),
+        'bundle': os.path.getsize(os.path.join(out_dir, deck_bundle.BUNDLE_NAME)),
+    }
+    pdf_path = os.path.join(out_dir, 'deck.pdf')
+    if os.path.exists(pdf_path):
+        result['pdf'] = os.path.getsize(pdf_path)
+    return result, sizes
+
+
+def check_budgets(scale, measured, sizes, budgets=BUDGETS):
+    """Human-readable descriptions of every budget the build exceeds."""
+    violations = []
+    for filename, size in sorted(sizes.items()):
+        if size > budgets['page']:
+            violations.append(f"{scale}x: {filename} is {size} bytes, budget {budgets['page']}")
+    for name in ('pages_total', 'bundle', 'pdf'):
+        if name in measured and measured[name] > budgets[name] * scale:
+            violations.append(f"{scale}x: {name} is {measured[name]} bytes, budget {budgets[name] * scale}")
+    return violations
+
+
+def run_benchmark(pages, styles, source_dir, scales=SCALES, jobs=1, pdf=True, budgets=BUDGETS, log=print):
+    results = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'budgets': budgets,
+        'scales': {},
+        'violations': [],
+    }
+    for scale in scales:
+        scaled = scaled_pages(pages, scale)
+        out_dir = tempfile.mkdtemp(prefix=f'deck-bench-{scale}x-')
+        try:
+            cold, built = run_build(scaled, styles, source_dir, out_dir, jobs, pdf)
+            warm, _ = run_build(scaled, styles, source_dir, out_dir, jobs, pdf)
+            measured, sizes = measure_bytes(out_dir, built)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+        violations = check_budgets(scale, measured, sizes, budgets)
+        results['scales'][str(scale)] = {
+            'entries': len(scaled),
+            'cold_seconds': {stage: round(value, 4) for stage, value in cold.items()},
+            'warm_seconds': {stage: round(value, 4) for stage, value in warm.items()},
+            'bytes': measured,
+        }
+        results['violations'].extend(violations)
+        log(f"{scale}x: {measured['pages']} pages, cold {cold['total']:.2f}s, warm {warm['total']:.2f}s, "
+            f"{measured['pages_total']} bytes of pages, bundle {measured['bundle']}"
+            + (f", pdf {measured['pdf']}" if 'pdf' in measured else ''))
+    return results
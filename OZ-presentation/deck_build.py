@@ -0,0 +1,292 @@
+"""Build machinery for generate-remaining-pages.py: rendering, manifest, parallel writes."""
+
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import deck_css
+import deck_minify
+import deck_profile
+from deck_html import Element, parse_html
+from deck_templates import compile_template
+
+# Build manifest written next to the generated pages
+MANIFEST_NAME = '.deck-manifest.json'
+MANIFEST_VERSION = 1
+
+# 'inline' copies the shared styles into every page; 'external' links one
+# content-hashed stylesheet and inlines only each page's critical rules
+CSS_MODES = ('inline', 'external')
+# Top-level blocks after the title that count as above the fold
+CRITICAL_BLOCKS = 2
+
+# Wrapper every generated page is rendered into
+page_template = '''{{ styles }}
+
+<div class="content-page">
+    <h2>{{ title }}</h2>
+    {{ content }}
+</div>'''
+
+
+def page_wrapper(styles):
+    # Compiled once per process; the shared styles are folded into the literals
+    return compile_template(page_template).bind(styles=styles)
+
+
+def render_page_to(out, page_data, styles):
+    page_wrapper(styles).render_to(out, page_data)
+
+
+def render_page(page_data, styles):
+    return page_wrapper(styles).render(page_data)
+
+
+def page_digest(page_data, styles, minify=False):
+    # Hash everything that ends up in the output, including the wrapper itself
+    digest = hashlib.sha256()
+    for part in (page_template, styles, page_data['title'], page_data['content']):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    if minify:
+        digest.update(b'minify')
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable manifest {path}: {e}")
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def save_manifest(path, manifest):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(manifest, version=MANIFEST_VERSION), f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def write_stylesheet(styles, out_dir):
+    """Write the shared rules to a content-hashed file; returns (name, rules, size)."""
+    rules = deck_css.parse_stylesheet(styles)
+    css = deck_css.format_rules(rules)
+    data = css.encode('utf-8')
+    name = f"deck.{hashlib.sha256(data).hexdigest()[:10]}.css"
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+    return name, rules, len(data)
+
+
+def critical_rules(rules, page_data):
+    """Rules needed by the title and the first few blocks of a page."""
+    tree = parse_html(render_page(page_data, ''))
+    page = tree.find('div', 'content-page')
+    if page is None:
+        return list(rules)
+    fold = [page]
+    for block in page.elements()[:1 + CRITICAL_BLOCKS]:
+        fold.extend(block.iter())
+    return [rule for rule in rules if deck_css.rule_matches(rule, fold)]
+
+
+def linked_styles(href, critical):
+    return f'<link rel="stylesheet" href="{href}">\n<style>\n{deck_css.format_rules(critical, compact=True)}</style>\n'
+
+
+def page_elements(page_data):
+    """The elements page_template lays out for page_data, built without rendering it."""
+    root = Element('#root')
+    page = Element('div', {'class': 'content-page'}, root)
+    title = Element('h2', (), page)
+    root.children.append(page)
+    page.children.append(title)
+    parse_html(page_data['title'], title)
+    parse_html(page_data['content'], page)
+    return [element for element in root.iter() if element.tag != '#root']
+
+
+def page_minifier(out, page_data):
+    """An HtmlMinifier writing to out, told which elements the page has."""
+    return deck_minify.HtmlMinifier(out, page_elements(page_data))
+
+
+def write_page(task):
+    # Runs in pool workers, so it takes and returns plain picklable values:
+    # the path, and (bytes rendered, bytes written) when minifying
+    path, page_data, styles, shared, minify = task
+    if deck_profile.active is not None:
+        return _write_page_profiled(path, page_data, styles, shared, minify)
+    with open(path, 'w', encoding='utf-8') as f:
+        out = page_minifier(f, page_data) if minify else f
+        if shared:
+            render_page_to(out, page_data, styles)
+        else:
+            compile_template(page_template).render_to(out, dict(page_data, styles=styles))
+        if minify:
+            out.close()
+    return path, (out.bytes_in, out.bytes_out) if minify else None
+
+
+def _write_page_profiled(path, page_data, styles, shared, minify):
+    # Renders to memory first so templating, minifying and file I/O are timed apart
+    name = os.path.basename(path)
+    with deck_profile.stage('template', name):
+        if shared:
+            html = render_page(page_data, styles)
+        else:
+            html = compile_template(page_template).render(dict(page_data, styles=styles))
+    sizes = None
+    if minify:
+        with deck_profile.stage('minify', name):
+            out = io.StringIO()
+            minifier = page_minifier(out, page_data)
+            minifier.write(html)
+            minifier.close()
+            html = out.getvalue()
+            sizes = (minifier.bytes_in, minifier.bytes_out)
+    with deck_profile.stage('write', name):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+    return path, sizes
+
+
+def resolve_jobs(jobs):
+    if jobs is None or jobs < 1:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def write_pages(tasks, jobs=1):
+    """Render and write every task, in parallel when jobs > 1.
+
+    Falls back to a serial loop when there is nothing to gain or when the
+    platform cannot start worker processes.
+    """
+    jobs = min(resolve_jobs(jobs), len(tasks))
+    if jobs > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                # map() yields in submission order, so callers stay deterministic
+                return list(pool.map(write_page, tasks, chunksize=max(1, len(tasks) // (jobs * 4))))
+        except (OSError, NotImplementedError) as e:
+            print(f"Parallel build unavailable ({e}), falling back to serial")
+    return [write_page(task) for task in tasks]
+
+
+class BuildReport:
+    def __init__(self):
+        self.built = []
+        self.skipped = []
+        self.removed = []
+        self.stylesheet = None
+        # Bytes of styling carried by the generated pages, and what inlining would cost
+        self.style_bytes = 0
+        self.inline_style_bytes = 0
+        # filename -> (bytes rendered, bytes written) of pages minified by this
+        # build, and the same summed over every page of the deck
+        self.minified = {}
+        self.rendered_bytes = 0
+        self.minified_bytes = 0
+
+
+def build(pages, styles, out_dir, force=False, jobs=1, css_mode='inline', keep=None, minify=False):
+    """Write the pages that changed and remove the ones no longer in pages.
+
+    keep(filename) marks pages of an earlier build that a partial build
+    leaves alone: their files and manifest entries are kept as they are.
+    minify streams every page through deck_minify on its way to disk.
+    """
+    if css_mode not in CSS_MODES:
+        raise ValueError(f"css_mode must be one of {', '.join(CSS_MODES)}")
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+    previous_pages = previous.get('pages', {})
+    manifest = {'pages': {}}
+    previous_sizes = previous.get('minified', {})
+    sizes = {}
+    # filename -> the hashed stylesheet the page links (--css external)
+    previous_links = previous.get('stylesheets', {})
+    links = {}
+    report = BuildReport()
+    tasks = []
+
+    if css_mode == 'external':
+        report.stylesheet, rules, report.style_bytes = write_stylesheet(styles, out_dir)
+        manifest['stylesheet'] = report.stylesheet
+
+    for filename, page_data in pages.items():
+        if css_mode == 'external':
+            with deck_profile.stage('css', filename):
+                page_styles = linked_styles(report.stylesheet, critical_rules(rules, page_data))
+        else:
+            page_styles = styles
+        report.style_bytes += len(page_styles.encode('utf-8'))
+        report.inline_style_bytes += len(styles.encode('utf-8'))
+
+        with deck_profile.stage('digest', filename):
+            digest = page_digest(page_data, page_styles, minify)
+        manifest['pages'][filename] = digest
+        if css_mode == 'external':
+            links[filename] = report.stylesheet
+        path = os.path.join(out_dir, filename)
+
+        if not force and previous_pages.get(filename) == digest and os.path.exists(path):
+            report.skipped.append(filename)
+            if minify and filename in previous_sizes:
+                sizes[filename] = previous_sizes[filename]
+            continue
+
+        tasks.append((path, page_data, page_styles, css_mode == 'inline', minify))
+
+    for path, page_sizes in write_pages(tasks, jobs):
+        if page_sizes is not None:
+            report.minified[os.path.basename(path)] = sizes[os.path.basename(path)] = list(page_sizes)
+    report.built = [os.path.basename(task[0]) for task in tasks]
+
+    # Pages dropped from the dict since the last run
+    for filename in sorted(set(previous_pages) - set(pages)):
+        if keep is not None and keep(filename):
+            manifest['pages'][filename] = previous_pages[filename]
+            if filename in previous_sizes:
+                sizes[filename] = previous_sizes[filename]
+            # Manifests from before per-page links had one stylesheet for every page
+            link = previous_links.get(filename, previous.get('stylesheet') if not previous_links else None)
+            if link:
+                links[filename] = link
+            continue
+        path = os.path.join(out_dir, filename)
+        if os.path.exists(path):
+            os.remove(path)
+        report.removed.append(filename)
+
+    # Stylesheets from earlier builds that no page links to any more; pages a
+    # partial build kept may still link an older one
+    old_stylesheets = set(previous_links.values()) | {previous.get('stylesheet')}
+    for old_stylesheet in sorted(filter(None, old_stylesheets - set(links.values()))):
+        old_path = os.path.join(out_dir, old_stylesheet)
+        if os.path.exists(old_path):
+            os.remove(old_path)
+
+    if links:
+        manifest['stylesheets'] = links
+
+    if sizes:
+        manifest['minified'] = sizes
+        report.rendered_bytes = sum(before for before, _ in sizes.values())
+        report.minified_bytes = sum(after for _, after in sizes.values())
+    save_manifest(manifest_path, manifest)
+    return report
@@ -0,0 +1,175 @@
+"""Single-file deck bundle: every page as a <section>, styles deduplicated.
+
+The bundle lets index.html and the PDF tools load the whole deck with one
+request. Pages whose stylesheets are identical share one scoped copy of the
+rules; each distinct stylesheet gets its own class so pages never restyle
+each other.
+"""
+
+import glob
+import html
+import json
+import os
+import re
+
+import deck_assets
+import deck_css
+from deck_html import parse_html
+
+BUNDLE_NAME = 'deck-bundle.html'
+PAGE_PATTERN = 'page-*.html'
+
+_STYLESHEET_LINK = re.compile(r'<link\s[^>]*rel="stylesheet"[^>]*>\s*', re.I)
+_HREF = re.compile(r'href="([^"]+)"')
+
+GOOGLE_FONTS = ('<link href="https://fonts.googleapis.com/css2?family=Playfair+Display:wght@300;400;500;600;700'
+                '&family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">\n')
+DECK_FAMILIES = {'Playfair Display', 'Inter'}
+
+# Styles the bundle needs regardless of page content
+BASE_STYLES = '''.deck-page { width: 100%; height: 100%; }
+.deck-index ol { margin: 20px 40px; font-family: 'Inter', sans-serif; }
+@media print {
+    .deck-index { display: none; }
+    .deck-page { page-break-after: always; }
+}
+'''
+
+
+def deck_files(source_dir, out_dir, generated):
+    """Map every page of the deck, in deck order, to the file it should be read from.
+
+    Generated pages are read from out_dir, hand-written ones from source_dir.
+    """
+    files = {os.path.basename(p): p for p in glob.glob(os.path.join(source_dir, PAGE_PATTERN))}
+    for filename in generated:
+        files[filename] = os.path.join(out_dir, filename)
+    return [(filename, files[filename]) for filename in sorted(files)]
+
+
+def built_deck_files(pages_dir, build_dir):
+    """deck_files for a finished build: every page-*.html in build_dir counts as generated."""
+    generated = [os.path.basename(p) for p in glob.glob(os.path.join(build_dir, PAGE_PATTERN))]
+    return deck_files(pages_dir, build_dir, generated)
+
+
+def page_id(filename):
+    return os.path.splitext(filename)[0]
+
+
+def page_title(markup, fallback):
+    tree = parse_html(markup)
+    for tag in ('h1', 'h2'):
+        heading = tree.find(tag)
+        if heading is not None:
+            return ' '.join(heading.text().split())
+    return fallback
+
+
+def _page_styles(page_html, base_dir):
+    # Inline <style> blocks plus any local stylesheet the page links (--css external)
+    css = [deck_css.extract_style_blocks(page_html)]
+    for link in _STYLESHEET_LINK.findall(page_html):
+        href = _HREF.search(link)
+        if href and '://' not in href.group(1):
+            try:
+                with open(os.path.join(base_dir, href.group(1)), 'r', encoding='utf-8') as f:
+                    css.insert(0, f.read())
+            except OSError:
+                pass
+    # Critical rules repeat the linked stylesheet; keep each rule's first occurrence
+    return tuple(dict.fromkeys(deck_css.parse_stylesheet('\n'.join(css))))
+
+
+def _scoped(rules, scope):
+    return [
+        deck_css.Rule(tuple(f'.{scope} {selector}' for selector in rule.selectors), rule.body, rule.media)
+        for rule in rules
+    ]
+
+
+class BundleReport:
+    def __init__(self, path):
+        self.path = path
+        self.pages = 0
+        self.written = False
+        self.source_bytes = 0
+        self.bundle_bytes = 0
+        self.style_sets = 0
+
+
+def render_bundle(page_files, report, webfonts=None):
+    """Return the bundle for [(filename, path)] in deck order, filling in report.
+
+    webfonts (from deck_webfonts) adds @font-face rules for local subsets;
+    Google Fonts is only linked when they do not cover both families.
+    """
+    style_groups = {}
+    sections = []
+    index = []
+
+    for position, (filename, path) in enumerate(page_files):
+        with open(path, 'r', encoding='utf-8') as f:
+            page_html = f.read()
+        report.source_bytes += len(page_html.encode('utf-8'))
+
+        rules = _page_styles(page_html, os.path.dirname(path))
+        scope = style_groups.setdefault(rules, f'deck-styles-{len(style_groups) + 1}')
+        markup = _STYLESHEET_LINK.sub('', deck_css.strip_style_blocks(page_html)).strip()
+        pid = page_id(filename)
+        title = page_title(markup, pid)
+
+        index.append({'id': pid, 'file': filename, 'title': title, 'position': position + 1})
+        sections.append(
+            f'<section class="deck-page {scope}" id="{pid}" data-page="{filename}">\n'
+            f'{markup}\n</section>'
+        )
+
+    styles = [BASE_STYLES]
+    fonts_link = GOOGLE_FONTS
+    if webfonts is not None and webfonts.css:
+        styles.append(webfonts.css)
+        if DECK_FAMILIES <= webfonts.families:
+            fonts_link = ''
+    for rules, scope in style_groups.items():
+        styles.append(deck_css.format_rules(_scoped(rules, scope), compact=True))
+
+    nav = '\n'.join(
+        f'<li><a href="#{entry["id"]}">{html.escape(entry["title"])}</a></li>' for entry in index
+    )
+    # "</" cannot appear inside the JSON script block
+    index_json = json.dumps(index, ensure_ascii=False).replace('</', '<\\/')
+    bundle = (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="UTF-8">\n'
+        "<title>The Sophisticated Investor's Guide to Opportunity Zone Investing</title>\n"
+        f'{fonts_link}<style>\n{"".join(styles)}</style>\n</head>\n<body>\n'
+        f'<nav class="deck-index"><ol>\n{nav}\n</ol></nav>\n'
+        + '\n'.join(sections)
+        + f'\n<script type="application/json" id="deck-index">{index_json}</script>\n'
+        '</body>\n</html>\n'
+    )
+    report.pages = len(page_files)
+    report.style_sets = len(style_groups)
+    return bundle
+
+
+def write_bundle(source_dir, out_dir, generated, asset_urls=None, webfonts=None):
+    """Write the bundle; asset_urls (from deck_assets) repoints images at their screen variants."""
+    path = os.path.join(out_dir, BUNDLE_NAME)
+    report = BundleReport(path)
+    bundle = render_bundle(deck_files(source_dir, out_dir, generated), report, webfonts)
+    if asset_urls:
+        bundle = deck_assets.rewrite_urls(bundle, asset_urls)
+    data = bundle.encode('utf-8')
+    report.bundle_bytes = len(data)
+
+    try:
+        with open(path, 'rb') as f:
+            unchanged = f.read() == data
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(path, 'wb') as f:
+            f.write(data)
+        report.written = True
+    return report
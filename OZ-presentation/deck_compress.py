@@ -0,0 +1,137 @@
+"""Precompressed build outputs and the manifest a static server serves them with.
+
+Every HTML, CSS and SVG file in the output directory gets .gz and .br
+siblings (brotli is optional; without it only .gz is written). A sibling is
+kept only when it is smaller than the original. SERVE_MANIFEST lists every
+served file with its content type, byte sizes, strong ETags and a
+Cache-Control value: content-hashed names (deck.<hash>.css, assets/,
+webfonts/) are immutable, everything else must be revalidated.
+"""
+
+import glob
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from deck_build import load_manifest, save_manifest
+
+SERVE_MANIFEST = 'deck-serve.json'
+COMPRESSIBLE = ('.html', '.css', '.svg', '.js', '.json')
+SERVED = COMPRESSIBLE + ('.png', '.jpg', '.pdf', '.woff2', '.woff')
+# Served files are looked for here, relative to the output directory
+SERVED_PATTERNS = ('*', 'assets/*', 'webfonts/*')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+_HASHED_NAME = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTENT_TYPES = {'.svg': 'image/svg+xml', '.js': 'text/javascript', '.json': 'application/json',
+                 '.woff2': 'font/woff2', '.woff': 'font/woff'}
+
+
+def encoders():
+    """Content-Encoding -> (file suffix, compress function) for what is available."""
+    available = {'gzip': ('.gz', lambda data: gzip.compress(data, 9, mtime=0))}
+    if brotli is not None:
+        available['br'] = ('.br', lambda data: brotli.compress(data, quality=11))
+    return available
+
+
+def content_type(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in CONTENT_TYPES:
+        return CONTENT_TYPES[ext]
+    guessed = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    return guessed + '; charset=utf-8' if guessed.startswith('text/') else guessed
+
+
+def cache_control(name):
+    return IMMUTABLE if _HASHED_NAME.search(name) else REVALIDATE
+
+
+def served_files(out_dir):
+    files = []
+    for pattern in SERVED_PATTERNS:
+        for path in glob.glob(os.path.join(out_dir, pattern)):
+            name = os.path.relpath(path, out_dir).replace(os.sep, '/')
+            if os.path.isfile(path) and name.endswith(SERVED) and name != SERVE_MANIFEST:
+                files.append(name)
+    return sorted(files)
+
+
+class CompressReport:
+    def __init__(self, path):
+        self.path = path
+        self.files = 0
+        self.compressed = []
+        self.cached = 0
+        self.removed = []
+        self.bytes = 0
+        # Bytes a client downloads when it accepts every encoding we wrote
+        self.best_bytes = 0
+        self.encodings = ()
+
+
+def precompress(out_dir):
+    path = os.path.join(out_dir, SERVE_MANIFEST)
+    previous = load_manifest(path).get('files', {})
+    available = encoders()
+    manifest = {'files': {}}
+    report = CompressReport(path)
+    report.encodings = tuple(available)
+
+    for name in served_files(out_dir):
+        full_path = os.path.join(out_dir, name)
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        entry = {
+            'bytes': len(data),
+            'cache_control': cache_control(name),
+            'content_type': content_type(name),
+            'etag': f'"{digest[:16]}"',
+            'encodings': {},
+        }
+
+        old = previous.get(name, {})
+        if name.endswith(COMPRESSIBLE):
+            for encoding, (suffix, compress) in available.items():
+                old_variant = old.get('encodings', {}).get(encoding)
+                if old.get('etag') == entry['etag'] and old_variant and os.path.exists(full_path + suffix):
+                    entry['encodings'][encoding] = old_variant
+                    report.cached += 1
+                    continue
+                packed = compress(data)
+                if len(packed) >= len(data):
+                    continue
+                with open(full_path + suffix, 'wb') as f:
+                    f.write(packed)
+                # Each representation needs its own strong ETag
+                entry['encodings'][encoding] = {
+                    'path': name + suffix, 'bytes': len(packed), 'etag': f'"{digest[:16]}-{encoding}"'}
+                report.compressed.append(name + suffix)
+
+        manifest['files'][name] = entry
+        report.files += 1
+        report.bytes += len(data)
+        report.best_bytes += min([len(data)] + [v['bytes'] for v in entry['encodings'].values()])
+
+    # Siblings of files that are gone or that no longer compress
+    for name, old in previous.items():
+        kept = manifest['files'].get(name, {}).get('encodings', {})
+        for encoding, variant in old.get('encodings', {}).items():
+            if encoding not in kept:
+                sibling = os.path.join(out_dir, variant['path'])
+                if os.path.exists(sibling):
+                    os.remove(sibling)
+                report.removed.append(variant['path'])
+
+    save_manifest(path, manifest)
+    return report
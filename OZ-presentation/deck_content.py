@@ -0,0 +1,204 @@
+"""Page content kept as data files, loaded through a pre-parsed cache.
+
+Each generated page has one file in content/, named like its output page:
+
+    ---
+    title: 2. What Are Opportunity Zones?
+    ---
+    <h3>Definition and Purpose</h3>
+    <p>...</p>
+
+The front matter is validated against content/schema.json. The body is
+written flush left and is indented by the loader to sit inside the page
+wrapper, so the rendered pages keep their layout. The shared styles live in
+content/common.css, and fragments shared between pages in content/partials/
+(see deck_partials).
+
+Parsed pages are pickled to CACHE_NAME. An entry is reused when the file's
+mtime and size are unchanged, or when its bytes hash the same after a
+touch. load(only=...) opens only the requested files.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import textwrap
+
+import deck_partials
+
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content')
+SCHEMA_NAME = 'schema.json'
+STYLES_NAME = 'common.css'
+CACHE_NAME = '.deck-content.pickle'
+PAGE_PATTERN_PREFIX = 'page-'
+CACHE_VERSION = 1
+
+# Indentation of page bodies inside the wrapper, and of rules inside <style>
+CONTENT_INDENT = ' ' * 8
+STYLES_INDENT = ' ' * 4
+
+_TYPES = {'string': str, 'integer': int, 'number': (int, float), 'boolean': bool}
+
+
+class ContentError(ValueError):
+    pass
+
+
+def validate(data, schema, where):
+    """Check front matter against the subset of JSON Schema the content schema uses."""
+    for key in schema.get('required', ()):
+        if key not in data:
+            raise ContentError(f"{where}: missing required field '{key}'")
+    properties = schema.get('properties', {})
+    for key, value in data.items():
+        rules = properties.get(key)
+        if rules is None:
+            if schema.get('additionalProperties', True) is False:
+                raise ContentError(f"{where}: unknown field '{key}' (allowed: {', '.join(sorted(properties))})")
+            continue
+        expected = _TYPES.get(rules.get('type'))
+        if expected and not isinstance(value, expected):
+            raise ContentError(f"{where}: '{key}' must be a {rules['type']}")
+        if isinstance(value, str) and len(value.strip()) < rules.get('minLength', 0):
+            raise ContentError(f"{where}: '{key}' must not be empty")
+        if 'enum' in rules and value not in rules['enum']:
+            raise ContentError(f"{where}: '{key}' must be one of {', '.join(map(str, rules['enum']))}")
+
+
+def parse_page(text, where):
+    """(front matter dict, body) from a content file."""
+    lines = text.split('\n')
+    if not lines or lines[0].strip() != '---':
+        raise ContentError(f"{where}: must start with a '---' front matter block")
+    front = {}
+    for number, line in enumerate(lines[1:], 2):
+        if line.strip() == '---':
+            return front, '\n'.join(lines[number:])
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        key, sep, value = line.partition(':')
+        if not sep:
+            raise ContentError(f"{where}:{number}: expected 'field: value'")
+        front[key.strip()] = value.strip()
+    raise ContentError(f"{where}: front matter is not closed with '---'")
+
+
+def page_from_file(text, schema, where):
+    front, body = parse_page(text, where)
+    validate(front, schema, where)
+    if not body.strip():
+        raise ContentError(f"{where}: the page has no content")
+    content = '\n' + textwrap.indent(body.rstrip('\n') + '\n', CONTENT_INDENT, lambda line: True) + CONTENT_INDENT
+    return dict(front, content=content)
+
+
+def styles_from_file(css):
+    return '\n<style>\n' + textwrap.indent(css, STYLES_INDENT, lambda line: True) + '</style>\n'
+
+
+def page_name(name):
+    """Output filename for a page given as 'page-14-eligibility' or 'page-14-eligibility.html'."""
+    name = os.path.basename(name)
+    return name if name.endswith('.html') else name + '.html'
+
+
+class LoadReport:
+    # Files of the last load() taken from CACHE_NAME, and files read and parsed
+    def __init__(self):
+        self.cached = 0
+        self.parsed = 0
+
+
+class ContentStore:
+    def __init__(self, content_dir=CONTENT_DIR, cache_path=None):
+        self.content_dir = content_dir
+        self.cache_path = cache_path or os.path.join(content_dir, CACHE_NAME)
+        self.report = LoadReport()
+        self.partials = deck_partials.PartialReport()
+        self._schema = None
+        self._cache = None
+        self._dirty = False
+
+    def names(self):
+        return sorted(name for name in os.listdir(self.content_dir)
+                      if name.startswith(PAGE_PATTERN_PREFIX) and name.endswith('.html'))
+
+    @property
+    def schema(self):
+        if self._schema is None:
+            with open(os.path.join(self.content_dir, SCHEMA_NAME), 'r', encoding='utf-8') as f:
+                self._schema = json.load(f)
+        return self._schema
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cache = pickle.load(f)
+            if cache.get('version') == CACHE_VERSION:
+                return cache
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            pass
+        return {'version': CACHE_VERSION, 'entries': {}}
+
+    def _read(self, name, parse):
+        """Parsed value of one file, through the cache."""
+        if self._cache is None:
+            self._cache = self._load_cache()
+        entries = self._cache['entries']
+        path = os.path.join(self.content_dir, name)
+        info = os.stat(path)
+        entry = entries.get(name)
+        if entry and entry['mtime'] == info.st_mtime_ns and entry['size'] == info.st_size:
+            self.report.cached += 1
+            return entry['value']
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry and entry['sha256'] == digest:
+            # Touched but unchanged
+            self.report.cached += 1
+            value = entry['value']
+        else:
+            self.report.parsed += 1
+            value = parse(data.decode('utf-8'), os.path.relpath(path))
+        entries[name] = {'mtime': info.st_mtime_ns, 'size': info.st_size, 'sha256': digest, 'value': value}
+        self._dirty = True
+        return value
+
+    def load(self, only=None):
+        """(pages dict in deck order, shared styles); only limits which pages are read."""
+        self.report = LoadReport()
+        if only:
+            names = sorted({page_name(name) for name in only})
+            missing = [name for name in names if not os.path.exists(os.path.join(self.content_dir, name))]
+            if missing:
+                raise ContentError(f"No content file for {', '.join(missing)} in {self.content_dir}")
+        else:
+            names = self.names()
+        partials = deck_partials.Partials(lambda partial: self._read(
+            f'{deck_partials.PARTIALS_DIR}/{partial}.html', lambda text, where: text))
+        pages = {}
+        for name in names:
+            page_data = self._read(name, lambda text, where: page_from_file(text, self.schema, where))
+            try:
+                pages[name] = dict(page_data, content=partials.expand(page_data['content']))
+            except deck_partials.PartialError as e:
+                raise ContentError(f"{name}: {e}") from None
+        self.partials = partials.report
+        styles = self._read(STYLES_NAME, lambda text, where: styles_from_file(text))
+        self.save()
+        return pages, styles
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self._cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not write the content cache {self.cache_path}: {e}")
+        self._dirty = False
@@ -0,0 +1,154 @@
+"""Just enough CSS handling for the deck: parse, match against pages, re-emit.
+
+Only the constructs the deck's stylesheets use are understood: plain rules,
+one level of ``@media`` nesting, and selectors built from tags, classes, ids
+and descendant/child combinators. Pseudo-classes and attribute selectors are
+ignored when matching, which errs on the side of keeping a rule.
+"""
+
+import re
+from collections import namedtuple
+
+Rule = namedtuple('Rule', 'selectors body media')
+
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_STYLE_BLOCK = re.compile(r'<style[^>]*>(.*?)</style>', re.S | re.I)
+_COMPOUND = re.compile(r'([a-zA-Z][\w-]*|\*)?((?:[.#][\w-]+)*)')
+_PSEUDO = re.compile(r'::?[\w-]+(\([^)]*\))?|\[[^\]]*\]')
+
+
+def extract_style_blocks(html):
+    """Return the concatenated contents of every <style> block in html."""
+    return '\n'.join(_STYLE_BLOCK.findall(html))
+
+
+def strip_style_blocks(html):
+    return _STYLE_BLOCK.sub('', html)
+
+
+def _normalize_declaration(declaration):
+    prop, _, value = declaration.partition(':')
+    return f"{prop.strip()}: {' '.join(value.split())}"
+
+
+def _normalize_body(body):
+    declarations = [d.strip() for d in body.split(';')]
+    return '; '.join(_normalize_declaration(d) for d in declarations if d)
+
+
+def _matching_brace(css, start):
+    depth = 0
+    for i in range(start, len(css)):
+        if css[i] == '{':
+            depth += 1
+        elif css[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(css)
+
+
+def parse_stylesheet(css, media=None):
+    """Parse css (with or without surrounding <style> tags) into Rules."""
+    if '<style' in css:
+        css = extract_style_blocks(css)
+    css = _COMMENT.sub('', css)
+    rules = []
+    pos = 0
+    while True:
+        open_brace = css.find('{', pos)
+        if open_brace == -1:
+            break
+        prelude = ' '.join(css[pos:open_brace].split())
+        if prelude.startswith('@'):
+            close_brace = _matching_brace(css, open_brace)
+            if prelude.startswith('@media'):
+                rules.extend(parse_stylesheet(css[open_brace + 1:close_brace], media=prelude))
+            pos = close_brace + 1
+            continue
+        close_brace = css.find('}', open_brace)
+        if close_brace == -1:
+            close_brace = len(css)
+        selectors = tuple(' '.join(s.split()) for s in prelude.split(',') if s.strip())
+        body = _normalize_body(css[open_brace + 1:close_brace])
+        if selectors and body:
+            rules.append(Rule(selectors, body, media))
+        pos = close_brace + 1
+    return rules
+
+
+def _compact_declaration(declaration):
+    prop, _, value = declaration.partition(':')
+    return f'{prop.strip()}:{value.strip()}'
+
+
+def format_rules(rules, indent='    ', compact=False):
+    """Serialize rules back to CSS, grouping consecutive rules per media query.
+
+    compact=True emits one rule per line without optional whitespace, for
+    styles inlined into pages.
+    """
+    lines = []
+    current_media = None
+    for rule in rules:
+        if rule.media != current_media:
+            if current_media is not None:
+                lines.append('}')
+            if rule.media is not None:
+                lines.append(f'{rule.media}{{' if compact else f'{rule.media} {{')
+            current_media = rule.media
+        declarations = rule.body.split('; ')
+        if compact:
+            body = ';'.join(_compact_declaration(d) for d in declarations)
+            lines.append(f"{','.join(rule.selectors)}{{{body}}}")
+            continue
+        pad = indent if rule.media is not None else ''
+        body = ''.join(f'{pad}{indent}{d};\n' for d in declarations)
+        lines.append(f"{pad}{', '.join(rule.selectors)} {{\n{body}{pad}}}")
+    if current_media is not None:
+        lines.append('}')
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def _compound_matches(compound, element):
+    compound = _PSEUDO.sub('', compound)
+    match = _COMPOUND.fullmatch(compound)
+    if match is None:
+        # Something we do not understand: assume it matches
+        return True
+    tag, qualifiers = match.groups()
+    if tag and tag != '*' and tag != element.tag:
+        return False
+    for qualifier in re.findall(r'[.#][\w-]+', qualifiers):
+        if qualifier[0] == '.' and qualifier[1:] not in element.classes:
+            return False
+        if qualifier[0] == '#' and element.attrs.get('id') != qualifier[1:]:
+            return False
+    return True
+
+
+def selector_matches(selector, element):
+    parts = selector.replace('>', ' > ').split()
+    if not parts or not _compound_matches(parts[-1], element):
+        return False
+    node = element.parent
+    i = len(parts) - 2
+    while i >= 0:
+        child_only = parts[i] == '>'
+        if child_only:
+            i -= 1
+        while node is not None and node.tag != '#root':
+            if _compound_matches(parts[i], node):
+                break
+            if child_only:
+                return False
+            node = node.parent
+        else:
+            return False
+        node = node.parent
+        i -= 1
+    return True
+
+
+def rule_matches(rule, elements):
+    return any(selector_matches(s, e) for s in rule.selectors for e in elements)
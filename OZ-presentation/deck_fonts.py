@@ -0,0 +1,354 @@
+"""Font metrics and embedding data for the Python PDF export.
+
+The deck uses Playfair Display and Inter. When their TrueType files are in
+the fonts directory they are parsed here (pure Python, no fontTools) for
+exact advance widths and embedded in the PDF, cut down to the glyphs the
+PDF uses (see subset_for_pdf). Without them the export falls back to the PDF
+base-14 fonts with their standard metrics, which keeps the text vector and
+selectable but not in the deck's typefaces.
+"""
+
+import glob
+import hashlib
+import os
+import re
+import struct
+from functools import lru_cache
+
+import deck_subset
+
+FONTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+# Subset fonts for PDF embedding, kept next to the PDF between exports
+SUBSET_CACHE = '.deck-fonts'
+
+WEIGHT_NAMES = {
+    100: 'thin', 200: 'extralight', 300: 'light', 400: 'regular', 500: 'medium',
+    600: 'semibold', 700: 'bold', 800: 'extrabold', 900: 'black',
+}
+
+# Advance widths (1/1000 em) for chr(32)..chr(126) of the base-14 fallbacks
+_BASE14_WIDTHS = {
+    'Helvetica': (
+        '278 278 355 556 556 889 667 191 333 333 389 584 278 333 278 278 556 556 556 556 '
+        '556 556 556 556 556 556 278 278 584 584 584 556 1015 667 667 722 722 667 611 778 '
+        '722 278 500 667 556 833 722 778 667 778 722 667 611 722 667 944 667 667 611 278 '
+        '278 278 469 556 333 556 556 500 556 556 278 556 556 222 222 500 222 833 556 556 '
+        '556 556 333 500 278 556 500 722 500 500 500 334 260 334 584'
+    ),
+    'Helvetica-Bold': (
+        '278 333 474 556 556 889 722 238 333 333 389 584 278 333 278 278 556 556 556 556 '
+        '556 556 556 556 556 556 333 333 584 584 584 611 975 722 722 722 722 667 611 778 '
+        '722 278 556 722 611 833 722 778 667 778 722 667 611 722 667 944 667 667 611 333 '
+        '278 333 584 556 333 556 611 556 611 556 333 611 611 278 278 556 278 889 611 611 '
+        '611 611 389 556 333 611 556 778 556 556 500 389 280 389 584'
+    ),
+    'Times-Roman': (
+        '250 333 408 500 500 833 778 180 333 333 500 564 250 333 250 278 500 500 500 500 '
+        '500 500 500 500 500 500 278 278 564 564 564 444 921 722 667 667 722 611 556 722 '
+        '722 333 389 722 611 889 722 722 556 722 667 556 611 722 722 944 722 722 611 333 '
+        '278 333 469 500 333 444 500 444 500 444 333 500 500 278 278 500 278 778 500 500 '
+        '500 500 333 389 278 500 500 722 500 500 444 480 200 480 541'
+    ),
+    'Times-Bold': (
+        '250 333 555 500 500 1000 833 278 333 333 500 570 250 333 250 278 500 500 500 500 '
+        '500 500 500 500 500 500 333 333 570 570 570 500 930 722 667 722 722 667 611 778 '
+        '778 389 500 778 667 944 722 778 611 778 722 556 667 722 722 1000 722 722 667 333 '
+        '278 333 581 500 333 500 556 444 556 444 333 500 556 278 333 556 278 833 556 500 '
+        '556 556 444 389 333 556 500 722 500 500 444 394 220 394 520'
+    ),
+}
+_BASE14_EXTENTS = {
+    # (ascent, descent, cap height) in 1/1000 em
+    'Helvetica': (718, -207, 718),
+    'Helvetica-Bold': (718, -207, 718),
+    'Times-Roman': (683, -217, 662),
+    'Times-Bold': (683, -217, 676),
+}
+_SERIF_FAMILIES = {'playfair display', 'serif', 'georgia', 'times', 'times new roman'}
+
+
+class Base14Font:
+    """A standard PDF font; nothing to embed, text is WinAnsi encoded."""
+
+    embedded = False
+
+    def __init__(self, name):
+        self.name = name
+        self.postscript_name = name
+        widths = [int(w) for w in _BASE14_WIDTHS[name].split()]
+        self._widths = {chr(32 + i): w for i, w in enumerate(widths)}
+        self._default_width = self._widths['n']
+        self.ascent, self.descent, self.cap_height = _BASE14_EXTENTS[name]
+
+    def char_width(self, char):
+        return self._widths.get(char, self._default_width)
+
+    def encode(self, text):
+        return text.encode('cp1252', errors='replace')
+
+
+class TrueTypeFont:
+    """Metrics, cmap and raw bytes of a glyf-flavoured TrueType font."""
+
+    embedded = True
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self.path = path
+        if self.data[:4] not in (b'\x00\x01\x00\x00', b'true'):
+            raise ValueError(f"{path}: only TrueType outlines can be embedded")
+
+        num_tables = struct.unpack_from('>H', self.data, 4)[0]
+        self.tables = {}
+        for i in range(num_tables):
+            tag, _, offset, length = struct.unpack_from('>4sIII', self.data, 12 + 16 * i)
+            self.tables[tag.decode('latin-1')] = (offset, length)
+
+        head = self.table_offset('head')
+        self.units_per_em = struct.unpack_from('>H', self.data, head + 18)[0]
+        self.bbox = struct.unpack_from('>4h', self.data, head + 36)
+        self.index_to_loc_format = struct.unpack_from('>h', self.data, head + 50)[0]
+
+        hhea = self.table_offset('hhea')
+        ascender, descender = struct.unpack_from('>hh', self.data, hhea + 4)
+        num_hmetrics = struct.unpack_from('>H', self.data, hhea + 34)[0]
+        self.num_glyphs = struct.unpack_from('>H', self.data, self.table_offset('maxp') + 4)[0]
+
+        hmtx = self.table_offset('hmtx')
+        self.advances = list(struct.unpack_from(f'>{num_hmetrics * 2}h', self.data, hmtx)[0::2])
+        self.advances = [a & 0xFFFF for a in self.advances]
+        self.advances += [self.advances[-1]] * (self.num_glyphs - num_hmetrics)
+
+        self.cap_height = ascender
+        self.weight = 400
+        if 'OS/2' in self.tables:
+            os2 = self.table_offset('OS/2')
+            version = struct.unpack_from('>H', self.data, os2)[0]
+            self.weight = struct.unpack_from('>H', self.data, os2 + 4)[0]
+            if version >= 2:
+                self.cap_height = struct.unpack_from('>h', self.data, os2 + 88)[0]
+        self.italic_angle = 0
+        if 'post' in self.tables:
+            self.italic_angle = struct.unpack_from('>i', self.data, self.table_offset('post') + 4)[0] / 65536
+
+        scale = 1000 / self.units_per_em
+        self.ascent = round(ascender * scale)
+        self.descent = round(descender * scale)
+        self.cap_height = round(self.cap_height * scale)
+        self.bbox_1000 = [round(v * scale) for v in self.bbox]
+        self.cmap = self._read_cmap()
+        postscript_name = self._read_name(6)
+        self.postscript_name = (re.sub(r'[^\x21-\x7e]|[\[\]()<>{}/%]', '', postscript_name or '')
+                                or os.path.splitext(os.path.basename(path))[0])
+        self.name = self.postscript_name
+        # Typographic family first: "Inter" rather than "Inter SemiBold"
+        self.family_name = self._read_name(16) or self._read_name(1) or self.postscript_name
+
+    def table_offset(self, tag):
+        if tag not in self.tables:
+            raise ValueError(f"{self.path}: missing '{tag}' table")
+        return self.tables[tag][0]
+
+    def table(self, tag):
+        offset, length = self.tables[tag]
+        return self.data[offset:offset + length]
+
+    def _read_cmap(self):
+        cmap = self.table_offset('cmap')
+        num_subtables = struct.unpack_from('>H', self.data, cmap + 2)[0]
+        candidates = {}
+        for i in range(num_subtables):
+            platform, encoding, offset = struct.unpack_from('>HHI', self.data, cmap + 4 + 8 * i)
+            subtable = cmap + offset
+            fmt = struct.unpack_from('>H', self.data, subtable)[0]
+            candidates[(platform, encoding, fmt)] = subtable
+        for key in ((3, 10, 12), (0, 4, 12), (3, 1, 4), (0, 3, 4)):
+            if key in candidates:
+                if key[2] == 12:
+                    return self._cmap_format12(candidates[key])
+                return self._cmap_format4(candidates[key])
+        raise ValueError(f"{self.path}: no Unicode cmap")
+
+    def _cmap_format4(self, offset):
+        data = self.data
+        seg_count = struct.unpack_from('>H', data, offset + 6)[0] // 2
+        ends = struct.unpack_from(f'>{seg_count}H', data, offset + 14)
+        starts_at = offset + 16 + 2 * seg_count
+        starts = struct.unpack_from(f'>{seg_count}H', data, starts_at)
+        deltas = struct.unpack_from(f'>{seg_count}h', data, starts_at + 2 * seg_count)
+        range_offsets_at = starts_at + 4 * seg_count
+        range_offsets = struct.unpack_from(f'>{seg_count}H', data, range_offsets_at)
+        cmap = {}
+        for i in range(seg_count):
+            for code in range(starts[i], ends[i] + 1):
+                if code == 0xFFFF:
+                    continue
+                if range_offsets[i] == 0:
+                    gid = (code + deltas[i]) & 0xFFFF
+                else:
+                    at = range_offsets_at + 2 * i + range_offsets[i] + 2 * (code - starts[i])
+                    gid = struct.unpack_from('>H', data, at)[0]
+                    if gid:
+                        gid = (gid + deltas[i]) & 0xFFFF
+                if gid:
+                    cmap[code] = gid
+        return cmap
+
+    def _cmap_format12(self, offset):
+        num_groups = struct.unpack_from('>I', self.data, offset + 12)[0]
+        cmap = {}
+        for i in range(num_groups):
+            start, end, gid = struct.unpack_from('>III', self.data, offset + 16 + 12 * i)
+            for code in range(start, end + 1):
+                cmap[code] = gid + code - start
+        return cmap
+
+    def _read_name(self, wanted_id):
+        if 'name' not in self.tables:
+            return None
+        name = self.table_offset('name')
+        count, string_offset = struct.unpack_from('>HH', self.data, name + 2)
+        for i in range(count):
+            platform, encoding, _, name_id, length, offset = struct.unpack_from(
+                '>6H', self.data, name + 6 + 12 * i)
+            if name_id != wanted_id:
+                continue
+            raw = self.data[name + string_offset + offset:name + string_offset + offset + length]
+            text = raw.decode('utf-16-be' if platform in (0, 3) else 'latin-1', errors='ignore').strip()
+            return text or None
+        return None
+
+    def glyph_id(self, char):
+        return self.cmap.get(ord(char), 0)
+
+    def char_width(self, char):
+        return self.advances[self.glyph_id(char)] * 1000 // self.units_per_em
+
+    def glyph_width(self, gid):
+        return self.advances[gid] * 1000 // self.units_per_em
+
+    def encode(self, text):
+        # Identity-H: two bytes per glyph id
+        return b''.join(struct.pack('>H', self.glyph_id(char)) for char in text)
+
+
+def subset_for_pdf(font, gids, cache_dir=None):
+    """(subset tag, TrueType bytes) of font with only gids, glyph ids unchanged.
+
+    Subsets are cached in cache_dir by font and glyph set. Older subsets of
+    the same font are removed, so the cache holds one file per font.
+    """
+    digest = hashlib.sha256(font.data)
+    digest.update(','.join(str(gid) for gid in sorted(gids)).encode('ascii'))
+    key = digest.hexdigest()[:16]
+    # PDF subset fonts carry a six-letter tag before their name
+    tag = ''.join(chr(ord('A') + int(c, 16) % 26) for c in key[:6])
+    path = os.path.join(cache_dir, f'{font.postscript_name}.{key}.ttf') if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return tag, f.read()
+
+    data = deck_subset.subset_font(font, gids=gids, retain_gids=True)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        for old in glob.glob(os.path.join(glob.escape(cache_dir), f'{glob.escape(font.postscript_name)}.*.ttf')):
+            os.remove(old)
+        with open(path, 'wb') as f:
+            f.write(data)
+    return tag, data
+
+
+@lru_cache(maxsize=4096)
+def _word_width(font, word):
+    return sum(font.char_width(char) for char in word)
+
+
+def text_width(font, text, size):
+    """Width of text in points; per-word results are cached across calls."""
+    return _word_width(font, text) * size / 1000
+
+
+def _normalize(name):
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+class FontSet:
+    """Resolves CSS font-family/weight pairs to fonts, preferring files in fonts_dir."""
+
+    def __init__(self, fonts_dir=FONTS_DIR):
+        self.fonts_dir = fonts_dir
+        self._files = sorted(glob.glob(os.path.join(fonts_dir, '*.ttf'))) if os.path.isdir(fonts_dir) else []
+        self._cache = {}
+
+    @property
+    def fingerprint(self):
+        """Changes whenever the set of font files or their contents change."""
+        parts = [f'{os.path.basename(path)}:{os.path.getsize(path)}:{os.path.getmtime(path)}' for path in self._files]
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+    def _find_file(self, family, weight):
+        key = _normalize(family)
+        matches = []
+        for path in self._files:
+            stem = _normalize(os.path.splitext(os.path.basename(path))[0])
+            if not stem.startswith(key) or 'italic' in stem:
+                continue
+            style = re.sub(r'^\d+pt', '', stem[len(key):]) or 'regular'
+            for file_weight, name in WEIGHT_NAMES.items():
+                if style == name:
+                    matches.append((abs(file_weight - weight), path))
+                    break
+            else:
+                # Variable or oddly named file: usable, but a poor match
+                matches.append((1000, path))
+        return min(matches)[1] if matches else None
+
+    def resolve(self, families, weight=400):
+        """Font for a CSS font-family list such as "'Inter', sans-serif"."""
+        names = [f.strip().strip('\'"') for f in families.split(',') if f.strip()]
+        bold = weight >= 600
+        key = (tuple(names), bold if not self._files else weight)
+        if key in self._cache:
+            return self._cache[key]
+
+        font = None
+        for name in names:
+            path = self._find_file(name, weight) if self._files else None
+            if path:
+                font = _load_truetype(path)
+                break
+        if font is None:
+            serif = any(name.lower() in _SERIF_FAMILIES for name in names)
+            base = ('Times' if serif else 'Helvetica')
+            font = _base14(f'{base}-Bold' if bold else ('Times-Roman' if serif else 'Helvetica'))
+        self._cache[key] = font
+        return font
+
+    def has_family(self, family):
+        """Whether fonts_dir holds a file for family, rather than it falling back to base-14."""
+        return bool(self._files) and self._find_file(family, 400) is not None
+
+    @property
+    def embedding(self):
+        return bool(self._files)
+
+
+def font_id(font):
+    """A string that names font across runs: its file, or the standard font's name."""
+    return font.path if font.embedded else font.name
+
+
+def load_font(font_id):
+    """The font font_id() named; the same object the FontSet resolves to."""
+    return _load_truetype(font_id) if font_id.lower().endswith('.ttf') else _base14(font_id)
+
+
+@lru_cache(maxsize=None)
+def _load_truetype(path):
+    return TrueTypeFont(path)
+
+
+@lru_cache(maxsize=None)
+def _base14(name):
+    return Base14Font(name)
@@ -0,0 +1,145 @@
+"""Lightweight HTML tree for the deck's page fragments.
+
+The pages are small, trusted fragments, so a forgiving stdlib parser is
+enough: unclosed tags are closed by their nearest matching end tag and void
+elements never take children.
+"""
+
+import re
+from html import unescape
+from html.parser import HTMLParser
+
+VOID_TAGS = frozenset({
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'source', 'track', 'wbr',
+})
+
+
+class Element:
+    __slots__ = ('tag', 'attrs', 'classes', 'parent', 'children')
+
+    def __init__(self, tag, attrs=(), parent=None):
+        self.tag = tag
+        self.attrs = dict(attrs)
+        self.classes = frozenset((self.attrs.get('class') or '').split())
+        self.parent = parent
+        # Mixed list of Element and str, in document order
+        self.children = []
+
+    def __repr__(self):
+        return f"<Element {self.tag} {sorted(self.classes)}>"
+
+    def iter(self):
+        yield self
+        for child in self.children:
+            if isinstance(child, Element):
+                yield from child.iter()
+
+    def elements(self):
+        return [child for child in self.children if isinstance(child, Element)]
+
+    def text(self):
+        parts = []
+        for child in self.children:
+            parts.append(child.text() if isinstance(child, Element) else child)
+        return ''.join(parts)
+
+    def find(self, tag=None, cls=None):
+        for element in self.iter():
+            if (tag is None or element.tag == tag) and (cls is None or cls in element.classes):
+                return element
+        return None
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Element('#root')
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, attrs, self.current)
+        self.current.children.append(element)
+        if tag not in VOID_TAGS:
+            self.current = element
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(Element(tag, attrs, self.current))
+
+    def handle_endtag(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def parse_html(html, root=None):
+    """Tree of html; with root, its elements are added to root's children instead."""
+    builder = _TreeBuilder()
+    if root is not None:
+        builder.root = builder.current = root
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def visible_text(html):
+    """Text a reader sees in a page: no tags, styles or scripts, whitespace collapsed."""
+    return ' '.join(unescape(_TAG.sub(' ', _HIDDEN.sub(' ', html))).split())
+
+
+_HIDDEN = re.compile(r'<(style|script)\b.*?</\1\s*>', re.S | re.I)
+_TAG = re.compile(r'<[^>]*>')
+_NEWLINE = re.compile('\n')
+
+
+class _BlockSpans(HTMLParser):
+    """Records the source of every top-level element of a fragment."""
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.html = html
+        self.line_starts = [0] + [match.end() for match in _NEWLINE.finditer(html)]
+        self.open = []
+        self.start = 0
+        self.spans = []
+
+    def _offset(self):
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def _close(self):
+        end = self.html.index('>', self._offset()) + 1
+        self.spans.append(self.html[self.start:end])
+
+    def handle_starttag(self, tag, attrs):
+        if not self.open:
+            self.start = self._offset()
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+        elif not self.open:
+            self._close()
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.open:
+            self.start = self._offset()
+            self._close()
+
+    def handle_endtag(self, tag):
+        if tag in self.open:
+            while self.open.pop() != tag:
+                pass
+            if not self.open:
+                self._close()
+
+
+def top_level_blocks(html):
+    """Source text of each top-level element, in order; text between them is dropped."""
+    spans = _BlockSpans(html)
+    spans.feed(html)
+    spans.close()
+    return spans.spans
@@ -0,0 +1,641 @@
+"""Block layout for the deck's constrained HTML/CSS subset.
+
+Pages are laid out the way index.html shows them: a 140mm x 198mm frame with
+the viewer's padding and base rules, followed by the page's own <style>
+blocks. Supported: block and inline flow with sibling margin collapsing,
+margins, padding, borders, background colours, text-align, text-shadow,
+simple flex rows/columns and equal-column grids. Everything is measured in
+points with a top-left origin; the result is a list of drawing operations
+that deck_pdf turns into a content stream.
+"""
+
+import re
+
+import deck_css
+from deck_fonts import FontSet, text_width
+from deck_html import Element, parse_html
+
+PX = 0.75
+MM = 72 / 25.4
+
+# The viewer's .page-frame and .page-content box
+FRAME_WIDTH = 140 * MM
+FRAME_HEIGHT = 198 * MM
+FRAME_PADDING = (25 * PX, 20 * PX, 60 * PX, 20 * PX)
+
+# index.html rules that apply underneath every page's own styles
+VIEWER_STYLES = '''
+* { margin: 0; padding: 0; }
+.page-content { font-family: 'Inter', sans-serif; font-size: 12pt; color: #000; }
+.page-content h2 { font-size: 24pt; font-family: 'Playfair Display', serif; font-weight: 700; color: #000; margin-bottom: 15px; }
+.page-content h3 { font-size: 16pt; font-family: 'Playfair Display', serif; font-weight: 600; color: #000; margin-bottom: 10px; }
+.page-content p { font-size: 11pt; font-family: 'Inter', sans-serif; color: #000; line-height: 1.4; margin-bottom: 10px; }
+'''
+
+BLOCK_TAGS = frozenset({
+    'div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article', 'header',
+    'footer', 'nav', 'ul', 'ol', 'li', 'table', 'tr', 'blockquote', 'img', 'hr',
+})
+SKIPPED_TAGS = frozenset({'style', 'script', 'link', 'meta', 'title', 'head'})
+HEADING_SCALE = {'h1': 2.0, 'h2': 1.5, 'h3': 1.17, 'h4': 1.0, 'h5': 0.83, 'h6': 0.67}
+
+NAMED_COLORS = {
+    'black': (0, 0, 0), 'white': (1, 1, 1), 'red': (1, 0, 0), 'green': (0, 0.5, 0),
+    'blue': (0, 0, 1), 'gray': (0.5, 0.5, 0.5), 'grey': (0.5, 0.5, 0.5), 'transparent': None,
+}
+_COLOR = re.compile(r'#[0-9a-fA-F]{3,8}\b|rgba?\([^)]*\)|\b(?:' + '|'.join(NAMED_COLORS) + r')\b')
+_LENGTH = re.compile(r'^(-?[\d.]+)(px|pt|mm|cm|in|em|rem|%)?$')
+
+
+def parse_color(value):
+    """CSS colour to an (r, g, b) tuple in 0..1, alpha blended onto white."""
+    value = value.strip().lower()
+    if value in NAMED_COLORS:
+        return NAMED_COLORS[value]
+    if value.startswith('#'):
+        digits = value[1:]
+        if len(digits) in (3, 4):
+            digits = ''.join(c * 2 for c in digits)
+        r, g, b = (int(digits[i:i + 2], 16) / 255 for i in (0, 2, 4))
+        return (r, g, b)
+    if value.startswith('rgb'):
+        parts = [p.strip() for p in value[value.index('(') + 1:-1].split(',')]
+        r, g, b = (float(p.rstrip('%')) / (100 if p.endswith('%') else 255) for p in parts[:3])
+        alpha = float(parts[3]) if len(parts) > 3 else 1.0
+        return tuple(c * alpha + (1 - alpha) for c in (r, g, b))
+    return None
+
+
+def find_color(value):
+    match = _COLOR.search(value)
+    return parse_color(match.group(0)) if match else None
+
+
+def to_points(value, font_size=12.0, reference=None):
+    """Length to points; None for auto or anything unsupported."""
+    value = value.strip()
+    if value in ('0', '0px'):
+        return 0.0
+    match = _LENGTH.match(value)
+    if not match:
+        return None
+    number, unit = float(match.group(1)), match.group(2)
+    if unit in (None, 'px'):
+        return number * PX
+    if unit == 'pt':
+        return number
+    if unit == 'mm':
+        return number * MM
+    if unit == 'cm':
+        return number * MM * 10
+    if unit == 'in':
+        return number * 72
+    if unit in ('em', 'rem'):
+        return number * font_size
+    if unit == '%':
+        return number * reference / 100 if reference is not None else None
+    return None
+
+
+def _box_sides(value, font_size):
+    parts = [to_points(p, font_size) or 0.0 for p in value.split()]
+    if not parts:
+        return [0.0] * 4
+    while len(parts) < 4:
+        parts.append(parts[{1: 0, 2: 0, 3: 1}[len(parts)]])
+    return parts[:4]
+
+
+def _border(value, font_size):
+    width, style, color = 1.0 * PX, 'solid', (0, 0, 0)
+    for token in re.findall(r'rgba?\([^)]*\)|\S+', value):
+        if token in ('none', 'hidden'):
+            return None
+        if token in ('solid', 'dotted', 'dashed', 'double'):
+            style = token
+        elif to_points(token, font_size) is not None:
+            width = to_points(token, font_size)
+        elif parse_color(token) is not None:
+            color = parse_color(token)
+    return (width, style, color) if width > 0 else None
+
+
+def specificity(selector):
+    selector = re.sub(r'::?[\w-]+(\([^)]*\))?', ' ', selector)
+    ids = selector.count('#')
+    classes = selector.count('.') + selector.count('[')
+    tags = len(re.findall(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)', selector))
+    return (ids, classes, tags)
+
+
+class Style:
+    """Computed values for one element."""
+
+    __slots__ = ('display', 'font_family', 'font_size', 'font_weight', 'line_height', 'color',
+                 'text_align', 'text_shadow', 'margin', 'padding', 'borders', 'background',
+                 'radius', 'width', 'height', 'flex_direction', 'justify', 'gap', 'grid_columns')
+
+    def line_height_pt(self):
+        kind, value = self.line_height
+        return value * self.font_size if kind == 'factor' else value
+
+
+class Stylesheet:
+    """Matches rules to elements and computes the inherited style of each."""
+
+    def __init__(self, css):
+        self.rules = []
+        for order, rule in enumerate(deck_css.parse_stylesheet(css)):
+            if rule.media is not None:
+                # Media queries target phones; the export lays out at frame size
+                continue
+            declarations = {}
+            for declaration in rule.body.split('; '):
+                prop, _, value = declaration.partition(':')
+                declarations[prop.strip().lower()] = value.strip()
+            for selector in rule.selectors:
+                self.rules.append((specificity(selector), order, selector, declarations))
+        self.rules.sort(key=lambda r: (r[0], r[1]))
+
+    def declarations(self, element):
+        merged = {}
+        for _, _, selector, declarations in self.rules:
+            if deck_css.selector_matches(selector, element):
+                merged.update(declarations)
+        return merged
+
+    def compute(self, element, parent):
+        declared = self.declarations(element)
+        style = Style()
+        tag = element.tag
+
+        style.font_family = declared.get('font-family', parent.font_family)
+        size = declared.get('font-size')
+        style.font_size = parent.font_size
+        if size:
+            style.font_size = to_points(size, parent.font_size, parent.font_size) or parent.font_size
+        elif tag in HEADING_SCALE:
+            style.font_size = parent.font_size * HEADING_SCALE[tag]
+
+        weight = declared.get('font-weight', '')
+        if weight.isdigit():
+            style.font_weight = int(weight)
+        elif weight in ('bold', 'bolder'):
+            style.font_weight = 700
+        elif weight == 'normal':
+            style.font_weight = 400
+        elif tag in HEADING_SCALE or tag in ('strong', 'b'):
+            style.font_weight = 700
+        else:
+            style.font_weight = parent.font_weight
+
+        line_height = declared.get('line-height')
+        style.line_height = parent.line_height
+        if line_height == 'normal':
+            style.line_height = ('factor', 1.2)
+        elif line_height:
+            try:
+                style.line_height = ('factor', float(line_height))
+            except ValueError:
+                absolute = to_points(line_height, style.font_size, style.font_size)
+                if absolute is not None:
+                    style.line_height = ('absolute', absolute)
+
+        style.color = parse_color(declared['color']) if 'color' in declared else parent.color
+        style.color = style.color or parent.color
+        style.text_align = declared.get('text-align', parent.text_align)
+        style.text_shadow = parent.text_shadow
+        if 'text-shadow' in declared:
+            style.text_shadow = self._shadow(declared['text-shadow'], style.font_size)
+
+        display = declared.get('display')
+        if display is None:
+            display = 'block' if tag in BLOCK_TAGS else 'inline'
+        style.display = display
+        style.flex_direction = declared.get('flex-direction', 'row')
+        style.justify = declared.get('justify-content', 'flex-start')
+        style.gap = to_points(declared.get('gap', '0').split()[0], style.font_size) or 0.0
+        style.grid_columns = self._grid_columns(declared.get('grid-template-columns', ''))
+
+        style.margin = _box_sides(declared.get('margin', '0'), style.font_size)
+        style.padding = _box_sides(declared.get('padding', '0'), style.font_size)
+        for i, side in enumerate(('top', 'right', 'bottom', 'left')):
+            for prop, target in (('margin', style.margin), ('padding', style.padding)):
+                value = declared.get(f'{prop}-{side}')
+                if value is not None:
+                    target[i] = to_points(value, style.font_size) or 0.0
+
+        style.borders = {}
+        if 'border' in declared:
+            border = _border(declared['border'], style.font_size)
+            style.borders = {side: border for side in ('top', 'right', 'bottom', 'left') if border}
+        for side in ('top', 'right', 'bottom', 'left'):
+            if f'border-{side}' in declared:
+                border = _border(declared[f'border-{side}'], style.font_size)
+                if border:
+                    style.borders[side] = border
+                else:
+                    style.borders.pop(side, None)
+
+        background = declared.get('background-color') or declared.get('background', '')
+        style.background = None if 'gradient' in background else find_color(background)
+        style.radius = to_points(declared.get('border-radius', '0').split()[0], style.font_size) or 0.0
+        style.width = declared.get('width')
+        style.height = declared.get('height')
+        return style
+
+    @staticmethod
+    def _shadow(value, font_size):
+        if value == 'none':
+            return None
+        color = find_color(value) or (0, 0, 0)
+        offsets = [to_points(v, font_size) for v in _COLOR.sub('', value).split()]
+        offsets = [v for v in offsets if v is not None]
+        if len(offsets) < 2:
+            return None
+        return (offsets[0], offsets[1], color)
+
+    @staticmethod
+    def _grid_columns(value):
+        repeat = re.match(r'repeat\(\s*(\d+)', value)
+        if repeat:
+            return int(repeat.group(1))
+        return len(value.split()) or 1
+
+
+def root_style():
+    style = Style()
+    style.display = 'block'
+    style.font_family = "'Inter', sans-serif"
+    style.font_size = 12.0
+    style.font_weight = 400
+    style.line_height = ('factor', 1.2)
+    style.color = (0, 0, 0)
+    style.text_align = 'left'
+    style.text_shadow = None
+    style.margin = [0.0] * 4
+    style.padding = [0.0] * 4
+    style.borders = {}
+    style.background = None
+    style.radius = 0.0
+    style.width = style.height = None
+    style.flex_direction = 'row'
+    style.justify = 'flex-start'
+    style.gap = 0.0
+    style.grid_columns = 1
+    return style
+
+
+def ops_bottom(ops):
+    """Lowest point drawn by ops (text counts down to its descender)."""
+    bottom = 0.0
+    for op in ops:
+        if op[0] == 'text':
+            bottom = max(bottom, op[2] - op[3].descent * op[4] / 1000)
+        else:
+            bottom = max(bottom, op[2] + op[4])
+    return bottom
+
+
+class PageLayout:
+    def __init__(self, ops, content_bottom, frame_bottom, title):
+        # ops: ('rect', x, y, w, h, fill, radius) | ('dash', x, y, w, h, color)
+        #      | ('text', x, baseline, font, size, color, text)
+        self.ops = ops
+        self.content_bottom = content_bottom
+        self.overflow = max(0.0, content_bottom - frame_bottom)
+        self.title = title
+
+
+def _shift(ops, dx, dy):
+    # Every operation starts with (kind, x, y, ...)
+    return [(op[0], op[1] + dx, op[2] + dy) + op[3:] for op in ops]
+
+
+def copy_style(style, **changes):
+    copy = Style()
+    for name in Style.__slots__:
+        setattr(copy, name, changes.get(name, getattr(style, name)))
+    return copy
+
+
+class LayoutEngine:
+    def __init__(self, fonts=None):
+        self.fonts = fonts or FontSet()
+
+    def font(self, style):
+        return self.fonts.resolve(style.font_family, style.font_weight)
+
+    # -- pages ------------------------------------------------------------
+
+    def layout_page(self, page_html, width=FRAME_WIDTH, height=FRAME_HEIGHT, padding=FRAME_PADDING):
+        """Lay out one page fragment inside the viewer frame."""
+        css = VIEWER_STYLES + deck_css.extract_style_blocks(page_html)
+        markup = deck_css.strip_style_blocks(page_html)
+        self.sheet = Stylesheet(css)
+
+        frame = Element('div', [('class', 'page-content')])
+        frame.children = parse_html(markup).children
+        for child in frame.children:
+            if isinstance(child, Element):
+                child.parent = frame
+
+        top, right, bottom, left = padding
+        inner_height = height - top - bottom
+        style = self.sheet.compute(frame, root_style())
+        _, ops = self.flow(frame, style, left, top, width - left - right, inner_height)
+        return PageLayout(ops, ops_bottom(ops), height - bottom, self._title(frame))
+
+    def block_boxes(self, page_html, width=FRAME_WIDTH, padding=FRAME_PADDING):
+        """(item, margin-top, height, margin-bottom) for each top-level block of a page's .content-page.
+
+        Margins are returned separately so callers can re-stack the blocks
+        in another order or onto another page and still collapse them.
+        """
+        css = VIEWER_STYLES + deck_css.extract_style_blocks(page_html)
+        self.sheet = Stylesheet(css)
+        frame = Element('div', [('class', 'page-content')])
+        frame.children = parse_html(deck_css.strip_style_blocks(page_html)).children
+        for child in frame.children:
+            if isinstance(child, Element):
+                child.parent = frame
+        frame_style = self.sheet.compute(frame, root_style())
+        page = frame.find('div', 'content-page') or frame
+        page_style = self.sheet.compute(page, frame_style) if page is not frame else frame_style
+        inner_width = width - padding[1] - padding[3]
+
+        boxes = []
+        for kind, item, style in self._items(page, page_style):
+            if kind == 'inline':
+                height, _ = self.inline(item, page_style, 0, 0, inner_width)
+                # Whitespace between blocks makes no line box
+                if height:
+                    boxes.append((item, 0.0, height, 0.0))
+            else:
+                height, _ = self.block(item, style, 0, 0, inner_width, None)
+                boxes.append((item, style.margin[0], height, style.margin[2]))
+        return boxes
+
+    @staticmethod
+    def _title(frame):
+        for tag in ('h1', 'h2'):
+            heading = frame.find(tag)
+            if heading is not None:
+                return ' '.join(heading.text().split())
+        return ''
+
+    # -- flow -------------------------------------------------------------
+
+    def _items(self, parent, style):
+        """Group children into anonymous inline runs and styled blocks."""
+        items = []
+        inline = []
+        for child in parent.children:
+            if isinstance(child, Element):
+                if child.tag in SKIPPED_TAGS:
+                    continue
+                child_style = self.sheet.compute(child, style)
+                if child_style.display == 'none':
+                    continue
+                if child_style.display != 'inline' or child.tag == 'img':
+                    if inline:
+                        items.append(('inline', inline, None))
+                        inline = []
+                    items.append(('block', child, child_style))
+                    continue
+                inline.append((child, child_style))
+            else:
+                inline.append((child, style))
+        if inline:
+            items.append(('inline', inline, None))
+        return items
+
+    def flow(self, parent, style, x, y, width, cb_height):
+        """Lay out parent's children top to bottom; returns (height, ops)."""
+        ops = []
+        cursor = y
+        prev_bottom = 0.0
+        for kind, item, child_style in self._items(parent, style):
+            if kind == 'inline':
+                height, line_ops = self.inline(item, style, x, cursor + prev_bottom, width)
+                if height:
+                    ops.extend(line_ops)
+                    cursor += prev_bottom + height
+                    prev_bottom = 0.0
+                continue
+            gap = max(prev_bottom, child_style.margin[0])
+            height, block_ops = self.block(item, child_style, x, cursor + gap, width, cb_height)
+            ops.extend(block_ops)
+            cursor += gap + height
+            prev_bottom = child_style.margin[2]
+        return cursor + prev_bottom - y, ops
+
+    def block(self, element, style, x, y, width, cb_height):
+        """Lay out one block box at (x, y); returns (border-box height, ops)."""
+        mt, mr, mb, ml = style.margin
+        pt, pr, pb, pl = style.padding
+        borders = style.borders
+        bt = borders['top'][0] if 'top' in borders else 0.0
+        br = borders['right'][0] if 'right' in borders else 0.0
+        bb = borders['bottom'][0] if 'bottom' in borders else 0.0
+        bl = borders['left'][0] if 'left' in borders else 0.0
+
+        box_x = x + ml
+        box_width = width - ml - mr
+        if style.width:
+            # The viewer sets box-sizing: border-box on everything
+            declared = to_points(style.width, style.font_size, box_width)
+            if declared is not None:
+                box_width = min(declared, box_width)
+        inner_x = box_x + bl + pl
+        inner_y = y + bt + pt
+        inner_width = max(0.0, box_width - bl - br - pl - pr)
+
+        declared_height = None
+        if style.height:
+            declared_height = to_points(style.height, style.font_size, cb_height)
+
+        if element.tag == 'img':
+            return self.image_placeholder(element, style, box_x, y, box_width, declared_height)
+
+        if style.display in ('flex', 'inline-flex') and style.flex_direction.startswith('row'):
+            content_height, ops = self.columns(element, style, inner_x, inner_y, inner_width, cb_height,
+                                               columns=None)
+        elif style.display in ('grid', 'inline-grid'):
+            content_height, ops = self.columns(element, style, inner_x, inner_y, inner_width, cb_height,
+                                               columns=style.grid_columns)
+        else:
+            child_cb = declared_height - pt - pb - bt - bb if declared_height is not None else cb_height
+            content_height, ops = self.flow(element, style, inner_x, inner_y, inner_width, child_cb)
+
+        height = bt + pt + content_height + pb + bb
+        if declared_height is not None:
+            if style.display == 'flex' and style.justify == 'center':
+                ops = _shift(ops, 0, max(0.0, declared_height - height) / 2)
+            height = max(height, declared_height)
+
+        decoration = []
+        if style.background is not None:
+            decoration.append(('rect', box_x, y, box_width, height, style.background, style.radius))
+        for side, (border_width, border_style, color) in borders.items():
+            if side == 'top':
+                rect = (box_x, y, box_width, border_width)
+            elif side == 'bottom':
+                rect = (box_x, y + height - border_width, box_width, border_width)
+            elif side == 'left':
+                rect = (box_x, y, border_width, height)
+            else:
+                rect = (box_x + box_width - border_width, y, border_width, height)
+            if border_style in ('dotted', 'dashed'):
+                decoration.append(('dash',) + rect + (color,))
+            else:
+                decoration.append(('rect',) + rect + (color, 0.0))
+        return height, decoration + ops
+
+    def image_placeholder(self, element, style, x, y, width, height):
+        # Images are remote placeholders; draw a neutral panel captioned with the alt text
+        height = height if height is not None else 150 * PX
+        ops = [('rect', x, y, width, height, (0.94, 0.94, 0.94), style.radius)]
+        caption = copy_style(style, color=(0.4, 0.4, 0.4), text_align='center', text_shadow=None,
+                             font_size=9.0, font_weight=400, line_height=('factor', 1.2))
+        text_height, text_ops = self.inline([(element.attrs.get('alt', ''), caption)], caption,
+                                            x + 6, 0.0, width - 12)
+        ops.extend(_shift(text_ops, 0, y + (height - text_height) / 2))
+        return height, ops
+
+    def columns(self, element, style, x, y, width, cb_height, columns):
+        """Flex rows (columns=None: one column per child) and equal-column grids."""
+        children = [(item, child_style) for kind, item, child_style in self._items(element, style)
+                    if kind == 'block']
+        inline_items = [item for kind, item, _ in self._items(element, style) if kind == 'inline']
+        if not children:
+            return self.flow(element, style, x, y, width, cb_height)
+
+        per_row = columns or len(children)
+        gap = style.gap
+        column_width = (width - gap * (per_row - 1)) / per_row
+        ops = []
+        cursor = y
+        for row_start in range(0, len(children), per_row):
+            row = children[row_start:row_start + per_row]
+            row_height = 0.0
+            for i, (child, child_style) in enumerate(row):
+                if columns is None and style.justify == 'space-between' and i == len(row) - 1 and i > 0:
+                    child_style.text_align = 'right'
+                child_x = x + i * (column_width + gap)
+                height, child_ops = self.block(child, child_style, child_x, cursor + child_style.margin[0],
+                                               column_width, cb_height)
+                ops.extend(child_ops)
+                row_height = max(row_height, child_style.margin[0] + height + child_style.margin[2])
+            cursor += row_height + (gap if columns else 0.0)
+        if columns and len(children) > per_row:
+            cursor -= gap
+        for item in inline_items:
+            height, line_ops = self.inline(item, style, x, cursor, width)
+            ops.extend(line_ops)
+            cursor += height
+        return cursor - y, ops
+
+    # -- inline -----------------------------------------------------------
+
+    def _runs(self, nodes, runs):
+        for node, style in nodes:
+            if isinstance(node, Element):
+                if node.tag == 'br':
+                    runs.append(('\n', style))
+                elif node.tag not in SKIPPED_TAGS:
+                    children = []
+                    for child in node.children:
+                        if isinstance(child, Element):
+                            children.append((child, self.sheet.compute(child, style)))
+                        else:
+                            children.append((child, style))
+                    self._runs(children, runs)
+            else:
+                runs.append((node, style))
+        return runs
+
+    def inline(self, nodes, style, x, y, width):
+        """Break inline content into lines; returns (height, ops)."""
+        words = []
+        pending_space = False
+        for text, run_style in self._runs(nodes, []):
+            if text == '\n':
+                words.append(('\n', run_style, False))
+                pending_space = False
+                continue
+            if text[:1].isspace():
+                pending_space = True
+            parts = text.split()
+            for word in parts:
+                words.append((word, run_style, pending_space))
+                pending_space = True
+            if parts:
+                pending_space = text[-1].isspace()
+        if not any(word != '\n' for word, _, _ in words):
+            return 0.0, []
+
+        lines = [[]]
+        used = 0.0
+        for word, run_style, space in words:
+            if word == '\n':
+                lines.append([])
+                used = 0.0
+                continue
+            font = self.font(run_style)
+            word_width = text_width(font, word, run_style.font_size)
+            space_width = text_width(font, ' ', run_style.font_size) if space and lines[-1] else 0.0
+            if lines[-1] and used + space_width + word_width > width + 0.01:
+                lines.append([])
+                used = 0.0
+                space_width = 0.0
+            lines[-1].append((used + space_width, word, run_style, font, word_width, space_width > 0))
+            used += space_width + word_width
+
+        ops = []
+        cursor = y
+        strut = style.line_height_pt()
+        for line in lines:
+            if not line:
+                cursor += strut
+                continue
+            line_height = max([strut] + [item[2].line_height_pt() for item in line])
+            biggest = max(line, key=lambda item: item[2].font_size)
+            font, size = biggest[3], biggest[2].font_size
+            glyph_height = (font.ascent - font.descent) * size / 1000
+            baseline = cursor + (line_height - glyph_height) / 2 + font.ascent * size / 1000
+            line_width = line[-1][0] + line[-1][4]
+            offset = 0.0
+            if style.text_align == 'center':
+                offset = (width - line_width) / 2
+            elif style.text_align == 'right':
+                offset = width - line_width
+            ops.extend(self._line_ops(line, x + offset, baseline))
+            cursor += line_height
+        return cursor - y, ops
+
+    @staticmethod
+    def _line_ops(line, x, baseline):
+        # Merge neighbouring words drawn with the same font, size and colour
+        ops = []
+        start, text, style, font = None, '', None, None
+        for offset, word, word_style, word_font, _, space in line:
+            if style is not None and word_font is font and word_style.font_size == style.font_size \
+                    and word_style.color == style.color and word_style.text_shadow == style.text_shadow:
+                text += (' ' if space else '') + word
+                continue
+            if style is not None:
+                ops.extend(_text_ops(x + start, baseline, font, style, text))
+            start, text, style, font = offset, word, word_style, word_font
+        if style is not None:
+            ops.extend(_text_ops(x + start, baseline, font, style, text))
+        return ops
+
+
+def _text_ops(x, baseline, font, style, text):
+    ops = []
+    if style.text_shadow:
+        dx, dy, color = style.text_shadow
+        ops.append(('text', x + dx, baseline + dy, font, style.font_size, color, text))
+    ops.append(('text', x, baseline, font, style.font_size, style.color, text))
+    return ops
@@ -0,0 +1,356 @@
+"""Minify generated pages as they are written (generate-remaining-pages.py --minify).
+
+HtmlMinifier sits between a page template and its file: the template's
+chunks are rewritten as they arrive, and only an unfinished tag, run of
+text or <style> block is held back, never the whole page.
+
+- Whitespace: runs collapse to one space, and a run next to a block-level
+  tag is dropped, as the browser would render it. Comments are dropped;
+  <pre>, <textarea> and <script> pass through untouched.
+- <style> blocks: rules whose selectors match nothing in the page are left
+  out (see deck_css.selector_matches), declarations lose their optional
+  whitespace, four-sided values take their shortest form and a complete
+  set of longhands becomes the shorthand.
+- style="" attributes get the same declaration treatment.
+"""
+
+import io
+import re
+from functools import lru_cache
+
+import deck_css
+from deck_html import parse_html
+
+# Whitespace next to these tags never renders
+BLOCK_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'dd', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'head', 'header',
+    'hr', 'html', 'li', 'link', 'main', 'meta', 'nav', 'ol', 'p', 'section', 'table', 'tbody', 'td',
+    'tfoot', 'th', 'thead', 'title', 'tr', 'ul',
+})
+# Content kept as written; <style> content is minified as CSS instead
+RAW_TAGS = frozenset({'pre', 'textarea', 'script', 'style'})
+_RAW_END = {tag: re.compile(f'</{tag}', re.I) for tag in RAW_TAGS}
+
+_SPACE = re.compile(r'\s+')
+_TAG_START = re.compile(r'<[a-zA-Z/!]')
+_TAG_NAME = re.compile(r'</?([a-zA-Z][\w-]*)')
+_ATTR = re.compile(r'''\s*([^\s=>/"']+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?''')
+_COMBINATOR = re.compile(r'\s*([>+~])\s*')
+# Quoted strings are matched first so commas inside them are left alone
+_COMMA = re.compile(r'''("[^"]*"|'[^']*')|\s*,\s*''')
+_MEDIA_SPACE = re.compile(r'\s*([:,])\s*')
+_SELECTOR_TOKEN = re.compile(r'([.#]?)([a-zA-Z][\w-]*)')
+_ZERO_UNIT = re.compile(r'(?<![\w.#-])0(?:px|em|rem|pt|ex|ch|vw|vh|mm|cm|in)\b')
+_LEADING_ZERO = re.compile(r'(?<![\w.#-])0\.(\d)')
+_HEX_COLOR = re.compile(r'#([0-9a-fA-F])\1([0-9a-fA-F])\2([0-9a-fA-F])\3\b')
+
+# Four-sided shorthands and how their longhands are named
+BOX_SHORTHANDS = {
+    'margin': 'margin-{}',
+    'padding': 'padding-{}',
+    'border-width': 'border-{}-width',
+    'border-style': 'border-{}-style',
+    'border-color': 'border-{}-color',
+}
+SIDES = ('top', 'right', 'bottom', 'left')
+
+
+def page_elements(markup):
+    """Every element of a page, for matching its style rules against."""
+    return [element for element in parse_html(markup).iter() if element.tag != '#root']
+
+
+def minify_html(markup):
+    """markup minified in one go, for pages that are rendered to memory anyway."""
+    out = io.StringIO()
+    minifier = HtmlMinifier(out, page_elements(markup))
+    minifier.write(markup)
+    minifier.close()
+    return out.getvalue()
+
+
+def _shortest_sides(values):
+    """The shortest 1-4 value form of a top/right/bottom/left list."""
+    if len(values) == 1:
+        return values
+    top, right = values[0], values[1]
+    bottom = values[2] if len(values) > 2 else top
+    left = values[3] if len(values) > 3 else right
+    if left != right:
+        return [top, right, bottom, left]
+    if bottom != top:
+        return [top, right, bottom]
+    if right != top:
+        return [top, right]
+    return [top]
+
+
+def _compact_value(prop, value):
+    value = _COMMA.sub(lambda m: m.group(1) or ',', value)
+    if '"' in value or "'" in value or 'url(' in value:
+        return value
+    value = _HEX_COLOR.sub(lambda m: '#' + (m.group(1) + m.group(2) + m.group(3)).lower(), value)
+    value = _LEADING_ZERO.sub(r'.\1', value)
+    # A unitless zero is not allowed inside calc() and changes meaning in flex
+    if '(' not in value and not prop.startswith('flex'):
+        value = _ZERO_UNIT.sub('0', value)
+    if prop in BOX_SHORTHANDS and '(' not in value and '!' not in value and '/' not in value:
+        value = ' '.join(_shortest_sides(value.split()))
+    return value
+
+
+def compact_declarations(body):
+    """A declaration block ("a: b; c: d") in its shortest equivalent form."""
+    declarations = []
+    for declaration in body.split(';'):
+        prop, colon, value = declaration.partition(':')
+        prop = prop.strip().lower()
+        if colon and prop:
+            declarations.append([prop, ' '.join(value.split())])
+
+    props = [prop for prop, _ in declarations]
+    for shorthand, longhand in BOX_SHORTHANDS.items():
+        names = [longhand.format(side) for side in SIDES]
+        # Only a single, plain declaration of each side folds safely
+        if shorthand in props or any(props.count(name) != 1 for name in names):
+            continue
+        values = [declarations[props.index(name)][1] for name in names]
+        if any(' ' in value or '!' in value for value in values):
+            continue
+        first = min(props.index(name) for name in names)
+        declarations[first] = [shorthand, ' '.join(values)]
+        declarations = [d for d in declarations if d[0] not in names]
+        props = [prop for prop, _ in declarations]
+
+    return ';'.join(f'{prop}:{_compact_value(prop, value)}' for prop, value in declarations)
+
+
+@lru_cache(maxsize=64)
+def _parse_css(css):
+    """(at-rules kept as written, Rules) of a style block; shared styles repeat on every page."""
+    css = deck_css._COMMENT.sub('', css)
+    kept = []
+    rest = []
+    pos = 0
+    # @media is understood by deck_css; other at-rules are passed through whole
+    for match in re.finditer(r'@(?!media\b)[\w-]+[^{;]*(?:;|\{)', css):
+        if match.start() < pos:
+            continue
+        end = match.end() if match.group(0).endswith(';') else deck_css._matching_brace(css, match.end() - 1) + 1
+        rest.append(css[pos:match.start()])
+        kept.append(' '.join(css[match.start():end].split()))
+        pos = end
+    rest.append(css[pos:])
+    return tuple(kept), tuple(deck_css.parse_stylesheet(''.join(rest)))
+
+
+class _SelectorIndex:
+    """Classes, ids and tags present in a page, to rule out most selectors without matching."""
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.names = {'': set(), '.': set(), '#': set()}
+        for element in elements:
+            self.names[''].add(element.tag)
+            self.names['.'].update(element.classes)
+            if 'id' in element.attrs:
+                self.names['#'].add(element.attrs['id'])
+
+    def used(self, selector):
+        # Sibling combinators are not understood by deck_css, so keep them
+        if '+' in selector or '~' in selector:
+            return True
+        plain = deck_css._PSEUDO.sub('', selector)
+        if any(name not in self.names[kind] for kind, name in _SELECTOR_TOKEN.findall(plain)):
+            return False
+        return any(deck_css.selector_matches(selector, element) for element in self.elements)
+
+
+def _format_rules(rules):
+    # deck_css.format_rules(compact=True), without the newlines
+    out = []
+    media = None
+    for rule in rules:
+        if rule.media != media:
+            if media is not None:
+                out.append('}')
+            if rule.media is not None:
+                out.append(_MEDIA_SPACE.sub(r'\1', rule.media) + '{')
+            media = rule.media
+        selectors = ','.join(_COMBINATOR.sub(r'\1', selector) for selector in rule.selectors)
+        out.append(f'{selectors}{{{rule.body}}}')
+    if media is not None:
+        out.append('}')
+    return ''.join(out)
+
+
+def minify_css(css, elements=None):
+    """css as compact rules; with elements, rules that match none of them are left out."""
+    kept, rules = _parse_css(css)
+    index = _SelectorIndex(elements) if elements is not None else None
+    used = []
+    for rule in rules:
+        selectors = rule.selectors if index is None else tuple(s for s in rule.selectors if index.used(s))
+        body = compact_declarations(rule.body)
+        if selectors and body:
+            used.append(deck_css.Rule(selectors, body, rule.media))
+    return ''.join(kept) + _format_rules(used)
+
+
+def minify_tag(tag):
+    """A start or end tag without optional whitespace, with its style="" compacted."""
+    name = _TAG_NAME.match(tag)
+    if name is None:
+        return tag
+    closing = tag.startswith('</')
+    if closing:
+        return f'</{name.group(1)}>'
+    self_closing = tag.rstrip('>').rstrip().endswith('/')
+    inner = tag[name.end():len(tag) - 1].rstrip().rstrip('/')
+    parts = [f'<{name.group(1)}']
+    for attr, value in _ATTR.findall(inner):
+        if value and attr.lower() == 'style':
+            quote = value[0] if value[0] in '"\'' else ''
+            value = f'{quote}{compact_declarations(value.strip(quote))}{quote}'
+        parts.append(f' {attr}={value}' if value else f' {attr}')
+    return ''.join(parts) + ('/>' if self_closing else '>')
+
+
+def _tag_end(text, start):
+    """Index of the '>' closing the tag at start, or -1 while it is incomplete."""
+    quote = None
+    for i in range(start + 1, len(text)):
+        char = text[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '>':
+            return i
+    return -1
+
+
+class HtmlMinifier:
+    """File-like wrapper that minifies what is written through it; call close() at the end.
+
+    elements are the page's elements, for leaving out unused CSS rules;
+    None keeps every rule.
+    """
+
+    def __init__(self, out, elements=None):
+        self.out = out
+        self.elements = elements
+        self.pending = ''
+        # Whitespace seen since the last token, and whether that token was block-level
+        self.space = False
+        self.after_block = True
+        # Name of the raw element being read, e.g. 'style', and where in pending
+        # to resume looking for its end tag
+        self.raw = None
+        self.raw_scan = 0
+        # Chunks of raw content written since, joined to pending once an end
+        # tag arrives so a long <style> block is not copied on every write
+        self.held = []
+        self.tail = ''
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, text):
+        self.bytes_in += len(text.encode('utf-8'))
+        if self.raw:
+            window = self.tail + text
+            if not _RAW_END[self.raw].search(window):
+                self.held.append(text)
+                self.tail = window[-len(self.raw) - 1:]
+                return
+            text = ''.join(self.held) + text
+            self.held = []
+        self.pending += text
+        self._drain(final=False)
+
+    def close(self):
+        self.pending += ''.join(self.held)
+        self.held = []
+        self._drain(final=True)
+
+    def _emit(self, text):
+        if text:
+            self.bytes_out += len(text.encode('utf-8'))
+            self.out.write(text)
+
+    def _drain(self, final):
+        text = self.pending
+        pos = 0
+        while pos < len(text):
+            if self.raw:
+                match = _RAW_END[self.raw].search(text, max(pos, self.raw_scan))
+                if match is None and not final:
+                    # Rescan only the tail an end tag split across writes could start in
+                    self.raw_scan = max(pos, len(text) - len(self.raw) - 1)
+                    self.tail = text[self.raw_scan:]
+                    break
+                end = len(text) if match is None else match.start()
+                content = text[pos:end]
+                self._emit(minify_css(content, self.elements) if self.raw == 'style' else content)
+                self.raw = None
+                self.raw_scan = 0
+                pos = end
+                continue
+            if text.startswith('<!--', pos):
+                end = text.find('-->', pos + 4)
+                if end == -1 and not final:
+                    break
+                pos = len(text) if end == -1 else end + 3
+                continue
+            if text[pos] == '<' and pos + 1 == len(text) and not final:
+                break
+            if _TAG_START.match(text, pos):
+                end = _tag_end(text, pos)
+                if end == -1:
+                    if not final:
+                        break
+                    end = len(text) - 1
+                self._tag(text[pos:end + 1])
+                pos = end + 1
+                continue
+            end = text.find('<', pos + 1)
+            if end == -1:
+                if not final:
+                    break
+                end = len(text)
+            self._text(text[pos:end])
+            pos = end
+        self.pending = text[pos:]
+        self.raw_scan = max(0, self.raw_scan - pos)
+
+    def _text(self, text):
+        text = _SPACE.sub(' ', text)
+        if text.startswith(' '):
+            self.space = True
+            text = text[1:]
+        if not text:
+            return
+        if self.space and not self.after_block:
+            self._emit(' ')
+        trailing = text.endswith(' ')
+        self._emit(text[:-1] if trailing else text)
+        self.space = trailing
+        self.after_block = False
+
+    def _tag(self, tag):
+        name = _TAG_NAME.match(tag)
+        if name is None:
+            # <!DOCTYPE ...> and the like
+            self._emit(tag)
+            return
+        name = name.group(1).lower()
+        block = name in BLOCK_TAGS
+        if self.space and not block and not self.after_block:
+            self._emit(' ')
+        self.space = False
+        self._emit(minify_tag(tag))
+        self.after_block = block
+        if name in RAW_TAGS and not tag.startswith('</') and not tag.endswith('/>'):
+            self.raw = name
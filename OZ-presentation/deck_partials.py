@@ -0,0 +1,145 @@
+"""Partials: fragments written once in content/partials/ and used by many pages.
+
+A page includes a fragment anywhere in its text:
+
+    <p>Gains are deferred until {{> deferral-deadline }}.</p>
+    {{> disclaimer }}
+
+Scaffolding that wraps page text is used as a block. The lines inside fill
+the partial's {{ body }} slot and the named values fill its other slots:
+
+    {{# callout-box title="Tax-Free Appreciation" }}
+    <p>After 10 years, ...</p>
+    {{/ callout-box }}
+
+Partial files are deck_templates templates and may use other partials. A
+multi-line fragment takes the indentation of the line it is used on, and a
+block's body takes the indentation of the {{ body }} slot, so expanded pages
+read as if written out by hand.
+
+Each distinct use (partial, values, body) is rendered once per build and the
+same string is spliced into every page that repeats it.
+"""
+
+import re
+import textwrap
+from collections import Counter
+
+from deck_templates import compile_template
+
+PARTIALS_DIR = 'partials'
+
+_DIRECTIVE = re.compile(r'\{\{\s*([>#/])\s*([\w-]+)((?:\s+\w+="[^"]*")*)\s*\}\}')
+_VALUE = re.compile(r'(\w+)="([^"]*)"')
+_BODY_SLOT = re.compile(r'^([ \t]*).*?\{\{\s*body\s*\}\}', re.M)
+
+
+class PartialError(ValueError):
+    pass
+
+
+class PartialReport:
+    def __init__(self):
+        # Partial name -> number of uses
+        self.uses = Counter()
+        self.renders = 0
+        # Bytes the uses expand to, and bytes of the directives that stand in for them
+        self.expanded_bytes = 0
+        self.directive_bytes = 0
+
+    @property
+    def saved_bytes(self):
+        return self.expanded_bytes - self.directive_bytes
+
+
+def _line_indent(text, pos):
+    start = text.rfind('\n', 0, pos) + 1
+    line = text[start:pos]
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _block_body(body):
+    # Drop the line breaks around the body and its own indentation
+    lines = body.split('\n')
+    if lines and not lines[0].strip():
+        lines = lines[1:]
+    if lines and not lines[-1].strip():
+        lines = lines[:-1]
+    return textwrap.dedent('\n'.join(lines))
+
+
+class Partials:
+    def __init__(self, read):
+        # read(name) -> source of partials/<name>.html, raising OSError when missing
+        self._read = read
+        self._templates = {}
+        self._rendered = {}
+        self.report = PartialReport()
+
+    def template(self, name, stack):
+        if name in stack:
+            raise PartialError(f"Partial '{name}' includes itself ({' -> '.join(stack + (name,))})")
+        if name not in self._templates:
+            try:
+                source = self._read(name)
+            except OSError:
+                raise PartialError(f"No partial named '{name}' in {PARTIALS_DIR}/") from None
+            source = self.expand(source.rstrip('\n'), stack + (name,), count=False)
+            match = _BODY_SLOT.search(source)
+            self._templates[name] = (compile_template(source), match.group(1) if match else '')
+        return self._templates[name]
+
+    def render(self, name, values, body, indent, stack):
+        key = (name, values, body, indent)
+        if key not in self._rendered:
+            template, body_indent = self.template(name, stack)
+            context = dict(values)
+            if body is not None:
+                context['body'] = self.expand(body, stack, count=False).replace('\n', '\n' + body_indent)
+            missing = sorted(template.slots - set(context))
+            if missing:
+                raise PartialError(f"Partial '{name}' needs a value for {', '.join(missing)}")
+            self.report.renders += 1
+            self._rendered[key] = template.render(context).replace('\n', '\n' + indent)
+        return self._rendered[key]
+
+    def expand(self, text, stack=(), count=True):
+        """text with every partial directive replaced by its rendering."""
+        out = []
+        pos = 0
+        while True:
+            match = _DIRECTIVE.search(text, pos)
+            if match is None:
+                break
+            kind, name = match.group(1), match.group(2)
+            if kind == '/':
+                raise PartialError(f"'{match.group(0)}' closes a block that was never opened")
+            body = None
+            end = match.end()
+            if kind == '#':
+                close = self._find_close(text, match, name)
+                body = _block_body(text[match.end():close.start()])
+                end = close.end()
+            values = tuple(sorted(_VALUE.findall(match.group(3))))
+            rendered = self.render(name, values, body, _line_indent(text, match.start()), stack)
+            if count:
+                self.report.uses[name] += 1
+                self.report.expanded_bytes += len(rendered.encode('utf-8'))
+                self.report.directive_bytes += len(text[match.start():end].encode('utf-8'))
+            out.append(text[pos:match.start()])
+            out.append(rendered)
+            pos = end
+        if not out:
+            return text
+        out.append(text[pos:])
+        return ''.join(out)
+
+    def _find_close(self, text, opening, name):
+        depth = 1
+        for match in _DIRECTIVE.finditer(text, opening.end()):
+            if match.group(2) != name or match.group(1) == '>':
+                continue
+            depth += 1 if match.group(1) == '#' else -1
+            if depth == 0:
+                return match
+        raise PartialError(f"'{opening.group(0)}' is never closed with '{{{{/ {name} }}}}'")
@@ -0,0 +1,501 @@
+"""Vector PDF export of the deck, without a browser.
+
+Each page is laid out by deck_layout in the viewer's 140mm x 198mm frame and
+scaled onto A4, the same framing combine-pdf.html uses. Text stays text:
+TrueType fonts from the fonts directory are embedded as CID fonts with a
+ToUnicode map, so the PDF is searchable and copyable. Only the glyphs the
+PDF uses are embedded, from subsets cached in deck_fonts.SUBSET_CACHE. Page titles become
+outline entries and page labels carry the page ids.
+
+Laying a page out is most of the export's time, so each rendered page is
+kept in PAGE_CACHE: its compressed content stream, the glyphs it shows, its
+title and its overflow. An entry is keyed by the page's HTML and by what
+every page is drawn with (fonts, logo, background), and the next export
+only lays out pages whose key changed. The re-encoded background is kept
+there too. The document around the pages
+(fonts, outlines, page labels) is assembled again from the entries each
+time, so it always matches the current deck order.
+
+The shared background image is optional: it needs Pillow to re-encode the
+PNG, and the export runs without it.
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import time
+import zlib
+
+import deck_profile
+from deck_fonts import SUBSET_CACHE, FontSet, font_id, load_font, subset_for_pdf
+from deck_html import parse_html
+from deck_layout import FRAME_HEIGHT, FRAME_WIDTH, PX, LayoutEngine, find_color
+
+A4_WIDTH = 595.28
+A4_HEIGHT = 841.89
+SCALE = A4_WIDTH / FRAME_WIDTH
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKGROUND_IMAGE = 'Background + Logo 2.png'
+LOGO_SVG = 'logo.svg'
+# Pixel density the background is re-encoded at
+BACKGROUND_DPI = 150
+PAGE_CACHE = '.deck-pdf.pickle'
+CACHE_VERSION = 1
+
+
+def _num(value):
+    text = f'{value:.3f}'.rstrip('0').rstrip('.')
+    return text if text not in ('-0', '') else '0'
+
+
+def pdf_string(text):
+    """Text string for outlines and the info dictionary (UTF-16 when needed)."""
+    try:
+        raw = text.encode('latin-1')
+        escaped = raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+        return b'(' + escaped + b')'
+    except UnicodeEncodeError:
+        return b'<FEFF' + text.encode('utf-16-be').hex().upper().encode('ascii') + b'>'
+
+
+class PdfWriter:
+    """Collects numbered objects and serializes them with a cross-reference table."""
+
+    def __init__(self):
+        self.objects = []
+
+    def reserve(self):
+        self.objects.append(None)
+        return len(self.objects)
+
+    def add(self, body):
+        self.objects.append(body)
+        return len(self.objects)
+
+    def set(self, ref, body):
+        self.objects[ref - 1] = body
+
+    def add_stream(self, data, entries=b'', compress=True):
+        if compress:
+            data = zlib.compress(data, 9)
+            entries += b' /Filter /FlateDecode'
+        return self.add(b'<< /Length %d%s >>\nstream\n' % (len(data), entries) + data + b'\nendstream')
+
+    def write(self, out, root, info):
+        out.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        position = 15
+        for number, body in enumerate(self.objects, 1):
+            chunk = b'%d 0 obj\n' % number + body + b'\nendobj\n'
+            offsets.append(position)
+            out.write(chunk)
+            position += len(chunk)
+        out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(self.objects) + 1))
+        for offset in offsets:
+            out.write(b'%010d 00000 n \n' % offset)
+        out.write(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                  % (len(self.objects) + 1, root, info, position))
+
+
+class FontResources:
+    """Assigns resource names to fonts and records the glyphs each page uses."""
+
+    def __init__(self, cache_dir=None):
+        self.names = {}
+        self.used = {}
+        self.cache_dir = cache_dir
+        # Bytes of font data embedded, and what the full fonts would have cost
+        self.embedded_bytes = 0
+        self.full_bytes = 0
+
+    def name(self, font):
+        if font not in self.names:
+            # Cached content streams refer to fonts by name, so names must not
+            # depend on the order fonts are first used in
+            self.names[font] = 'F' + hashlib.sha256(font_id(font).encode('utf-8')).hexdigest()[:8]
+            self.used[font] = {}
+        return self.names[font]
+
+    def add(self, font, used):
+        """Record glyphs a cached page shows with font."""
+        self.name(font)
+        for gid, char in used.items():
+            self.used[font].setdefault(gid, char)
+
+    def show(self, font, text):
+        used = self.used[font]
+        if font.embedded:
+            for char in text:
+                used.setdefault(font.glyph_id(char), char)
+        return font.encode(text).hex().encode('ascii')
+
+    def write(self, writer):
+        """Emit every font object; returns {resource name: object number}."""
+        refs = {}
+        for font, name in self.names.items():
+            refs[name] = self._embed(writer, font) if font.embedded else writer.add(
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                % font.name.encode('ascii'))
+        return refs
+
+    def _embed(self, writer, font):
+        used = self.used[font]
+        tag, data = subset_for_pdf(font, used, self.cache_dir)
+        self.embedded_bytes += len(data)
+        self.full_bytes += len(font.data)
+        ps_name = f'{tag}+{font.postscript_name}'.encode('ascii')
+        font_file = writer.add_stream(data, b' /Length1 %d' % len(data))
+        flags = 32 | (64 if font.italic_angle else 0)
+        descriptor = writer.add(
+            b'<< /Type /FontDescriptor /FontName /%s /Flags %d /FontBBox [%s] /ItalicAngle %s'
+            b' /Ascent %d /Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>' % (
+                ps_name, flags, ' '.join(str(v) for v in font.bbox_1000).encode('ascii'),
+                _num(font.italic_angle).encode('ascii'), font.ascent, font.descent,
+                font.cap_height, font_file))
+
+        widths = b' '.join(b'%d [%d]' % (gid, font.glyph_width(gid)) for gid in sorted(used))
+        cid_font = writer.add(
+            b'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s'
+            b' /CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >>'
+            b' /FontDescriptor %d 0 R /W [%s] /CIDToGIDMap /Identity >>' % (ps_name, descriptor, widths))
+        to_unicode = writer.add_stream(_to_unicode_cmap(used))
+        return writer.add(
+            b'<< /Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H'
+            b' /DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>' % (ps_name, cid_font, to_unicode))
+
+
+def _to_unicode_cmap(used):
+    entries = sorted(used.items())
+    lines = [
+        b'/CIDInit /ProcSet findresource begin', b'12 dict begin', b'begincmap',
+        b'/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def',
+        b'/CMapName /Adobe-Identity-UCS def', b'/CMapType 2 def',
+        b'1 begincodespacerange', b'<0000> <FFFF>', b'endcodespacerange',
+    ]
+    for start in range(0, len(entries), 100):
+        chunk = entries[start:start + 100]
+        lines.append(b'%d beginbfchar' % len(chunk))
+        for gid, char in chunk:
+            lines.append(b'<%04X> <%s>' % (gid, char.encode('utf-16-be').hex().upper().encode('ascii')))
+        lines.append(b'endbfchar')
+    lines += [b'endcmap', b'CMapName currentdict /CMap defineresource pop', b'end', b'end']
+    return b'\n'.join(lines)
+
+
+def _rounded_rect(x, y, w, h, r):
+    # Four Bezier corners; k approximates a quarter circle
+    r = min(r, w / 2, h / 2)
+    k = 0.5523 * r
+    points = [
+        f'{_num(x + r)} {_num(y)} m',
+        f'{_num(x + w - r)} {_num(y)} l',
+        f'{_num(x + w - r + k)} {_num(y)} {_num(x + w)} {_num(y + r - k)} {_num(x + w)} {_num(y + r)} c',
+        f'{_num(x + w)} {_num(y + h - r)} l',
+        f'{_num(x + w)} {_num(y + h - r + k)} {_num(x + w - r + k)} {_num(y + h)} {_num(x + w - r)} {_num(y + h)} c',
+        f'{_num(x + r)} {_num(y + h)} l',
+        f'{_num(x + r - k)} {_num(y + h)} {_num(x)} {_num(y + h - r + k)} {_num(x)} {_num(y + h - r)} c',
+        f'{_num(x)} {_num(y + r)} l',
+        f'{_num(x)} {_num(y + r - k)} {_num(x + r - k)} {_num(y)} {_num(x + r)} {_num(y)} c',
+    ]
+    return ' '.join(points) + ' h'
+
+
+def _color(rgb, op):
+    return ' '.join(_num(c) for c in rgb) + f' {op}'
+
+
+def content_stream(ops, fonts, background=None):
+    """PDF content for one page from frame-space ops (top-left origin, points)."""
+    out = [f'q {_num(SCALE)} 0 0 {_num(SCALE)} 0 0 cm']
+    if background is not None:
+        out.append(f'q {_num(FRAME_WIDTH)} 0 0 {_num(FRAME_HEIGHT)} 0 0 cm /{background} Do Q')
+    # Clip to the frame like the viewer's overflow: hidden
+    out.append(f'0 0 {_num(FRAME_WIDTH)} {_num(FRAME_HEIGHT)} re W n')
+    for op in ops:
+        kind = op[0]
+        if kind == 'rect':
+            _, x, y, w, h, fill, radius = op
+            top = FRAME_HEIGHT - y - h
+            path = _rounded_rect(x, top, w, h, radius) if radius else \
+                f'{_num(x)} {_num(top)} {_num(w)} {_num(h)} re'
+            out.append(f'{_color(fill, "rg")} {path} f')
+        elif kind == 'dash':
+            _, x, y, w, h, color = op
+            if w >= h:
+                mid = FRAME_HEIGHT - y - h / 2
+                line = f'{_num(x)} {_num(mid)} m {_num(x + w)} {_num(mid)} l'
+                width = h
+            else:
+                mid = x + w / 2
+                line = f'{_num(mid)} {_num(FRAME_HEIGHT - y)} m {_num(mid)} {_num(FRAME_HEIGHT - y - h)} l'
+                width = w
+            out.append(f'q {_color(color, "RG")} {_num(width)} w [{_num(width)} {_num(width)}] 0 d {line} S Q')
+        elif kind == 'text':
+            _, x, baseline, font, size, color, text = op
+            name = fonts.name(font)
+            encoded = fonts.show(font, text).decode('ascii')
+            out.append(f'BT /{name} {_num(size)} Tf {_color(color, "rg")} '
+                       f'1 0 0 1 {_num(x)} {_num(FRAME_HEIGHT - baseline)} Tm <{encoded}> Tj ET')
+    out.append('Q')
+    return '\n'.join(out).encode('ascii')
+
+
+def logo_ops(engine, svg_path):
+    """The footer logo, drawn from logo.svg's rect and text as vectors."""
+    try:
+        with open(svg_path, 'r', encoding='utf-8') as f:
+            svg = parse_html(f.read()).find('svg')
+    except OSError:
+        return []
+    if svg is None:
+        return []
+    view_width = float(svg.attrs.get('width', 120))
+    view_height = float(svg.attrs.get('height', 30))
+    # .page-footer img: max-height 30px, centred 15px above the bottom edge
+    scale = 30 * PX / view_height
+    left = (FRAME_WIDTH - view_width * scale) / 2
+    top = FRAME_HEIGHT - 15 * PX - view_height * scale
+    ops = []
+    for element in svg.iter():
+        if element.tag == 'rect':
+            fill = find_color(element.attrs.get('fill', '#000')) or (0, 0, 0)
+            ops.append(('rect', left + float(element.attrs.get('x', 0)) * scale,
+                        top + float(element.attrs.get('y', 0)) * scale,
+                        float(element.attrs.get('width', view_width)) * scale,
+                        float(element.attrs.get('height', view_height)) * scale, fill, 0.0))
+        elif element.tag == 'text':
+            text = ' '.join(element.text().split())
+            size = float(element.attrs.get('font-size', 12)) * scale
+            font = engine.fonts.resolve(element.attrs.get('font-family', 'sans-serif'), 400)
+            width = sum(font.char_width(c) for c in text) * size / 1000
+            x = left + float(element.attrs.get('x', 0)) * scale
+            if element.attrs.get('text-anchor') == 'middle':
+                x -= width / 2
+            fill = find_color(element.attrs.get('fill', '#000')) or (0, 0, 0)
+            ops.append(('text', x, top + float(element.attrs.get('y', 0)) * scale, font, size, fill, text))
+    return ops
+
+
+def load_background(path, dpi=BACKGROUND_DPI):
+    """JPEG bytes and pixel size of the page background, or (None, reason)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None, 'Pillow is not installed'
+    try:
+        with Image.open(path) as image:
+            image = image.convert('RGB')
+            size = (round(FRAME_WIDTH / 72 * dpi * SCALE), round(FRAME_HEIGHT / 72 * dpi * SCALE))
+            image = image.resize(size, Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=85, optimize=True)
+    except OSError as e:
+        return None, str(e)
+    return (buffer.getvalue(), size), None
+
+
+def render_page(engine, page_html, footer, background=None):
+    """One page's PAGE_CACHE entry, without its key."""
+    layout = engine.layout_page(page_html)
+    fonts = FontResources()
+    stream = zlib.compress(content_stream(layout.ops + footer, fonts, background), 9)
+    return {
+        'stream': stream,
+        'title': layout.title,
+        'overflow': layout.overflow,
+        'glyphs': {font_id(font): used for font, used in fonts.used.items()},
+    }
+
+
+class PageCache:
+    """Rendered pages of earlier exports by filename, and the encoded background."""
+
+    def __init__(self, path):
+        self.path = path
+        self.stored = {'pages': {}, 'background': None}
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    stored = pickle.load(f)
+                if stored.get('version') == CACHE_VERSION:
+                    self.stored = stored
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+                pass
+        self.pages = {}
+        self.background_entry = None
+
+    def get(self, filename, key):
+        page = self.stored['pages'].get(filename)
+        if page is None or page['key'] != key:
+            return None
+        self.pages[filename] = page
+        return page
+
+    def put(self, filename, page):
+        self.pages[filename] = page
+
+    def background(self, path, dpi=BACKGROUND_DPI):
+        """load_background(path, dpi), without re-encoding an unchanged image."""
+        try:
+            info = os.stat(path)
+        except OSError as e:
+            return None, str(e)
+        key = f'{info.st_size}:{info.st_mtime_ns}:{dpi}'
+        stored = self.stored['background']
+        if stored is not None and stored['key'] == key:
+            self.background_entry = stored
+            return stored['image'], None
+        image, reason = load_background(path, dpi)
+        if image is not None:
+            self.background_entry = {'key': key, 'image': image}
+        return image, reason
+
+    def save(self):
+        # Only what this export used, so removed pages drop out
+        if not self.path or (self.pages == self.stored['pages'] and self.background_entry == self.stored['background']):
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': CACHE_VERSION, 'pages': self.pages, 'background': self.background_entry},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write the PDF page cache {self.path}: {e}")
+
+
+def _assets_key(engine, logo_path, background):
+    digest = hashlib.sha256(f'{engine.fonts.fonts_dir}\0{engine.fonts.fingerprint}\0{background}'.encode('utf-8'))
+    try:
+        with open(logo_path, 'rb') as f:
+            digest.update(f.read())
+    except OSError:
+        pass
+    return digest.hexdigest()
+
+
+class ExportReport:
+    def __init__(self, path):
+        self.path = path
+        self.pages = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.embedded_fonts = 0
+        self.font_bytes = 0
+        self.full_font_bytes = 0
+        self.background = None
+        # (filename, points past the frame bottom)
+        self.overflowing = []
+        # Pages laid out by this export; the others came from PAGE_CACHE
+        self.rendered = []
+        self.cached = 0
+
+
+def export_pdf(page_files, out_path, fonts_dir=None, background=True, source_dir=SOURCE_DIR, font_cache=None,
+               page_cache=None, cache=True):
+    """Lay out [(filename, path)] in order and write a vector PDF to out_path.
+
+    Font subsets are cached in font_cache, by default SUBSET_CACHE next to
+    out_path, and rendered pages in page_cache, by default PAGE_CACHE next
+    to out_path. With cache=False every page is laid out and nothing is
+    stored.
+    """
+    started = time.perf_counter()
+    report = ExportReport(out_path)
+    engine = LayoutEngine(FontSet(fonts_dir) if fonts_dir else FontSet())
+    writer = PdfWriter()
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    fonts = FontResources(font_cache or os.path.join(out_dir, SUBSET_CACHE))
+
+    catalog = writer.reserve()
+    pages_ref = writer.reserve()
+    outlines_ref = writer.reserve()
+    resources_ref = writer.reserve()
+
+    pages = PageCache((page_cache or os.path.join(out_dir, PAGE_CACHE)) if cache else None)
+    image = None
+    if background:
+        image, reason = pages.background(os.path.join(source_dir, BACKGROUND_IMAGE))
+        report.background = reason or 'embedded'
+    if image is not None:
+        data, (width, height) = image
+        image = writer.add_stream(
+            data, b' /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB'
+                  b' /BitsPerComponent 8 /Filter /DCTDecode' % (width, height), compress=False)
+    background_name = 'Bg' if image else None
+    logo_path = os.path.join(source_dir, LOGO_SVG)
+    assets_key = _assets_key(engine, logo_path, background_name)
+    footer = None
+
+    page_refs = []
+    titles = []
+    for filename, path in page_files:
+        with open(path, 'r', encoding='utf-8') as f:
+            page_html = f.read()
+        key = hashlib.sha256(f'{assets_key}\0{page_html}'.encode('utf-8')).hexdigest()
+        page = pages.get(filename, key)
+        if page is None:
+            with deck_profile.stage('render', filename):
+                if footer is None:
+                    footer = logo_ops(engine, logo_path)
+                page = dict(render_page(engine, page_html, footer, background_name), key=key)
+            pages.put(filename, page)
+            report.rendered.append(filename)
+        else:
+            report.cached += 1
+        if page['overflow'] > 0.5:
+            report.overflowing.append((filename, page['overflow']))
+        for font, used in page['glyphs'].items():
+            fonts.add(load_font(font), used)
+        stream = writer.add_stream(page['stream'], b' /Filter /FlateDecode', compress=False)
+        page_refs.append(writer.add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Resources %d 0 R /Contents %d 0 R >>'
+            % (pages_ref, _num(A4_WIDTH).encode(), _num(A4_HEIGHT).encode(), resources_ref, stream)))
+        titles.append(page['title'] or os.path.splitext(filename)[0])
+    pages.save()
+
+    font_refs = fonts.write(writer)
+    font_dict = b' '.join(b'/%s %d 0 R' % (name.encode(), ref) for name, ref in font_refs.items())
+    xobjects = b' /XObject << /Bg %d 0 R >>' % image if image else b''
+    writer.set(resources_ref, b'<< /Font << %s >>%s >>' % (font_dict, xobjects))
+    writer.set(pages_ref, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % ref for ref in page_refs), len(page_refs)))
+
+    _write_outlines(writer, outlines_ref, page_refs, titles)
+    # Label every page with its page id, e.g. "page-05a-tax-advantage"
+    labels = b' '.join(b'%d << /P %s >>' % (i, pdf_string(os.path.splitext(filename)[0]))
+                       for i, (filename, _) in enumerate(page_files))
+    writer.set(catalog, b'<< /Type /Catalog /Pages %d 0 R /Outlines %d 0 R /PageMode /UseOutlines'
+                        b' /PageLabels << /Nums [%s] >> >>' % (pages_ref, outlines_ref, labels))
+    info = writer.add(b'<< /Title %s /Producer (OZ deck export-pdf.py) >>'
+                      % pdf_string("The Sophisticated Investor's Guide to Opportunity Zone Investing"))
+
+    with open(out_path, 'wb') as f:
+        writer.write(f, catalog, info)
+
+    report.pages = len(page_refs)
+    report.bytes = os.path.getsize(out_path)
+    report.embedded_fonts = sum(1 for font in fonts.names if font.embedded)
+    report.font_bytes = fonts.embedded_bytes
+    report.full_font_bytes = fonts.full_bytes
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def _write_outlines(writer, outlines_ref, page_refs, titles):
+    items = [writer.reserve() for _ in page_refs]
+    for i, (item, page, title) in enumerate(zip(items, page_refs, titles)):
+        links = b''
+        if i > 0:
+            links += b' /Prev %d 0 R' % items[i - 1]
+        if i < len(items) - 1:
+            links += b' /Next %d 0 R' % items[i + 1]
+        writer.set(item, b'<< /Title %s /Parent %d 0 R /Dest [%d 0 R /Fit]%s >>'
+                   % (pdf_string(title), outlines_ref, page, links))
+    if items:
+        writer.set(outlines_ref, b'<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>'
+                   % (items[0], items[-1], len(items)))
+    else:
+        writer.set(outlines_ref, b'<< /Type /Outlines /Count 0 >>')
@@ -0,0 +1,396 @@
+"""Per-investor decks streamed into zip archives.
+
+Only three pages differ per investor: the cover names them, the tax
+calculation uses their gain, and the conclusion names their sponsor
+contact. Each of those pages is compiled into a template once per campaign;
+a generated page may have been split, so the markup is looked for in its
+continuation pages too.
+Every other file is deflated once and copied as-is into each archive, along
+with the local files the pages and their stylesheets link, such as the
+hashed stylesheet from --css external.
+
+Archives are written with a small streaming zip writer, not zipfile. That
+way the shared, already-compressed entries can be copied without inflating
+them again, and memory per worker stays at one archive's central directory.
+"""
+
+import csv
+import html
+import json
+import os
+import posixpath
+import re
+import struct
+import time
+import zlib
+from urllib.parse import unquote
+from concurrent.futures import ProcessPoolExecutor
+
+from deck_build import resolve_jobs
+from deck_split import source_page
+from deck_templates import compile_template
+from deck_toc import PAGE_LIST, page_list_data
+
+# Page -> ((pattern for the markup to replace, its per-investor template), ...); the
+# first pattern found is used
+PERSONALIZED_PAGES = {
+    'page-01-cover.html': ((
+        r'<div class="phoenix-silhouette"></div>',
+        '<div class="tagline">Prepared for {{ name }}</div>\n    <div class="phoenix-silhouette"></div>',
+    ),),
+    'page-05b-tax-advantage.html': ((
+        r'<h3>Illustrative Tax Calculation</h3>.*?</p>',
+        '<h3>Your Illustrative Tax Calculation</h3>\n'
+        '        <p>{{ gain }} capital gain invested in QOF:<br>\n'
+        '        • Immediate deferral: {{ deferral }} tax savings ({{ rate }} rate)<br>\n'
+        '        • 7-year reduction: {{ reduction }} additional savings (15% of deferred)<br>\n'
+        '        • 10-year elimination: 100% of appreciation tax-free<br>\n'
+        '        • Total potential savings: {{ total }}+ on original gain plus unlimited appreciation</p>',
+    ),),
+    'page-22-conclusion.html': (
+        # The slot content/page-22-conclusion.html keeps for it in generated builds
+        (
+            r'<div class="sponsor-contact">\s*<p>.*?</p>',
+            '<div class="sponsor-contact">\n    <p>Questions? Contact {{ sponsor_line }}.</p>',
+        ),
+        # The hand-written page's closing box
+        (
+            r'<p>The Complete Investment Framework for<br>Tax-Efficient Wealth Creation</p>',
+            '<p>Your sponsor contact<br>{{ sponsor }}</p>',
+        ),
+    ),
+}
+CONTACT_FIELDS = ('sponsor_name', 'sponsor_email', 'sponsor_phone')
+DEFAULT_SPONSOR = 'Your Opportunity Zone sponsor'
+# Files every archive needs to view the deck offline, besides the pages and what they link
+SHARED_FILES = ('index.html', 'deck-loader.js', 'deck-cache.js', 'deck-search.js', 'deck-sw.js',
+                'background.svg', 'Background + Logo 2.png')
+# href="...", src="..." and url(...) references; files of these types are scanned for more
+_REFERENCE = re.compile(r'''\b(?:href|src)\s*=\s*["']([^"']*)["']|url\(\s*["']?([^"')]*?)["']?\s*\)''', re.I)
+SCANNED_EXTENSIONS = ('.html', '.css')
+# Already-compressed formats are stored rather than deflated again
+STORED_EXTENSIONS = ('.png', '.jpg')
+
+DEFAULT_GAIN = 10_000_000
+DEFAULT_RATE = 0.238
+# How many investors may be queued per worker before reading more of the file
+QUEUE_PER_JOB = 4
+
+# 1980-01-01 00:00, the earliest zip timestamp, keeps archives byte-stable
+_ZIP_DATE = (0 << 9) | (1 << 5) | 1
+_ZIP_TIME = 0
+
+
+def money(value):
+    if value >= 1_000_000:
+        return f'${value / 1_000_000:.2f}'.rstrip('0').rstrip('.') + 'M'
+    if value >= 1_000:
+        return f'${value / 1_000:.0f}K'
+    return f'${value:.0f}'
+
+
+def _amount(text, default):
+    value = str(text if text is not None else '').strip()
+    text = value.replace('$', '').replace(',', '')
+    if not text:
+        return default
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1].lower(), 1)
+    try:
+        return float(text[:-1] if scale > 1 else text) * scale
+    except ValueError:
+        raise ValueError(f"gain '{value}' is not an amount") from None
+
+
+def _rate(text):
+    text = str(text if text is not None else '').strip()
+    if not text:
+        return DEFAULT_RATE
+    try:
+        rate = float(text.rstrip('%'))
+    except ValueError:
+        raise ValueError(f"rate '{text}' is not a number or percentage") from None
+    return rate / 100 if text.endswith('%') or rate > 1 else rate
+
+
+def _text(record, field):
+    value = record.get(field)
+    return str(value).strip() if value is not None else ''
+
+
+def check_record(record):
+    """Raise ValueError when a record cannot be personalized."""
+    if not isinstance(record, dict):
+        raise ValueError("expected an object with a 'name'")
+    if not _text(record, 'name'):
+        raise ValueError("missing 'name'")
+    _amount(record.get('gain'), DEFAULT_GAIN)
+    _rate(record.get('rate'))
+
+
+def investor_context(record):
+    """Template values for one investor record; every value is HTML-escaped."""
+    gain = _amount(record.get('gain'), DEFAULT_GAIN)
+    rate = _rate(record.get('rate'))
+    deferral = gain * rate
+    reduction = deferral * 0.15
+    contact = [html.escape(_text(record, field)) for field in CONTACT_FIELDS if _text(record, field)]
+    values = {
+        'name': _text(record, 'name'),
+        'gain': money(gain),
+        'rate': f'{rate * 100:.1f}'.rstrip('0').rstrip('.') + '%',
+        'deferral': money(deferral),
+        'reduction': money(reduction),
+        'total': money(deferral + reduction),
+    }
+    context = {key: html.escape(value) for key, value in values.items()}
+    context['sponsor'] = '<br>'.join(contact) or DEFAULT_SPONSOR
+    context['sponsor_line'] = ' · '.join(contact) or DEFAULT_SPONSOR[0].lower() + DEFAULT_SPONSOR[1:]
+    return context
+
+
+def read_investors(path):
+    """Yield investor records from a CSV or NDJSON file without loading it whole.
+
+    A record that cannot be personalized raises ValueError naming its line,
+    before any archive is written for it.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            records = ((reader.line_num, record) for record in reader)
+        else:
+            records = _json_lines(path, f)
+        for number, record in records:
+            try:
+                check_record(record)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+            yield record
+
+
+def _json_lines(path, f):
+    for number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+
+
+def archive_name(record, taken):
+    """Unique, filesystem-safe archive stem for an investor."""
+    base = str(record.get('id') or _text(record, 'name')).strip().lower()
+    base = re.sub(r'[^a-z0-9]+', '-', base).strip('-') or 'investor'
+    name, n = base, 1
+    while name in taken:
+        n += 1
+        name = f'{base}-{n}'
+    taken.add(name)
+    return name
+
+
+def compile_page(filename, markup):
+    """Template for a personalized page, built from the deck's own copy of it.
+
+    None when markup has none of the page's patterns, e.g. a continuation
+    page that did not get the personalized part.
+    """
+    for pattern, replacement in PERSONALIZED_PAGES[source_page(filename)]:
+        personalized, count = re.subn(pattern, lambda _: replacement, markup, count=1, flags=re.S)
+        if count:
+            return compile_template(personalized)
+    return None
+
+
+def local_references(text, base=''):
+    """Archive paths of the local files text links, relative to the archive path base."""
+    for match in _REFERENCE.finditer(text):
+        ref = (match.group(1) or match.group(2) or '').split('#')[0].split('?')[0].strip()
+        # Skips in-page anchors, absolute paths, data: URLs and anything with a scheme
+        if not ref or ref.startswith('/') or ':' in ref:
+            continue
+        yield posixpath.normpath(posixpath.join(posixpath.dirname(base), unquote(ref)))
+
+
+def zip_entry(name, data):
+    """(name, crc, size, method, payload) with the payload compressed once."""
+    if name.lower().endswith(STORED_EXTENSIONS):
+        method, payload = 0, data
+    else:
+        deflate = zlib.compressobj(9, zlib.DEFLATED, -15)
+        method, payload = 8, deflate.compress(data) + deflate.flush()
+    return name, zlib.crc32(data), len(data), method, payload
+
+
+class ZipStream:
+    """Writes a zip archive entry by entry; only the central directory is kept in memory."""
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.central = []
+        self.offset = 0
+
+    def add(self, entry):
+        name, crc, size, method, payload = entry
+        raw_name = name.encode('utf-8')
+        header = struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, 0x800, method, _ZIP_TIME, _ZIP_DATE,
+                             crc, len(payload), size, len(raw_name), 0)
+        self.central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, 20, 20, 0x800, method,
+                                        _ZIP_TIME, _ZIP_DATE, crc, len(payload), size, len(raw_name),
+                                        0, 0, 0, 0, 0, self.offset) + raw_name)
+        self.file.write(header + raw_name)
+        self.file.write(payload)
+        self.offset += len(header) + len(raw_name) + len(payload)
+
+    def close(self):
+        directory = b''.join(self.central)
+        self.file.write(directory)
+        self.file.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(self.central), len(self.central),
+                                    len(directory), self.offset, 0))
+        self.file.close()
+        return self.offset + len(directory) + 22
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.size = self.close()
+        else:
+            self.file.close()
+
+
+class Campaign:
+    """Everything shared by all archives: entries in order, and the per-investor page templates."""
+
+    def __init__(self, page_files, source_dir):
+        self.layout = []
+        missing = set(PERSONALIZED_PAGES)
+        for filename, path in page_files:
+            with open(path, 'r', encoding='utf-8') as f:
+                markup = f.read()
+            template = None
+            if source_page(filename) in missing:
+                template = compile_page(filename, markup)
+            if template is not None:
+                missing.discard(source_page(filename))
+                self.layout.append((filename, template))
+            else:
+                self.layout.append(zip_entry(filename, markup.encode('utf-8')))
+        if missing:
+            raise ValueError(f"{', '.join(sorted(missing))}: the deck no longer contains the markup "
+                             "personalization replaces")
+        # The viewer's page order, so continuation pages are shown from the archive too
+        self.layout.append(zip_entry(PAGE_LIST, page_list_data(filename for filename, _ in page_files)))
+        self._add_shared(page_files, source_dir)
+
+    def _add_shared(self, page_files, source_dir):
+        added = {filename for filename, _ in page_files} | {PAGE_LIST}
+        pending = [(filename, None, os.path.join(source_dir, filename)) for filename in SHARED_FILES
+                   if os.path.exists(os.path.join(source_dir, filename))]
+        for filename, path in page_files:
+            pending.extend(self._linked(filename, path, source_dir))
+        while pending:
+            name, referrer, path = pending.pop(0)
+            if name in added:
+                continue
+            if path is None:
+                raise ValueError(f"{referrer} links {name}, which is not in the build")
+            added.add(name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.layout.append(zip_entry(name, data))
+            if name.lower().endswith(SCANNED_EXTENSIONS):
+                pending.extend(self._linked(name, path, source_dir, data.decode('utf-8')))
+
+    @staticmethod
+    def _linked(name, path, source_dir, text=None):
+        """(archive path, name, file path or None) for each local file name links.
+
+        A file is looked for relative to path, then in source_dir, where the
+        hand-written pages and images stay when the build went elsewhere.
+        """
+        if text is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        for ref in local_references(text, name):
+            found = None
+            # Nothing outside the deck's directory can go into the archive
+            if not ref.startswith('..'):
+                relative = os.path.relpath(ref, posixpath.dirname(name) or '.')
+                for candidate in (os.path.join(os.path.dirname(path), relative), os.path.join(source_dir, ref)):
+                    if os.path.isfile(candidate):
+                        found = candidate
+                        break
+            yield ref, name, found
+
+    def write_archive(self, path, context):
+        with ZipStream(path) as archive:
+            for item in self.layout:
+                if len(item) == 2:
+                    filename, template = item
+                    archive.add(zip_entry(filename, template.render(context).encode('utf-8')))
+                else:
+                    archive.add(item)
+        return archive.size
+
+
+# Set in each worker by _init_worker so the campaign is sent once per process
+_campaign = None
+
+
+def _init_worker(campaign):
+    global _campaign
+    _campaign = campaign
+
+
+def _write_one(task):
+    path, context = task
+    return path, _campaign.write_archive(path, context)
+
+
+class BatchReport:
+    def __init__(self):
+        self.archives = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.jobs = 1
+
+
+def write_archives(campaign, investors, out_dir, jobs=1):
+    """Write <out_dir>/<investor>.zip for each record; yields each path as it completes."""
+    os.makedirs(out_dir, exist_ok=True)
+    taken = set()
+
+    def tasks():
+        for record in investors:
+            yield os.path.join(out_dir, archive_name(record, taken) + '.zip'), investor_context(record)
+
+    jobs = resolve_jobs(jobs)
+    if jobs == 1:
+        _init_worker(campaign)
+        for task in tasks():
+            yield _write_one(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(campaign,)) as pool:
+        # Keep a bounded window of work queued, so a huge investor file is never read ahead
+        pending = []
+        for task in tasks():
+            pending.append(pool.submit(_write_one, task))
+            if len(pending) >= jobs * QUEUE_PER_JOB:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def personalize(page_files, investors_path, out_dir, source_dir, jobs=1):
+    started = time.perf_counter()
+    report = BatchReport()
+    report.jobs = resolve_jobs(jobs)
+    campaign = Campaign(page_files, source_dir)
+    for _, size in write_archives(campaign, read_investors(investors_path), out_dir, jobs):
+        report.archives += 1
+        report.bytes += size
+    report.seconds = time.perf_counter() - started
+    return report
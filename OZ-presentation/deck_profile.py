@@ -0,0 +1,106 @@
+"""Stage timings for generate-remaining-pages.py --profile.
+
+Build code wraps its work in stage('template', filename) and similar. When no
+profile is active, stage() returns a shared no-op context, so the hooks cost
+next to nothing. SamplingProfiler writes folded stacks ("a;b;c 12" per line),
+the input format of flamegraph.pl and speedscope.
+"""
+
+import contextlib
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Item name for work that belongs to the whole deck rather than one page
+DECK = '(deck)'
+
+# The StageTimer of the running build, or None
+active = None
+_NO_OP = contextlib.nullcontext()
+
+
+class StageTimer:
+    def __init__(self):
+        # (stage, item) -> seconds
+        self.seconds = defaultdict(float)
+
+    @contextlib.contextmanager
+    def stage(self, name, item=DECK):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[(name, item)] += time.perf_counter() - started
+
+    def stage_totals(self):
+        totals = defaultdict(float)
+        for (name, _), seconds in self.seconds.items():
+            totals[name] += seconds
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+    def item_totals(self):
+        totals = defaultdict(lambda: defaultdict(float))
+        for (name, item), seconds in self.seconds.items():
+            if item != DECK:
+                totals[item][name] += seconds
+        return sorted(totals.items(), key=lambda item: -sum(item[1].values()))
+
+    def report(self, top=10):
+        """Lines of the breakdown: stages by total time, then the slowest pages by stage."""
+        stages = self.stage_totals()
+        overall = sum(seconds for _, seconds in stages) or 1.0
+        lines = ['Stage            Time      Share']
+        for name, seconds in stages:
+            lines.append(f'{name:<14} {seconds * 1000:8.1f}ms {seconds / overall:6.1%}')
+
+        items = self.item_totals()
+        if items:
+            names = [name for name, _ in stages if any(name in per_stage for _, per_stage in items)]
+            lines.append('')
+            lines.append(f'Slowest {min(top, len(items))} of {len(items)} pages and assets (ms)')
+            lines.append(f"{'item':<40}" + ''.join(f'{name:>10}' for name in names) + f"{'total':>10}")
+            for item, per_stage in items[:top]:
+                lines.append(f'{item:<40}' + ''.join(f'{per_stage.get(name, 0) * 1000:10.2f}' for name in names)
+                             + f'{sum(per_stage.values()) * 1000:10.2f}')
+        return lines
+
+
+def stage(name, item=DECK):
+    return active.stage(name, item) if active is not None else _NO_OP
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and counts identical stacks."""
+
+    def __init__(self, interval=0.001, thread=None):
+        self.interval = interval
+        self.thread_id = (thread or threading.current_thread()).ident
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name='deck-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._sampler.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f'{stack} {count}\n')
+        return sum(self.stacks.values())
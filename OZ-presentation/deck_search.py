@@ -0,0 +1,133 @@
+"""Search index for the deck viewer (generate-remaining-pages.py --search).
+
+The index is one JSON file, SEARCH_NAME, that deck-search.js loads once:
+
+    {"version": 1, "rules": [[suffix, replacement], ...], "stop": [...],
+     "pages": [{"id", "file", "title", "text"}, ...],
+     "terms": {stem: [page, count, offset, delta, delta, ...], ...}}
+
+text is the page's visible text with whitespace collapsed. Offsets point at
+each occurrence of a term in it, counted in UTF-16 units as JavaScript
+strings are, so the viewer can cut snippets without touching the pages.
+Offsets within a page are delta-encoded, and a term found on several pages
+repeats the [page, count, offsets] group.
+
+The stemmer rewrites the first of STEM_RULES that matches the word. The rules
+and stop words ship inside the index, so the viewer stems queries exactly as
+the build stemmed the pages.
+"""
+
+import json
+import os
+import re
+from collections import defaultdict
+
+from deck_bundle import page_id, page_title
+from deck_html import visible_text
+
+SEARCH_NAME = 'deck-search.json'
+INDEX_VERSION = 1
+
+# (suffix, replacement), first match wins; a word whose stem would be shorter
+# than MIN_STEM is left whole, and the last rules keep -ss/-us/-is
+STEM_RULES = (
+    ('ations', 'ate'), ('ation', 'ate'), ('izing', 'ize'), ('ments', ''), ('ment', ''), ('ness', ''),
+    ('ingly', ''), ('ings', ''), ('ing', ''), ('edly', ''), ('ies', 'y'), ('ied', 'y'),
+    ('sses', 'ss'), ('xes', 'x'), ('ches', 'ch'), ('shes', 'sh'), ('ed', ''), ('ly', ''),
+    ('ss', 'ss'), ('us', 'us'), ('is', 'is'), ('s', ''),
+)
+MIN_STEM = 3
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have in into is it its of on or that the their this to '
+    'was were will with'.split()
+)
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def stem(word):
+    for suffix, replacement in STEM_RULES:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) + len(replacement) < MIN_STEM:
+                return word
+            return word[:len(word) - len(suffix)] + replacement
+    return word
+
+
+def terms(text):
+    """(stem, offset) for every indexed word of text, offsets in code points."""
+    for match in _WORD.finditer(text.lower()):
+        word = match.group(0)
+        if word not in STOP_WORDS:
+            yield stem(word), match.start()
+
+
+def _utf16_offsets(text):
+    # Only needed when the text has characters outside the BMP
+    if all(ord(char) <= 0xFFFF for char in text):
+        return None
+    offsets = [0]
+    for char in text:
+        offsets.append(offsets[-1] + (2 if ord(char) > 0xFFFF else 1))
+    return offsets
+
+
+class SearchReport:
+    def __init__(self, path):
+        self.path = path
+        self.pages = 0
+        self.terms = 0
+        self.bytes = 0
+        self.written = False
+
+
+def build_index(page_files):
+    """The index for [(filename, path)] in deck order."""
+    pages = []
+    postings = defaultdict(list)
+    for number, (filename, path) in enumerate(page_files):
+        with open(path, 'r', encoding='utf-8') as f:
+            markup = f.read()
+        text = visible_text(markup)
+        pages.append({'id': page_id(filename), 'file': filename,
+                      'title': page_title(markup, page_id(filename)), 'text': text})
+
+        found = defaultdict(list)
+        for term, offset in terms(text):
+            found[term].append(offset)
+        utf16 = _utf16_offsets(text)
+        for term, offsets in found.items():
+            if utf16:
+                offsets = [utf16[offset] for offset in offsets]
+            deltas = [offsets[0]] + [b - a for a, b in zip(offsets, offsets[1:])]
+            postings[term].extend([number, len(offsets), *deltas])
+
+    return {
+        'version': INDEX_VERSION,
+        'rules': [list(rule) for rule in STEM_RULES],
+        'min_stem': MIN_STEM,
+        'stop': sorted(STOP_WORDS),
+        'pages': pages,
+        'terms': dict(sorted(postings.items())),
+    }
+
+
+def write_index(page_files, out_dir):
+    path = os.path.join(out_dir, SEARCH_NAME)
+    report = SearchReport(path)
+    index = build_index(page_files)
+    data = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    report.pages = len(index['pages'])
+    report.terms = len(index['terms'])
+    report.bytes = len(data)
+    try:
+        with open(path, 'rb') as f:
+            unchanged = f.read() == data
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(path, 'wb') as f:
+            f.write(data)
+        report.written = True
+    return report
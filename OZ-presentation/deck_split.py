@@ -0,0 +1,198 @@
+"""Split generated pages whose content would overflow the viewer frame.
+
+Heights are predicted with deck_layout instead of measured in a browser.
+It uses the fonts in fonts/ when present, or the standard PDF metrics
+otherwise. Those are Times and Helvetica widths, not the deck's Playfair
+Display and Inter, so splitting is opt-in (--split) and the report names
+the families it had to substitute. A page that does not fit is cut between top-level blocks into
+continuation pages named page-05-tax-advantage_cont1.html and so on. The
+underscore sorts after ".html", so continuations follow their page in deck
+order and never clash with hand-split pages such as page-05a.
+
+Each block's box (collapsible margins and border-box height) is cached by
+block source, styles and fonts. The cache is kept in LAYOUT_CACHE next to
+the build manifest, so after the first run prediction is a dictionary
+lookup per block and only edited blocks are laid out again.
+"""
+
+import hashlib
+import os
+import re
+import time
+
+import deck_profile
+from deck_build import load_manifest, render_page, save_manifest
+from deck_fonts import FontSet
+from deck_html import top_level_blocks
+from deck_layout import FRAME_HEIGHT, FRAME_PADDING, LayoutEngine
+
+LAYOUT_CACHE = '.deck-layout.json'
+# Height available to a page's content inside the frame's padding
+CAPACITY = FRAME_HEIGHT - FRAME_PADDING[0] - FRAME_PADDING[2]
+CONTINUED = '{title} (continued)'
+# Families the deck's styles use; heights are only trustworthy with their fonts
+DECK_FAMILIES = ('Playfair Display', 'Inter')
+_CONTINUATION = re.compile(r'(.+)_cont\d+')
+
+
+def continuation_name(filename, number):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}_cont{number}{ext}'
+
+
+def source_page(filename):
+    """The pages dict entry a generated file comes from."""
+    stem, ext = os.path.splitext(filename)
+    match = _CONTINUATION.fullmatch(stem)
+    return (match.group(1) + ext) if match else filename
+
+
+def split_changed(previous, pages):
+    """Whether pages splits any of its source pages differently from the names in previous."""
+    sources = {source_page(filename) for filename in pages}
+    return {filename for filename in previous if source_page(filename) in sources} != set(pages)
+
+
+def _join_blocks(blocks):
+    # Same indentation as the hand-written entries of the pages dict
+    return '\n        ' + '\n        \n        '.join(blocks) + '\n        '
+
+
+class BoxCache:
+    """Block boxes keyed by (styles, fonts, block source), persisted between runs."""
+
+    def __init__(self, path, fonts_key):
+        self.path = path
+        self.fonts_key = fonts_key
+        stored = load_manifest(path) if path else {}
+        self.boxes = stored.get('boxes', {}) if stored.get('fonts') == fonts_key else {}
+        self.stored_keys = set(self.boxes)
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, styles_key, source):
+        return hashlib.sha256(f'{styles_key}\0{source}'.encode('utf-8')).hexdigest()[:24]
+
+    def get(self, key):
+        box = self.boxes.get(key)
+        if box is not None:
+            self.used[key] = box
+        return box
+
+    def put(self, key, box):
+        self.boxes[key] = self.used[key] = box
+
+    def save(self, merge=False):
+        # Only what this build used, so the file tracks the current deck; a
+        # partial build saw only some pages and keeps the other entries
+        boxes = dict(self.boxes) if merge else self.used
+        if self.path and set(boxes) != self.stored_keys:
+            save_manifest(self.path, {'fonts': self.fonts_key, 'boxes': boxes})
+
+
+class SplitReport:
+    def __init__(self):
+        # Original filename -> names of its continuation pages
+        self.continuations = {}
+        # (filename, points by which one block alone exceeds the frame)
+        self.too_tall = []
+        self.unsplittable = []
+        # Deck families measured with base-14 metrics for want of a font file
+        self.substituted = []
+        self.blocks = 0
+        self.cached_blocks = 0
+        self.seconds = 0.0
+
+
+class PageSplitter:
+    def __init__(self, styles, cache_path=None, engine=None):
+        self.styles = styles
+        self.engine = engine or LayoutEngine()
+        self.styles_key = hashlib.sha256(styles.encode('utf-8')).hexdigest()
+        self.cache = BoxCache(cache_path, self.engine.fonts.fingerprint)
+
+    def _title_box(self, title):
+        key = self.cache.key(self.styles_key, f'<h2>{title}</h2>')
+        box = self.cache.get(key)
+        if box is None:
+            _, top, height, bottom = self.engine.block_boxes(
+                render_page({'title': title, 'content': ''}, self.styles))[0]
+            box = [top, height, bottom]
+            self.cache.put(key, box)
+        return box
+
+    def boxes(self, page_data, blocks):
+        """Boxes for the title and each block, or None when they cannot be matched up."""
+        keys = [self.cache.key(self.styles_key, block) for block in blocks]
+        cached = [self.cache.get(key) for key in keys]
+        if all(box is not None for box in cached):
+            self.cache.hits += len(blocks)
+            return [self._title_box(page_data['title'])] + cached
+
+        laid_out = self.engine.block_boxes(render_page(page_data, self.styles))
+        # Loose text between blocks lays out as extra items; such pages are left whole
+        if len(laid_out) != len(blocks) + 1:
+            return None
+        self.cache.misses += len(blocks)
+        boxes = [[top, height, bottom] for _, top, height, bottom in laid_out]
+        for key, box in zip(keys, boxes[1:]):
+            self.cache.put(key, box)
+        return boxes
+
+    def split(self, filename, page_data, report):
+        """[(filename, page_data)] for one entry of the pages dict."""
+        blocks = top_level_blocks(page_data['content'])
+        report.blocks += len(blocks)
+        boxes = self.boxes(page_data, blocks)
+        if boxes is None:
+            report.unsplittable.append(filename)
+            return [(filename, page_data)]
+
+        continued = CONTINUED.format(title=page_data['title'])
+        chunks = [[]]
+        title_box = boxes[0]
+        used, prev_bottom = title_box[1], title_box[2]
+        for block, (top, height, bottom) in zip(blocks, boxes[1:]):
+            needed = max(prev_bottom, top) + height
+            if chunks[-1] and used + needed > CAPACITY:
+                title_box = self._title_box(continued)
+                chunks.append([])
+                used, prev_bottom = title_box[1], title_box[2]
+                needed = max(prev_bottom, top) + height
+            if not chunks[-1] and used + needed > CAPACITY:
+                report.too_tall.append((filename, used + needed - CAPACITY))
+            chunks[-1].append(block)
+            used += needed
+            prev_bottom = bottom
+
+        if len(chunks) == 1:
+            return [(filename, page_data)]
+        pages = [(filename, dict(page_data, content=_join_blocks(chunks[0])))]
+        for number, chunk in enumerate(chunks[1:], 1):
+            pages.append((continuation_name(filename, number),
+                          dict(page_data, title=continued, content=_join_blocks(chunk))))
+        report.continuations[filename] = [name for name, _ in pages[1:]]
+        return pages
+
+
+def split_pages(pages, styles, out_dir=None, engine=None, partial=False, fonts_dir=None):
+    """Return (pages with overflowing entries split, SplitReport), keeping dict order.
+
+    partial says pages is a subset of the deck, so cached boxes of the other
+    pages stay in the layout cache. fonts_dir is where the .ttf files are
+    looked for when no engine is given.
+    """
+    started = time.perf_counter()
+    report = SplitReport()
+    engine = engine or LayoutEngine(FontSet(fonts_dir) if fonts_dir else None)
+    report.substituted = [family for family in DECK_FAMILIES if not engine.fonts.has_family(family)]
+    splitter = PageSplitter(styles, os.path.join(out_dir, LAYOUT_CACHE) if out_dir else None, engine)
+    result = {}
+    for filename, page_data in pages.items():
+        with deck_profile.stage('layout', filename):
+            result.update(splitter.split(filename, page_data, report))
+    report.cached_blocks = splitter.cache.hits
+    splitter.cache.save(merge=partial)
+    report.seconds = time.perf_counter() - started
+    return result, report
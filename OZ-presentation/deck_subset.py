@@ -0,0 +1,274 @@
+"""TrueType subsetting and web font packaging, in pure Python.
+
+subset_font keeps the glyphs for a set of characters, plus the components
+of any composite glyph among them, and writes a new TrueType file. It keeps
+the metrics, names and hinting tables. Layout tables (kern, GPOS, GSUB) are
+dropped, so subsets lose kerning and ligatures. Variable fonts become their
+default instance.
+
+Glyph ids are renumbered by default. retain_gids keeps the original ids and
+empties the glyphs that are not needed, so text already encoded with the
+full font's ids, such as a PDF content stream, still works.
+
+to_woff2 packs a font with brotli, storing glyf and loca untransformed (the
+WOFF2 "null transform"). to_woff is the zlib-based WOFF 1.0 used when
+brotli is not installed.
+"""
+
+import struct
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Tables copied as they are; the others are rebuilt or dropped
+COPIED_TABLES = ('OS/2', 'name', 'cvt ', 'fpgm', 'prep', 'gasp')
+
+# Composite glyph flags
+_ARG_1_AND_2_ARE_WORDS = 0x0001
+_WE_HAVE_A_SCALE = 0x0008
+_MORE_COMPONENTS = 0x0020
+_WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+_WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+# Table tags with a one-byte code in the WOFF2 table directory
+_WOFF2_KNOWN_TAGS = (
+    'cmap', 'head', 'hhea', 'hmtx', 'maxp', 'name', 'OS/2', 'post', 'cvt ', 'fpgm', 'glyf', 'loca',
+    'prep', 'CFF ', 'VORG', 'EBDT', 'EBLC', 'gasp', 'hdmx', 'kern', 'LTSH', 'PCLT', 'VDMX', 'vhea',
+    'vmtx', 'BASE', 'GDEF', 'GPOS', 'GSUB', 'EBSC', 'JSTF', 'MATH', 'CBDT', 'CBLC', 'COLR', 'CPAL',
+    'SVG ', 'sbix', 'acnt', 'avar', 'bdat', 'bloc', 'bsln', 'cvar', 'fdsc', 'feat', 'fmtx', 'fvar',
+    'gvar', 'hsty', 'just', 'lcar', 'mort', 'morx', 'opbd', 'prop', 'trak', 'Zapf', 'Silf', 'Glat',
+    'Gloc', 'Feat', 'Sill',
+)
+_WOFF2_NULL_TRANSFORM = {'glyf': 3, 'loca': 3}
+
+
+def _pad4(data):
+    return data + b'\0' * (-len(data) % 4)
+
+
+def _checksum(data):
+    data = _pad4(data)
+    return sum(struct.unpack(f'>{len(data) // 4}I', data)) & 0xFFFFFFFF
+
+
+class _Glyphs:
+    """Raw glyf entries of a deck_fonts.TrueTypeFont."""
+
+    def __init__(self, font):
+        self.font = font
+        glyf_offset, _ = font.tables['glyf']
+        loca_offset, _ = font.tables['loca']
+        count = font.num_glyphs + 1
+        if font.index_to_loc_format == 0:
+            offsets = [2 * value for value in struct.unpack_from(f'>{count}H', font.data, loca_offset)]
+        else:
+            offsets = list(struct.unpack_from(f'>{count}I', font.data, loca_offset))
+        self.offsets = [glyf_offset + offset for offset in offsets]
+
+    def data(self, gid):
+        return self.font.data[self.offsets[gid]:self.offsets[gid + 1]]
+
+    def components(self, gid):
+        """(byte offset of the glyph index, component glyph id) of a composite glyph."""
+        data = self.data(gid)
+        if len(data) < 10 or struct.unpack_from('>h', data, 0)[0] >= 0:
+            return []
+        found = []
+        pos = 10
+        while True:
+            flags, component = struct.unpack_from('>HH', data, pos)
+            found.append((pos + 2, component))
+            pos += 4 + (4 if flags & _ARG_1_AND_2_ARE_WORDS else 2)
+            if flags & _WE_HAVE_A_SCALE:
+                pos += 2
+            elif flags & _WE_HAVE_AN_X_AND_Y_SCALE:
+                pos += 4
+            elif flags & _WE_HAVE_A_TWO_BY_TWO:
+                pos += 8
+            if not flags & _MORE_COMPONENTS:
+                return found
+
+    def closure(self, gids):
+        """gids plus .notdef and every glyph their composites are built from."""
+        seen = {0}
+        pending = [gid for gid in gids if 0 <= gid < self.font.num_glyphs]
+        while pending:
+            gid = pending.pop()
+            if gid in seen:
+                continue
+            seen.add(gid)
+            pending.extend(component for _, component in self.components(gid))
+        return seen
+
+
+def _cmap_table(mapping):
+    """cmap with a format 4 subtable, plus format 12 for characters beyond the BMP."""
+    bmp = sorted((code, gid) for code, gid in mapping.items() if code < 0xFFFF)
+    segments = []
+    for code, gid in bmp:
+        if segments and code == segments[-1][1] + 1 and gid - code == segments[-1][2]:
+            segments[-1][1] = code
+        else:
+            segments.append([code, code, gid - code])
+    segments.append([0xFFFF, 0xFFFF, 1])
+    count = len(segments)
+    search = 2 ** (count.bit_length() - 1)
+    format4 = struct.pack('>7H', 4, 0, 0, 2 * count, 2 * search, search.bit_length() - 1, 2 * (count - search))
+    format4 += struct.pack(f'>{count}H', *(end for _, end, _ in segments)) + b'\0\0'
+    format4 += struct.pack(f'>{count}H', *(start for start, _, _ in segments))
+    format4 += struct.pack(f'>{count}H', *(delta & 0xFFFF for _, _, delta in segments))
+    format4 += b'\0\0' * count
+    format4 = format4[:2] + struct.pack('>H', len(format4)) + format4[4:]
+
+    subtables = [(3, 1, format4)]
+    if any(code > 0xFFFF for code in mapping):
+        groups = []
+        for code, gid in sorted(mapping.items()):
+            if groups and code == groups[-1][1] + 1 and gid == groups[-1][2] + code - groups[-1][0]:
+                groups[-1][1] = code
+            else:
+                groups.append([code, code, gid])
+        format12 = struct.pack('>HHIII', 12, 0, 16 + 12 * len(groups), 0, len(groups))
+        format12 += b''.join(struct.pack('>III', *group) for group in groups)
+        subtables.append((3, 10, format12))
+
+    header = struct.pack('>HH', 0, len(subtables))
+    offset = 4 + 8 * len(subtables)
+    records = b''
+    for platform, encoding, table in subtables:
+        records += struct.pack('>HHI', platform, encoding, offset)
+        offset += len(table)
+    return header + records + b''.join(table for _, _, table in subtables)
+
+
+def sfnt(tables):
+    """A TrueType file from {tag: bytes}, with checksums and head.checkSumAdjustment."""
+    tags = sorted(tables)
+    count = len(tags)
+    search = 2 ** (count.bit_length() - 1)
+    header = struct.pack('>IHHHH', 0x00010000, count, 16 * search, search.bit_length() - 1, 16 * (count - search))
+    offset = 12 + 16 * count
+    directory = b''
+    body = b''
+    for tag in tags:
+        data = tables[tag]
+        directory += struct.pack('>4sIII', tag.encode('latin-1'), _checksum(data), offset, len(data))
+        body += _pad4(data)
+        offset += len(_pad4(data))
+    font = bytearray(header + directory + body)
+    if 'head' in tables:
+        head_at = 12 + 16 * count + sum(len(_pad4(tables[tag])) for tag in tags[:tags.index('head')])
+        struct.pack_into('>I', font, head_at + 8, (0xB1B0AFBA - _checksum(bytes(font))) & 0xFFFFFFFF)
+    return bytes(font)
+
+
+def subset_font(font, chars=(), gids=(), retain_gids=False):
+    """TrueType bytes of font cut down to chars and gids (a deck_fonts.TrueTypeFont)."""
+    glyphs = _Glyphs(font)
+    wanted = {font.cmap[ord(char)] for char in chars if ord(char) in font.cmap} | set(gids)
+    keep = glyphs.closure(wanted)
+    order = list(range(max(keep) + 1)) if retain_gids else sorted(keep)
+    new_id = {gid: index for index, gid in enumerate(order)}
+
+    glyf = b''
+    loca = []
+    for gid in order:
+        loca.append(len(glyf))
+        if gid not in keep:
+            continue
+        data = bytearray(glyphs.data(gid))
+        for pos, component in glyphs.components(gid):
+            struct.pack_into('>H', data, pos, new_id[component])
+        glyf += _pad4(bytes(data))
+    loca.append(len(glyf))
+
+    hmtx_at = font.table_offset('hmtx')
+    num_hmetrics = struct.unpack_from('>H', font.data, font.table_offset('hhea') + 34)[0]
+
+    def lsb(gid):
+        if gid < num_hmetrics:
+            return struct.unpack_from('>h', font.data, hmtx_at + 4 * gid + 2)[0]
+        return struct.unpack_from('>h', font.data, hmtx_at + 4 * num_hmetrics + 2 * (gid - num_hmetrics))[0]
+
+    hmtx = b''.join(struct.pack('>Hh', font.advances[gid], lsb(gid)) if gid in keep else b'\0\0\0\0'
+                    for gid in order)
+
+    head = bytearray(font.table('head'))
+    struct.pack_into('>I', head, 8, 0)
+    struct.pack_into('>h', head, 50, 1)
+    hhea = bytearray(font.table('hhea'))
+    struct.pack_into('>H', hhea, 34, len(order))
+    maxp = bytearray(font.table('maxp'))
+    struct.pack_into('>H', maxp, 4, len(order))
+    post = bytearray(font.table('post')[:32]) if 'post' in font.tables else bytearray(32)
+    struct.pack_into('>I', post, 0, 0x00030000)
+
+    mapping = {code: new_id[gid] for code, gid in font.cmap.items() if gid in keep and gid in wanted}
+    tables = {
+        'head': bytes(head), 'hhea': bytes(hhea), 'maxp': bytes(maxp), 'post': bytes(post),
+        'cmap': _cmap_table(mapping), 'glyf': glyf, 'hmtx': hmtx,
+        'loca': struct.pack(f'>{len(loca)}I', *loca),
+    }
+    for tag in COPIED_TABLES:
+        if tag in font.tables:
+            tables[tag] = font.table(tag)
+    return sfnt(tables)
+
+
+def _tables(font_data):
+    count = struct.unpack_from('>H', font_data, 4)[0]
+    tables = []
+    for i in range(count):
+        tag, checksum, offset, length = struct.unpack_from('>4sIII', font_data, 12 + 16 * i)
+        tables.append((tag.decode('latin-1'), checksum, font_data[offset:offset + length]))
+    return tables
+
+
+def to_woff(font_data):
+    """WOFF 1.0: each table zlib-compressed when that makes it smaller."""
+    tables = _tables(font_data)
+    offset = 44 + 20 * len(tables)
+    directory = b''
+    body = b''
+    for tag, checksum, data in tables:
+        packed = zlib.compress(data, 9)
+        if len(packed) >= len(data):
+            packed = data
+        directory += struct.pack('>4sIIII', tag.encode('latin-1'), offset, len(packed), len(data), checksum)
+        body += _pad4(packed)
+        offset += len(_pad4(packed))
+    header = struct.pack('>4sIIHHIHHIIIII', b'wOFF', 0x00010000, 44 + len(directory) + len(body), len(tables),
+                         0, len(font_data), 1, 0, 0, 0, 0, 0, 0)
+    return header + directory + body
+
+
+def _base128(value):
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def to_woff2(font_data):
+    """WOFF2 with untransformed tables; needs the brotli package."""
+    if brotli is None:
+        raise RuntimeError('WOFF2 needs the brotli package')
+    tables = _tables(font_data)
+    directory = b''
+    for tag, _, data in tables:
+        known = _WOFF2_KNOWN_TAGS.index(tag) if tag in _WOFF2_KNOWN_TAGS else 63
+        directory += bytes([known | _WOFF2_NULL_TRANSFORM.get(tag, 0) << 6])
+        if known == 63:
+            directory += tag.encode('latin-1')
+        directory += _base128(len(data))
+    packed = brotli.compress(b''.join(data for _, _, data in tables), mode=brotli.MODE_FONT, quality=11)
+    length = 48 + len(directory) + len(_pad4(packed))
+    sfnt_size = 12 + 16 * len(tables) + sum(len(_pad4(data)) for _, _, data in tables)
+    header = struct.pack('>4sIIHHIIHHIIIII', b'wOF2', 0x00010000, length, len(tables), 0, sfnt_size,
+                         len(packed), 1, 0, 0, 0, 0, 0, 0)
+    return header + directory + _pad4(packed)
@@ -0,0 +1,65 @@
+"""Tiny precompiled templates for the deck generator.
+
+Templates use ``{{ name }}`` slots. Sources are parsed once into a list of
+literal and slot chunks and cached, so rendering is a straight walk that
+writes each chunk to a file handle. Values shared by every page (the common
+styles, for instance) can be bound ahead of time, which folds them into the
+literal chunks once instead of copying them in for each page.
+"""
+
+import io
+import re
+from functools import lru_cache
+
+_SLOT = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+class Template:
+    def __init__(self, chunks):
+        # chunks: tuple of (is_slot, text); adjacent literals are already merged
+        self.chunks = chunks
+        self.slots = frozenset(text for is_slot, text in chunks if is_slot)
+
+    def render_to(self, out, context):
+        write = out.write
+        for is_slot, text in self.chunks:
+            write(context[text] if is_slot else text)
+
+    def render(self, context):
+        out = io.StringIO()
+        self.render_to(out, context)
+        return out.getvalue()
+
+    def bind(self, **values):
+        return _bind(self, tuple(sorted(values.items())))
+
+
+def _merge(chunks):
+    merged = []
+    for is_slot, text in chunks:
+        if not is_slot and merged and not merged[-1][0]:
+            merged[-1] = (False, merged[-1][1] + text)
+        elif is_slot or text:
+            merged.append((is_slot, text))
+    return tuple(merged)
+
+
+@lru_cache(maxsize=None)
+def compile_template(source):
+    chunks = []
+    pos = 0
+    for match in _SLOT.finditer(source):
+        chunks.append((False, source[pos:match.start()]))
+        chunks.append((True, match.group(1)))
+        pos = match.end()
+    chunks.append((False, source[pos:]))
+    return Template(_merge(chunks))
+
+
+@lru_cache(maxsize=32)
+def _bind(template, items):
+    values = dict(items)
+    return Template(_merge(
+        (False, values[text]) if is_slot and text in values else (is_slot, text)
+        for is_slot, text in template.chunks
+    ))
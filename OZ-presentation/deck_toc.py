@@ -0,0 +1,168 @@
+"""Table of contents and cross-page references, from the deck's final order.
+
+One pass over the deck, hand-written and generated pages alike, records
+each page's position, title and section number. Two things are rendered
+from that outline:
+
+- page-02-toc.html, from the content/toc.html template. It lists the first
+  page of every numbered section. A section is a page titled "12. ..." or,
+  where there is none, the first "12.1 ..." page.
+- references written in page content as {{@ page-14-eligibility }}. These
+  become a link to that page, labelled with its title and page number.
+
+The same order is written to deck-pages.json, which index.html and the PDF
+tools read when there is no bundle. Continuation pages are then shown, and
+the page numbers they show match the TOC.
+
+References are resolved before pages are digested. Editing a title
+rewrites that page, the TOC and the pages that refer to it; every other
+page stays as it is. The TOC file is only written when its bytes change.
+"""
+
+import glob
+import html
+import json
+import os
+import re
+
+import deck_bundle
+import deck_minify
+from deck_content import ContentError, page_name
+from deck_split import source_page
+from deck_templates import compile_template
+
+TOC_PAGE = 'page-02-toc.html'
+TOC_TEMPLATE = 'toc.html'
+TOC_TITLE = 'Table of Contents'
+PAGE_LIST = 'deck-pages.json'
+
+_SECTION = re.compile(r'(\d+)(?:\.(\d+))?\.?\s+(.+)', re.S)
+_REFERENCE = re.compile(r'\{\{\s*@\s*([\w.-]+)\s*\}\}')
+
+TOC_ITEM = '''<div class="toc-item">
+    <span>{label}</span>
+    <span class="page-number">{position}</span>
+</div>'''
+REFERENCE = '<a class="page-ref" href="{filename}">{title}, page {position}</a>'
+
+
+class OutlineEntry:
+    def __init__(self, filename, position, title):
+        self.filename = filename
+        self.position = position
+        self.title = title
+        match = _SECTION.fullmatch(title.strip())
+        self.section = int(match.group(1)) if match else None
+        self.subsection = int(match.group(2)) if match and match.group(2) else None
+        self.heading = match.group(3) if match else title
+
+
+class Outline:
+    def __init__(self, entries):
+        self.entries = entries
+        self.by_name = {entry.filename: entry for entry in entries}
+
+    def sections(self):
+        """The entry that opens each numbered section, in section order."""
+        first = {}
+        for entry in self.entries:
+            if entry.section is None:
+                continue
+            current = first.get(entry.section)
+            # A whole-number title beats the subsections that come before it
+            if current is None or (current.subsection is not None and entry.subsection is None):
+                first[entry.section] = entry
+        return [first[number] for number in sorted(first)]
+
+    def render_toc(self, template_source):
+        items = [TOC_ITEM.format(label=f'{entry.section}. {entry.heading}', position=entry.position)
+                 for entry in self.sections()]
+        entries = '\n'.join(items).replace('\n', '\n' + ' ' * 8)
+        return compile_template(template_source).render({'entries': entries})
+
+    def resolve(self, filename, content):
+        """content with every {{@ page }} reference replaced by a link."""
+        def link(match):
+            target = self.by_name.get(page_name(match.group(1)))
+            if target is None:
+                raise ContentError(f"{filename}: reference to unknown page '{match.group(1)}'")
+            return REFERENCE.format(filename=target.filename, title=target.title, position=target.position)
+        return _REFERENCE.sub(link, content)
+
+
+def collect(page_files, pages):
+    """Outline of [(filename, path)] in deck order; titles of generated pages come from pages.
+
+    Titles are the heading's text, escaped, however the page was read, so a
+    partial build renders the TOC byte for byte as a full one does.
+    """
+    entries = []
+    for position, (filename, path) in enumerate(page_files, 1):
+        page_data = pages.get(filename)
+        if page_data is not None:
+            markup = f"<h2>{page_data['title']}</h2>"
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                markup = f.read()
+        title = html.escape(deck_bundle.page_title(markup, ''), quote=False)
+        entries.append(OutlineEntry(filename, position, title))
+    return Outline(entries)
+
+
+def deck_outline(pages_dir, out_dir, pages, partial=False, stale=()):
+    """Outline of the deck these pages will be part of.
+
+    A partial build only has some of the generated pages, so the rest are
+    read back from out_dir. stale names files an earlier build left behind
+    that this build removes.
+    """
+    generated = set(pages) | {TOC_PAGE}
+    if partial:
+        generated |= {os.path.basename(path) for path in glob.glob(os.path.join(out_dir, deck_bundle.PAGE_PATTERN))}
+    stale = set(stale) - generated
+    # Continuations of these pages that the split no longer produces are stale too
+    page_files = [(filename, path) for filename, path in deck_bundle.deck_files(pages_dir, out_dir, generated)
+                  if filename not in stale and (filename in pages or source_page(filename) not in pages)]
+    return collect(page_files, {**pages, TOC_PAGE: {'title': TOC_TITLE}})
+
+
+def resolve_references(outline, pages):
+    """pages with their references resolved; entries without any are passed through as they are."""
+    resolved = {}
+    for filename, page_data in pages.items():
+        if '{{' in page_data['content'] and _REFERENCE.search(page_data['content']):
+            page_data = dict(page_data, content=outline.resolve(filename, page_data['content']))
+        resolved[filename] = page_data
+    return resolved
+
+
+def _write_if_changed(path, data):
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def write_toc(outline, content_dir, out_dir, minify=False):
+    """Render the TOC into out_dir; returns True when the file changed."""
+    with open(os.path.join(content_dir, TOC_TEMPLATE), 'r', encoding='utf-8') as f:
+        template_source = f.read()
+    toc = outline.render_toc(template_source)
+    data = (deck_minify.minify_html(toc) if minify else toc).encode('utf-8')
+    return _write_if_changed(os.path.join(out_dir, TOC_PAGE), data)
+
+
+def page_list_data(filenames):
+    """deck-pages.json for these page files, in deck order."""
+    return json.dumps({'pages': list(filenames)}, indent=1).encode('utf-8')
+
+
+def write_page_list(outline, out_dir):
+    """Write the deck's page order to out_dir; returns True when the file changed."""
+    data = page_list_data(entry.filename for entry in outline.entries)
+    return _write_if_changed(os.path.join(out_dir, PAGE_LIST), data)
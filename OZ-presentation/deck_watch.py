@@ -0,0 +1,119 @@
+"""Rebuild the deck when its inputs change (generate-remaining-pages.py --watch).
+
+Inputs are polled, so no extra packages are needed. Each kind of input maps
+to the build stages that depend on it:
+
+    content/ files, partials  -> pages, fonts, search, bundle, pdf, compress
+    hand-written page-*.html  -> pages, fonts, search, bundle, pdf, compress
+    images                    -> assets, bundle, pdf, compress
+    fonts                     -> fonts, bundle, pdf, compress
+
+The pages stage itself only rewrites pages whose content digest changed
+(see deck_build.build), so editing one content file rebuilds one page. A
+hand-written page reruns it because its title and position feed the TOC
+and the page references (see deck_toc).
+"""
+
+import glob
+import os
+import time
+import traceback
+
+import deck_assets
+import deck_bundle
+import deck_fonts
+import deck_pdf
+
+STAGES = ('assets', 'pages', 'fonts', 'search', 'bundle', 'pdf', 'compress')
+DEPENDENTS = {
+    'content': ('pages', 'fonts', 'search', 'bundle', 'pdf', 'compress'),
+    'page': ('pages', 'fonts', 'search', 'bundle', 'pdf', 'compress'),
+    'image': ('assets', 'bundle', 'pdf', 'compress'),
+    'font': ('fonts', 'bundle', 'pdf', 'compress'),
+}
+POLL_INTERVAL = 0.2
+# Editors often write a file in several steps; wait this long for it to settle
+SETTLE_DELAY = 0.05
+
+
+def deck_inputs(content_dir, pages_dir, generated, fonts_dir=None):
+    """Map every file the deck is built from to its kind."""
+    # Dotfiles include the content cache, which the build itself rewrites
+    inputs = {os.path.abspath(path): 'content'
+              for path in glob.glob(os.path.join(content_dir, '**', '*'), recursive=True) if os.path.isfile(path)}
+    for path in glob.glob(os.path.join(pages_dir, deck_bundle.PAGE_PATTERN)):
+        # Generated pages may share the directory; they are outputs, not inputs
+        if os.path.basename(path) not in generated:
+            inputs[os.path.abspath(path)] = 'page'
+    for name in {deck_pdf.LOGO_SVG, deck_pdf.BACKGROUND_IMAGE, *deck_assets.source_files()}:
+        inputs[os.path.abspath(os.path.join(pages_dir, name))] = 'image'
+    for path in glob.glob(os.path.join(fonts_dir or deck_fonts.FONTS_DIR, '*.ttf')):
+        inputs[os.path.abspath(path)] = 'font'
+    return inputs
+
+
+def snapshot(inputs):
+    state = {}
+    for path in inputs:
+        try:
+            info = os.stat(path)
+        except OSError:
+            continue
+        state[path] = (info.st_mtime_ns, info.st_size)
+    return state
+
+
+def affected_stages(changed, inputs, enabled=STAGES):
+    stages = set()
+    for path in changed:
+        stages.update(DEPENDENTS[inputs.get(path, 'page')])
+    return [stage for stage in STAGES if stage in stages and stage in enabled]
+
+
+def watch(content_dir, pages_dir, rebuild, generated, fonts_dir=None, interval=POLL_INTERVAL, enabled=STAGES):
+    """Poll the deck's inputs and call rebuild(stages) after each change.
+
+    rebuild receives the affected stages out of enabled, in build order, and
+    returns the generated page names, which change when content files are
+    added or removed.
+    Runs until interrupted.
+    """
+    inputs = deck_inputs(content_dir, pages_dir, generated, fonts_dir)
+    state = snapshot(inputs)
+    print(f"Watching {len(inputs)} inputs, press Ctrl+C to stop")
+
+    try:
+        while True:
+            time.sleep(interval)
+            current_inputs = deck_inputs(content_dir, pages_dir, generated, fonts_dir)
+            current = snapshot(current_inputs)
+            if current == state:
+                continue
+            time.sleep(SETTLE_DELAY)
+            current = snapshot(current_inputs)
+
+            started = time.perf_counter()
+            changed = {path for path in current.keys() | state.keys()
+                       if current.get(path) != state.get(path)}
+            kinds = dict(inputs, **current_inputs)
+            stages = affected_stages(changed, kinds, enabled)
+            names = ', '.join(sorted(os.path.basename(path) for path in changed))
+            print(f"Changed: {names}")
+            if not stages:
+                # Only inputs of stages the options left off changed
+                print("Nothing to rebuild")
+                inputs, state = current_inputs, current
+                continue
+            try:
+                generated = rebuild(stages)
+            except Exception:
+                # Keep watching through a half-edited content file or page
+                traceback.print_exc()
+                print(f"Rebuild failed after {time.perf_counter() - started:.3f}s, waiting for the next change")
+            else:
+                print(f"Rebuilt {', '.join(stages)} in {time.perf_counter() - started:.3f}s")
+
+            inputs = deck_inputs(content_dir, pages_dir, generated, fonts_dir)
+            state = snapshot(inputs)
+    except KeyboardInterrupt:
+        print("Stopped watching")
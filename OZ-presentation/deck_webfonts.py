@@ -0,0 +1,109 @@
+"""Subset web fonts for the deck (generate-remaining-pages.py --webfonts).
+
+Every .ttf in the fonts directory is cut down to the characters that appear
+in the deck's pages, plus printable ASCII so CSS text-transform and text the
+viewer adds still render. Each subset is written to WEBFONTS_DIR as WOFF2
+with a content hash in its name. Without brotli it is written as WOFF
+instead. The @font-face rules for them go into the bundle in place of the
+Google Fonts stylesheet.
+
+Subsets are cached by font file and glyph set in CACHE_NAME, so a rebuild
+only subsets again when a font changes or a page uses a new character.
+"""
+
+import glob
+import hashlib
+import os
+
+import deck_subset
+from deck_build import load_manifest, save_manifest
+from deck_fonts import FONTS_DIR, TrueTypeFont
+from deck_html import visible_text
+
+WEBFONTS_DIR = 'webfonts'
+CACHE_NAME = '.deck-webfonts.json'
+BASE_CHARS = ''.join(chr(code) for code in range(0x20, 0x7F))
+
+
+def deck_chars(page_files):
+    """Every character in the visible text of [(filename, path)]."""
+    chars = set(BASE_CHARS)
+    for _, path in page_files:
+        with open(path, 'r', encoding='utf-8') as f:
+            chars.update(visible_text(f.read()))
+    return ''.join(sorted(char for char in chars if char.isprintable()))
+
+
+def font_face(entry):
+    return (f"@font-face {{ font-family: '{entry['family']}'; font-style: {entry['style']}; "
+            f"font-weight: {entry['weight']}; font-display: swap; "
+            f"src: url('{WEBFONTS_DIR}/{entry['file']}') format('{entry['format']}'); }}\n")
+
+
+class WebFontReport:
+    def __init__(self):
+        self.written = []
+        self.cached = []
+        self.css = ''
+        self.families = set()
+        self.chars = 0
+        self.source_bytes = 0
+        self.font_bytes = 0
+        self.note = None
+
+
+def build_webfonts(page_files, out_dir, fonts_dir=FONTS_DIR):
+    report = WebFontReport()
+    paths = sorted(glob.glob(os.path.join(fonts_dir, '*.ttf')))
+    if not paths:
+        report.note = f"no .ttf files in {fonts_dir}, the deck keeps using Google Fonts"
+        return report
+
+    if deck_subset.brotli is not None:
+        fmt, ext, pack = 'woff2', '.woff2', deck_subset.to_woff2
+    else:
+        fmt, ext, pack = 'woff', '.woff', deck_subset.to_woff
+        report.note = "brotli is not installed, fonts were written as WOFF instead of WOFF2"
+
+    chars = deck_chars(page_files)
+    report.chars = len(chars)
+    glyph_set = hashlib.sha256(chars.encode('utf-8')).hexdigest()
+    fonts_out = os.path.join(out_dir, WEBFONTS_DIR)
+    os.makedirs(fonts_out, exist_ok=True)
+    cache_path = os.path.join(out_dir, CACHE_NAME)
+    previous = load_manifest(cache_path).get('fonts', {})
+    entries = {}
+
+    for path in paths:
+        info = os.stat(path)
+        key = hashlib.sha256(f'{info.st_size}:{info.st_mtime_ns}:{glyph_set}:{fmt}'.encode('utf-8')).hexdigest()[:16]
+        name = os.path.basename(path)
+        entry = previous.get(name)
+        if entry and entry['key'] == key and os.path.exists(os.path.join(fonts_out, entry['file'])):
+            report.cached.append(name)
+        else:
+            font = TrueTypeFont(path)
+            data = pack(deck_subset.subset_font(font, chars))
+            filename = f'{os.path.splitext(name)[0]}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+            with open(os.path.join(fonts_out, filename), 'wb') as f:
+                f.write(data)
+            entry = {
+                'key': key, 'file': filename, 'format': fmt, 'bytes': len(data),
+                'family': font.family_name, 'weight': font.weight,
+                'style': 'italic' if font.italic_angle else 'normal',
+            }
+            report.written.append(filename)
+        entries[name] = entry
+        report.css += font_face(entry)
+        report.families.add(entry['family'])
+        report.source_bytes += info.st_size
+        report.font_bytes += entry['bytes']
+
+    # Subsets of an earlier glyph set or of removed fonts
+    current = {entry['file'] for entry in entries.values()}
+    for filename in os.listdir(fonts_out):
+        if filename not in current:
+            os.remove(os.path.join(fonts_out, filename))
+    if entries != previous:
+        save_manifest(cache_path, {'fonts': entries})
+    return report
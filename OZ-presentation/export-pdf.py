@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import statistics
+
+import deck_bundle
+import deck_pdf
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def print_benchmark(runs, browser_pdf, browser_seconds):
+    seconds = [run.seconds for run in runs]
+    size = runs[-1].bytes
+    print(f"Python export: {len(runs)} runs, median {statistics.median(seconds):.3f}s, "
+          f"best {min(seconds):.3f}s, {size} bytes")
+    if browser_pdf:
+        browser_size = os.path.getsize(browser_pdf)
+        print(f"Browser export: {browser_size} bytes ({browser_size / size:.1f}x the Python file)")
+    if browser_seconds:
+        print(f"Browser export: {browser_seconds:.1f}s "
+              f"({browser_seconds / statistics.median(seconds):.0f}x the Python wall time)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the OZ deck to a vector PDF without a browser.')
+    parser.add_argument('--out', default='OZ-Investment-Guide.pdf', help='PDF file to write')
+    parser.add_argument('--pages-dir', default=SOURCE_DIR,
+                        help='directory holding the hand-written page-*.html files')
+    parser.add_argument('--build-dir', default=None,
+                        help='directory the generator wrote its pages to (default: --pages-dir)')
+    parser.add_argument('--fonts-dir', default=None,
+                        help='directory with Playfair Display and Inter .ttf files (default: ./fonts)')
+    parser.add_argument('--no-background', action='store_true', help='leave out the page background image')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'lay out every page again instead of reusing {deck_pdf.PAGE_CACHE}')
+    parser.add_argument('--benchmark', type=int, default=0, metavar='RUNS',
+                        help='repeat the export without the page cache and report wall time and file size')
+    parser.add_argument('--browser-pdf', help='PDF saved from pdf-generator.html, to compare sizes with')
+    parser.add_argument('--browser-seconds', type=float,
+                        help='time pdf-generator.html reported for the same deck')
+    args = parser.parse_args()
+
+    page_files = deck_bundle.built_deck_files(args.pages_dir, args.build_dir or args.pages_dir)
+    runs = []
+    for _ in range(max(1, args.benchmark)):
+        runs.append(deck_pdf.export_pdf(page_files, args.out, fonts_dir=args.fonts_dir,
+                                        background=not args.no_background, source_dir=args.pages_dir,
+                                        cache=not (args.no_cache or args.benchmark)))
+    report = runs[-1]
+
+    for filename, overflow in report.overflowing:
+        print(f"Warning: {filename} overflows the page by {overflow:.0f}pt and is clipped")
+    if report.embedded_fonts == 0:
+        print("Note: no .ttf files found, using the standard PDF fonts instead of Playfair Display/Inter")
+    else:
+        print(f"Embedded {report.embedded_fonts} font subsets: {report.font_bytes} bytes "
+              f"instead of {report.full_font_bytes} for the full fonts")
+    if report.background != 'embedded' and not args.no_background:
+        print(f"Note: background image skipped ({report.background})")
+    print(f"Wrote {report.path}: {report.pages} pages ({len(report.rendered)} laid out, {report.cached} cached), "
+          f"{report.bytes} bytes in {report.seconds:.2f}s")
+
+    if args.benchmark:
+        print_benchmark(runs, args.browser_pdf, args.browser_seconds)
+
+
+if __name__ == '__main__':
+    main()
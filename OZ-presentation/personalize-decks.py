@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+
+import deck_bundle
+import deck_personalize
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write one zip of the OZ deck per investor, personalized from a CSV or NDJSON file.')
+    parser.add_argument('investors',
+                        help='CSV or NDJSON with name, and optionally id, gain, rate, '
+                             'sponsor_name, sponsor_email, sponsor_phone')
+    parser.add_argument('--out-dir', default='investor-decks', help='directory to write the archives to')
+    parser.add_argument('--pages-dir', default=SOURCE_DIR,
+                        help='directory holding the hand-written page-*.html files')
+    parser.add_argument('--build-dir', default=None,
+                        help='directory the generator wrote its pages to (default: --pages-dir)')
+    parser.add_argument('--jobs', '-j', type=int, default=0,
+                        help='worker processes (0 = one per CPU, 1 = serial)')
+    args = parser.parse_args()
+
+    page_files = deck_bundle.built_deck_files(args.pages_dir, args.build_dir or args.pages_dir)
+    try:
+        report = deck_personalize.personalize(page_files, args.investors, args.out_dir, args.pages_dir, args.jobs)
+    except ValueError as e:
+        # A record that cannot be personalized, or a deck without the markup to replace
+        parser.exit(1, f"{e}\n")
+
+    rate = report.archives / report.seconds if report.seconds else 0
+    print(f"Wrote {report.archives} archives to {args.out_dir}: {report.bytes} bytes in {report.seconds:.2f}s "
+          f"({rate:.0f} per second, {report.jobs} workers)")
+
+
+if __name__ == '__main__':
+    main()